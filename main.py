@@ -12,20 +12,15 @@ Comandos:
     python main.py stats        - Mostra estatísticas rápidas
 """
 import argparse
-import sys
-import os
 
-# Adiciona src ao path
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-
-from src.shopify.client import ShopifyClient
-from src.enrichment.service import EnrichmentService
-from src.shopify_collections.service import CollectionService
-from src.health.checker import HealthChecker
+# Os serviços são importados dentro de cada comando: cada subcomando só
+# paga o custo de import (requests, shopify, dotenv...) do que usa.
 
 
 def cmd_test():
     """Testa conexão com a loja"""
+    from src.shopify.client import ShopifyClient
+
     print("🔌 Testando conexão com Shopify...\n")
 
     client = ShopifyClient()
@@ -61,6 +56,8 @@ def cmd_test():
 
 def cmd_health():
     """Gera relatório de saúde"""
+    from src.health.checker import HealthChecker
+
     print("🏥 Gerando relatório de saúde...\n")
 
     checker = HealthChecker()
@@ -71,6 +68,8 @@ def cmd_health():
 
 def cmd_collections():
     """Cria coleções padrão"""
+    from src.shopify_collections.service import CollectionService
+
     print("📁 Criando coleções automáticas...\n")
 
     service = CollectionService()
@@ -94,6 +93,8 @@ def cmd_collections():
 
 def cmd_enrich(product_id=None, cost=None, shipping=0):
     """Enriquece produtos"""
+    from src.enrichment.service import EnrichmentService
+
     service = EnrichmentService()
 
     if product_id:
@@ -124,6 +125,8 @@ def cmd_enrich(product_id=None, cost=None, shipping=0):
 
 def cmd_stats():
     """Mostra estatísticas rápidas"""
+    from src.health.checker import HealthChecker
+
     print("📊 Estatísticas da Loja\n")
 
     checker = HealthChecker()
@@ -2,52 +2,311 @@
 🔍 AUDITORIA INSTITUCIONAL DA LOJA SHOPIFY
 Verifica se todos os elementos essenciais estão configurados.
 """
+import io
 import os
+import sys
+import json
+import time
+import hashlib
+import asyncio
+import threading
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from contextlib import redirect_stdout
 from datetime import datetime
+from functools import wraps
+from pathlib import Path
 from dotenv import load_dotenv
 
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
 load_dotenv(override=True)
 
 
+# URL base e headers calculados uma única vez (o .env já foi carregado)
+_API_VERSION = os.getenv('SHOPIFY_API_VERSION', '2025-04')
+_BASE_URL = f"https://{os.getenv('SHOPIFY_STORE_URL')}/admin/api/{_API_VERSION}"
+_HEADERS = {
+    "X-Shopify-Access-Token": os.getenv("SHOPIFY_ACCESS_TOKEN"),
+    "Content-Type": "application/json"
+}
+
+
 def get_headers():
-    return {
-        "X-Shopify-Access-Token": os.getenv("SHOPIFY_ACCESS_TOKEN"),
-        "Content-Type": "application/json"
-    }
+    """Headers compartilhados da API (não modificar; copie com dict())."""
+    return _HEADERS
+
+
+# Sessão com keep-alive: o handshake TCP/TLS é feito uma única vez
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=20,
+    max_retries=Retry(total=5, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False)
+))
 
 
 def get_api_url(endpoint):
-    store_url = os.getenv("SHOPIFY_STORE_URL")
-    api_version = os.getenv("SHOPIFY_API_VERSION", "2025-04")
-    return f"https://{store_url}/admin/api/{api_version}/{endpoint}"
+    return f"{_BASE_URL}/{endpoint}"
+
+
+# Cache em memória (endpoint -> (expira_em, dados)) com stale-while-revalidate
+CACHE_TTL = 60
+_cache = {}
+_revalidando = set()
+_cache_lock = threading.Lock()
+
+# Cache em disco entre execuções (sha1(endpoint) -> ETag/Last-Modified + dados)
+CACHE_DISCO = Path(__file__).parent.parent / "temp" / "shopify_cache.json"
+CACHE_DISCO_TTL = 3600
+
+
+def _carregar_disco():
+    try:
+        return json.loads(CACHE_DISCO.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+_disco = _carregar_disco()
+
+
+def _salvar_disco():
+    """Persiste o cache em disco para a próxima auditoria."""
+    with _cache_lock:
+        conteudo = json.dumps(_disco, ensure_ascii=False)
+    CACHE_DISCO.parent.mkdir(exist_ok=True)
+    CACHE_DISCO.write_text(conteudo, encoding="utf-8")
+
+
+def _chave(endpoint):
+    return hashlib.sha1(endpoint.encode()).hexdigest()
+
+
+def _headers_condicionais(endpoint):
+    """Headers da API + If-None-Match/If-Modified-Since da última resposta."""
+    headers = dict(get_headers())
+    entrada = _disco.get(_chave(endpoint))
+    if entrada:
+        if entrada.get("etag"):
+            headers["If-None-Match"] = entrada["etag"]
+        if entrada.get("last_modified"):
+            headers["If-Modified-Since"] = entrada["last_modified"]
+    return headers
+
+
+def _registrar(endpoint, status, headers, data):
+    """Guarda uma resposta 200/304 nos caches e retorna os dados (ou None)."""
+    chave = _chave(endpoint)
+    with _cache_lock:
+        if status == 304 and chave in _disco:
+            # Não mudou: reaproveita o corpo salvo, sem payload na rede
+            data = _disco[chave]["data"]
+            _disco[chave]["salvo_em"] = time.time()
+        elif status == 200:
+            _disco[chave] = {
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+                "salvo_em": time.time(),
+                "data": data,
+            }
+        else:
+            return None
+        _cache[endpoint] = (time.monotonic() + CACHE_TTL, data)
+    return data
+
+
+def _buscar(endpoint):
+    """Faz a requisição GET (condicional) e guarda o resultado no cache."""
+    url = get_api_url(endpoint)
+    response = SESSION.get(url, headers=_headers_condicionais(endpoint))
+    data = json_loads(response.content) if response.status_code == 200 else None
+    return _registrar(endpoint, response.status_code, response.headers, data)
+
+
+def _revalidar(endpoint):
+    """Atualiza uma entrada expirada em segundo plano."""
+    try:
+        _buscar(endpoint)
+    finally:
+        with _cache_lock:
+            _revalidando.discard(endpoint)
 
 
 def api_get(endpoint):
-    """Faz requisição GET na API."""
+    """Faz requisição GET na API (com cache TTL + stale-while-revalidate)."""
+    with _cache_lock:
+        entrada = _cache.get(endpoint)
+        if entrada is None:
+            disco = _disco.get(_chave(endpoint))
+            if disco and time.time() - disco["salvo_em"] < CACHE_DISCO_TTL:
+                # Recente o bastante: usa o disco e revalida em segundo plano
+                entrada = (0, disco["data"])
+        if entrada:
+            expira_em, data = entrada
+            if expira_em <= time.monotonic() and endpoint not in _revalidando:
+                _revalidando.add(endpoint)
+                threading.Thread(target=_revalidar, args=(endpoint,), daemon=True).start()
+            return data
+    return _buscar(endpoint)
+
+
+# Endpoints consultados pelos check_* (pré-carregados em paralelo)
+ENDPOINTS_AUDITORIA = [
+    "payment_gateways.json",
+    "shipping_zones.json",
+    "policies.json",
+    "pages.json",
+    "custom_collections.json",
+    "smart_collections.json",
+    "products.json?limit=5&fields=title,images,variants",
+    "themes.json",
+    "locations.json",
+]
+
+
+async def _buscar_async(session, endpoint):
+    """Versão assíncrona de _buscar."""
     url = get_api_url(endpoint)
-    response = requests.get(url, headers=get_headers())
-    if response.status_code == 200:
-        return response.json()
-    return None
+    async with session.get(url, headers=_headers_condicionais(endpoint)) as response:
+        data = json_loads(await response.read()) if response.status == 200 else None
+        _registrar(endpoint, response.status, response.headers, data)
+
+
+# productsCount na raiz do GraphQL só existe a partir da 2024-04; antes disso
+# o contexto vem dos endpoints REST abaixo, pré-carregados junto com os demais
+CONTEXTO_VIA_GRAPHQL = _API_VERSION >= "2024-04"
+ENDPOINTS_CONTEXTO = [
+    "shop.json",
+    "products/count.json",
+    *(f"products/count.json?status={status}" for status in ("active", "draft", "archived")),
+]
+
+# Loja + contagens de produtos em uma única query (substitui 5 chamadas REST)
+CONTEXTO_QUERY = """
+{
+  shop {
+    name
+    email
+    primaryDomain { host }
+    currencyCode
+    billingAddress { country }
+    ianaTimezone
+    plan { displayName }
+    checkoutApiSupported
+    enabledPresentmentCurrencies
+  }
+  total: productsCount { count }
+  active: productsCount(query: "status:active") { count }
+  draft: productsCount(query: "status:draft") { count }
+  archived: productsCount(query: "status:archived") { count }
+}
+"""
+
+
+async def _graphql_async(session, query):
+    """Executa uma query GraphQL; retorna `data` ou None em erro."""
+    url = get_api_url("graphql.json")
+    async with session.post(url, headers=get_headers(), json={"query": query}) as response:
+        if response.status != 200:
+            return None
+        data = json_loads(await response.read())
+    return None if data.get("errors") else data.get("data")
+
+
+async def _pre_carregar(endpoints):
+    """
+    Busca todos os endpoints e o contexto da loja simultaneamente.
+
+    Os endpoints REST vão para o cache; retorna o resultado da query de
+    contexto, ou None se ele veio pela REST (já no cache para _contexto_rest).
+    """
+    connector = aiohttp.TCPConnector(limit=10)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        if not CONTEXTO_VIA_GRAPHQL:
+            await asyncio.gather(
+                *(_buscar_async(session, e) for e in [*ENDPOINTS_CONTEXTO, *endpoints]),
+                return_exceptions=True
+            )
+            return None
+
+        contexto, *_ = await asyncio.gather(
+            _graphql_async(session, CONTEXTO_QUERY),
+            *(_buscar_async(session, e) for e in endpoints),
+            return_exceptions=True
+        )
+    return None if isinstance(contexto, BaseException) else contexto
+
+
+def _contexto_graphql(data):
+    """Converte a resposta de CONTEXTO_QUERY para o formato da REST API."""
+    shop = data["shop"]
+    return {
+        "shop": {
+            "name": shop.get("name"),
+            "email": shop.get("email"),
+            "domain": (shop.get("primaryDomain") or {}).get("host"),
+            "currency": shop.get("currencyCode"),
+            "country_name": (shop.get("billingAddress") or {}).get("country"),
+            "timezone": shop.get("ianaTimezone"),
+            "plan_name": (shop.get("plan") or {}).get("displayName"),
+            "checkout_api_supported": shop.get("checkoutApiSupported"),
+            "enabled_presentment_currencies": shop.get("enabledPresentmentCurrencies"),
+        },
+        "counts": {
+            status: (data.get(status) or {}).get("count", 0)
+            for status in ("total", "active", "draft", "archived")
+        },
+    }
+
+
+def _contexto_rest():
+    """Monta o mesmo contexto via REST (versões antes da 2024-04 ou falha do GraphQL)."""
+    shop = api_get("shop.json")
+    total = api_get("products/count.json")
+    counts = None
+    if total:
+        counts = {"total": total.get("count", 0)}
+        for status in ("active", "draft", "archived"):
+            data = api_get(f"products/count.json?status={status}")
+            counts[status] = data.get("count", 0) if data else 0
+    return {"shop": shop.get("shop", {}) if shop else None, "counts": counts}
 
 
 # =============================================================================
 # CHECAGENS INDIVIDUAIS
 # =============================================================================
 
-def check_info_loja():
+def saida_bufferizada(check):
+    """Acumula os print() de um check e escreve tudo de uma vez no final."""
+    @wraps(check)
+    def wrapper(*args, **kwargs):
+        buffer = io.StringIO()
+        try:
+            with redirect_stdout(buffer):
+                return check(*args, **kwargs)
+        finally:
+            sys.stdout.write(buffer.getvalue())
+    return wrapper
+
+
+@saida_bufferizada
+def check_info_loja(ctx):
     """Verifica informações básicas da loja."""
     print("\n" + "=" * 60)
     print("🏪 INFORMAÇÕES DA LOJA")
     print("=" * 60)
 
-    data = api_get("shop.json")
-    if not data:
+    shop = ctx["shop"]
+    if not shop:
         return {"status": "❌ ERRO", "details": "Não foi possível acessar a API"}
 
-    shop = data.get("shop", {})
-
     checks = {
         "Nome": shop.get("name"),
         "Email": shop.get("email"),
@@ -67,7 +326,8 @@ def check_info_loja():
     return {"status": "✅ OK", "data": shop}
 
 
-def check_checkout():
+@saida_bufferizada
+def check_checkout(ctx):
     """Verifica configurações de checkout."""
     print("\n" + "=" * 60)
     print("💳 CHECKOUT & PAGAMENTOS")
@@ -86,15 +346,15 @@ def check_checkout():
         print("  ⚠️ Não foi possível verificar gateways (permissão necessária)")
 
     # Verificar shop para checkout info
-    shop_data = api_get("shop.json")
-    if shop_data:
-        shop = shop_data.get("shop", {})
+    shop = ctx["shop"]
+    if shop:
         print(f"  {'✅' if shop.get('checkout_api_supported') else '⚠️'} Checkout API suportado")
         print(f"  ℹ️ Moeda principal: {shop.get('currency')}")
 
     return {"status": "verificado"}
 
 
+@saida_bufferizada
 def check_shipping():
     """Verifica configurações de frete."""
     print("\n" + "=" * 60)
@@ -130,6 +390,7 @@ def check_shipping():
     return {"status": "✅ OK" if zones else "❌ CONFIGURAR", "zones": len(zones)}
 
 
+@saida_bufferizada
 def check_policies():
     """Verifica políticas da loja."""
     print("\n" + "=" * 60)
@@ -162,6 +423,7 @@ def check_policies():
     return {"status": "✅ OK" if missing == 0 else f"❌ {missing} faltando", "found": found}
 
 
+@saida_bufferizada
 def check_pages():
     """Verifica páginas institucionais."""
     print("\n" + "=" * 60)
@@ -200,6 +462,7 @@ def check_pages():
     return {"status": "verificado", "count": len(pages)}
 
 
+@saida_bufferizada
 def check_collections():
     """Verifica coleções/categorias."""
     print("\n" + "=" * 60)
@@ -238,36 +501,29 @@ def check_collections():
     return {"status": "✅ OK" if total > 0 else "❌ CRIAR", "total": total}
 
 
-def check_products():
+@saida_bufferizada
+def check_products(ctx):
     """Verifica produtos."""
     print("\n" + "=" * 60)
     print("📦 PRODUTOS")
     print("=" * 60)
 
-    data = api_get("products/count.json")
+    counts = ctx["counts"]
 
-    if not data:
+    if not counts:
         print("  ⚠️ Não foi possível contar produtos")
         return {"status": "⚠️ Verificar"}
 
-    total = data.get("count", 0)
+    total = counts["total"]
     print(f"  ℹ️ Total de produtos: {total}")
 
     # Verificar produtos ativos vs rascunho
-    active = api_get("products/count.json?status=active")
-    draft = api_get("products/count.json?status=draft")
-    archived = api_get("products/count.json?status=archived")
-
-    active_count = active.get("count", 0) if active else 0
-    draft_count = draft.get("count", 0) if draft else 0
-    archived_count = archived.get("count", 0) if archived else 0
-
-    print(f"      ✅ Ativos: {active_count}")
-    print(f"      ⚠️ Rascunho: {draft_count}")
-    print(f"      🗄️ Arquivados: {archived_count}")
+    print(f"      ✅ Ativos: {counts['active']}")
+    print(f"      ⚠️ Rascunho: {counts['draft']}")
+    print(f"      🗄️ Arquivados: {counts['archived']}")
 
     # Amostra de produtos
-    sample = api_get("products.json?limit=5")
+    sample = api_get("products.json?limit=5&fields=title,images,variants")
     if sample:
         products = sample.get("products", [])
         if products:
@@ -280,6 +536,7 @@ def check_products():
     return {"status": "✅ OK" if total > 0 else "⚠️ Sem produtos", "total": total}
 
 
+@saida_bufferizada
 def check_theme():
     """Verifica tema."""
     print("\n" + "=" * 60)
@@ -304,6 +561,7 @@ def check_theme():
     return {"status": "✅ OK", "themes": len(themes)}
 
 
+@saida_bufferizada
 def check_navigation():
     """Verifica menus de navegação."""
     print("\n" + "=" * 60)
@@ -321,6 +579,7 @@ def check_navigation():
     return {"status": "⚠️ Verificar manualmente"}
 
 
+@saida_bufferizada
 def check_metafields():
     """Verifica metafields configurados."""
     print("\n" + "=" * 60)
@@ -338,6 +597,7 @@ def check_metafields():
     return {"status": "⚠️ Verificar manualmente"}
 
 
+@saida_bufferizada
 def check_apps():
     """Lista apps instalados."""
     print("\n" + "=" * 60)
@@ -355,6 +615,7 @@ def check_apps():
     return {"status": "⚠️ Verificar manualmente"}
 
 
+@saida_bufferizada
 def check_locations():
     """Verifica localizações de estoque."""
     print("\n" + "=" * 60)
@@ -393,14 +654,19 @@ def gerar_relatorio_auditoria():
 
     resultados = {}
 
+    # Todas as requisições saem de uma vez; os check_* leem do cache,
+    # então a saída continua na mesma ordem
+    contexto = asyncio.run(_pre_carregar(ENDPOINTS_AUDITORIA))
+    ctx = _contexto_graphql(contexto) if contexto else _contexto_rest()
+
     # Executar todas as verificações
-    resultados["loja"] = check_info_loja()
-    resultados["checkout"] = check_checkout()
+    resultados["loja"] = check_info_loja(ctx)
+    resultados["checkout"] = check_checkout(ctx)
     resultados["frete"] = check_shipping()
     resultados["politicas"] = check_policies()
     resultados["paginas"] = check_pages()
     resultados["colecoes"] = check_collections()
-    resultados["produtos"] = check_products()
+    resultados["produtos"] = check_products(ctx)
     resultados["tema"] = check_theme()
     resultados["navegacao"] = check_navigation()
     resultados["metafields"] = check_metafields()
@@ -445,6 +711,8 @@ def gerar_relatorio_auditoria():
 
     print("\n" + "=" * 60)
 
+    _salvar_disco()
+
     return resultados
 
 
@@ -4,17 +4,95 @@
 Preços FIXOS por categoria baseados em custo real + markup 2x
 """
 import requests
+import json
 import os
 import time
 import re
+import sqlite3
+import hashlib
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
 load_dotenv()
 
 store = os.getenv('SHOPIFY_STORE_URL')
 token = os.getenv('SHOPIFY_ACCESS_TOKEN')
 headers = {'X-Shopify-Access-Token': token, 'Content-Type': 'application/json'}
 base_url = f'https://{store}/admin/api/2024-01'
+graphql_url = f'{base_url}/graphql.json'
+
+MAX_WORKERS = 8
+
+class RateLimiter:
+    """Controle de vazão guiado pelo bucket da própria Shopify
+
+    Em vez de um ritmo fixo, lê o uso do bucket em cada resposta
+    (X-Shopify-Shop-Api-Call-Limit na REST, extensions.cost na GraphQL) e só
+    segura novas requisições quando ele está quase cheio ou após um 429.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._liberado_em = 0.0
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                espera = self._liberado_em - time.monotonic()
+            if espera <= 0:
+                return
+            time.sleep(espera)
+
+    def pausar(self, segundos):
+        with self._lock:
+            self._liberado_em = max(self._liberado_em, time.monotonic() + segundos)
+
+    def registrar(self, r, data=None):
+        """Atualiza o estado do bucket a partir de uma resposta"""
+        if r.status_code == 429:
+            self.pausar(float(r.headers.get('Retry-After', 2)))
+            return
+
+        limite = r.headers.get('X-Shopify-Shop-Api-Call-Limit')
+        if limite:
+            usado, capacidade = map(int, limite.split('/'))
+            if usado >= capacidade - 2:
+                self.pausar(0.5)
+
+        custo = ((data or {}).get('extensions') or {}).get('cost')
+        if custo:
+            # GraphQL: espera até recuperar pontos para mais uma query
+            throttle = custo['throttleStatus']
+            faltando = custo['requestedQueryCost'] - throttle['currentlyAvailable']
+            if faltando > 0:
+                self.pausar(faltando / throttle['restoreRate'])
+
+def graphql_throttled(data):
+    """True se a Shopify recusou a query por falta de pontos (THROTTLED)"""
+    return any(
+        (e.get('extensions') or {}).get('code') == 'THROTTLED'
+        for e in (data or {}).get('errors', [])
+    )
+
+limiter = RateLimiter()
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+
+# Sessão compartilhada: reaproveita conexões TCP/TLS entre as threads e
+# repete GET/PUT em 429/5xx (respeitando Retry-After)
+session = requests.Session()
+session.headers.update(headers)
+retry = Retry(total=5, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False)
+session.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=retry))
 
 # Preços FIXOS por categoria (venda, de)
 # Baseado em: Custo AliExpress + Frete + Impostos (~R$70-150) x Markup 2x
@@ -23,84 +101,319 @@ PRECOS = {
     "colares": (119.90, 169.90),
     "pulseiras": (99.90, 139.90),
     "aneis": (79.90, 109.90),
-    "anéis": (79.90, 109.90),
     "relogios": (189.90, 269.90),
-    "relógios": (189.90, 269.90),
     "oculos": (129.90, 179.90),
-    "óculos": (129.90, 179.90),
     "bolsas": (199.90, 279.90),
     "carteiras": (89.90, 129.90),
     "acessorios": (99.90, 139.90),
-    "acessórios": (99.90, 139.90),
 }
 
-def get_all_products():
-    """Busca todos os produtos"""
-    produtos = []
+# Uma única regex com um grupo por categoria: o product_type é varrido uma vez
+PRECOS_PATTERN = re.compile("|".join(f"(?P<{cat}>{re.escape(cat)})" for cat in PRECOS))
+# Com várias categorias no product_type vale a primeira na ordem de PRECOS
+PRECOS_PRIORIDADE = {cat: i for i, cat in enumerate(PRECOS)}
+
+# Tolerância (R$) para considerar um preço correto
+TOLERANCIA = 5
+
+def montar_filtro():
+    """Filtro de busca da Shopify que descarta produtos já no preço certo
+
+    Categorias com product_type exato só trazem produtos fora da faixa de
+    tolerância; qualquer outro product_type vem completo e é decidido
+    localmente por obter_preco_categoria.
+    """
+    clausulas = []
+    for cat, (venda, _) in PRECOS.items():
+        clausulas.append(
+            f"(product_type:{cat} AND (price:<={venda - TOLERANCIA:.2f} OR price:>={venda + TOLERANCIA:.2f}))"
+        )
+    clausulas.append("(" + " AND ".join(f"NOT product_type:{cat}" for cat in PRECOS) + ")")
+    return " OR ".join(clausulas)
+
+# Bulk operation: a Shopify gera um JSONL com os produtos + variantes
+BULK_QUERY = '''
+mutation {
+  bulkOperationRunQuery(
+    query: """
+    {
+      products(query: "__FILTRO__") {
+        edges {
+          node {
+            id
+            title
+            productType
+            variants {
+              edges {
+                node {
+                  id
+                  price
+                }
+              }
+            }
+          }
+        }
+      }
+    }
+    """
+  ) {
+    bulkOperation { id status }
+    userErrors { field message }
+  }
+}
+'''.replace('__FILTRO__', montar_filtro())
+
+BULK_STATUS_QUERY = '''
+{
+  currentBulkOperation {
+    id
+    status
+    errorCode
+    url
+  }
+}
+'''
+
+def graphql(query, variables=None):
+    """Executa uma query GraphQL e retorna o JSON (ou None em erro)"""
+    payload = {'query': query}
+    if variables:
+        payload['variables'] = variables
+    while True:
+        limiter.acquire()
+        r = session.post(graphql_url, json=payload)
+        data = json_loads(r.content) if r.status_code == 200 else None
+        limiter.registrar(r, data)
+        if r.status_code != 429 and not graphql_throttled(data):
+            break
+
+    if r.status_code != 200:
+        print(f"Erro GraphQL: {r.status_code}")
+        return None
+    if data.get('errors'):
+        print(f"Erro GraphQL: {data['errors']}")
+        return None
+    return data.get('data')
+
+def gid_para_id(gid):
+    """Converte 'gid://shopify/Product/123' em 123"""
+    return int(gid.rsplit('/', 1)[-1])
+
+def iniciar_bulk_operation():
+    """Roda a bulk operation e retorna a URL do JSONL
+
+    Retorna None se a bulk operation não estiver disponível e '' se o
+    catálogo estiver vazio (a Shopify não gera arquivo).
+    """
+    data = graphql(BULK_QUERY)
+    if not data:
+        return None
+
+    erros = data['bulkOperationRunQuery']['userErrors']
+    if erros:
+        print(f"Bulk operation recusada: {erros}")
+        return None
+
+    print("⏳ Bulk operation iniciada, aguardando Shopify...")
+    while True:
+        time.sleep(2)
+        status = graphql(BULK_STATUS_QUERY)
+        if not status:
+            return None
+        op = status['currentBulkOperation']
+        if op['status'] == 'COMPLETED':
+            return op.get('url') or ''
+        if op['status'] in ('FAILED', 'CANCELED', 'EXPIRED'):
+            print(f"Bulk operation {op['status']}: {op.get('errorCode')}")
+            return None
+
+def iter_products_bulk(url):
+    """Lê o JSONL da bulk operation linha a linha, um produto por vez
+
+    Cada produto vem em uma linha seguida das suas variantes (com
+    __parentId), então só o produto atual fica em memória.
+    """
+    produto = None
+    with requests.get(url, stream=True) as r:
+        r.raise_for_status()
+        for line in r.iter_lines():
+            if not line:
+                continue
+            node = json_loads(line)
+            if node.get('__parentId') is None:
+                if produto:
+                    yield produto
+                produto = {
+                    'id': gid_para_id(node['id']),
+                    'title': node.get('title', ''),
+                    'product_type': node.get('productType', ''),
+                    'variants': [],
+                }
+            elif produto:
+                produto['variants'].append({
+                    'id': gid_para_id(node['id']),
+                    'price': node.get('price', '0'),
+                })
+    if produto:
+        yield produto
+
+def iter_products_rest():
+    """Percorre todos os produtos paginando a REST API (fallback)"""
     url = f'{base_url}/products.json?limit=250'
 
     while url:
-        r = requests.get(url, headers=headers)
-        if r.status_code == 200:
-            data = r.json()
-            produtos.extend(data.get('products', []))
-            link = r.headers.get('Link', '')
-            if 'rel="next"' in link:
-                match = re.search(r'<([^>]+)>; rel="next"', link)
-                url = match.group(1) if match else None
-            else:
-                url = None
-        elif r.status_code == 429:
-            print("⏳ Rate limit, aguardando 30s...")
-            time.sleep(30)
-        else:
+        limiter.acquire()
+        r = session.get(url)
+        limiter.registrar(r)
+        if r.status_code != 200:
             print(f"Erro: {r.status_code}")
-            break
+            return
+        yield from json_loads(r.content).get('products', [])
+        link = r.headers.get('Link', '')
+        if 'rel="next"' in link:
+            match = re.search(r'<([^>]+)>; rel="next"', link)
+            url = match.group(1) if match else None
+        else:
+            url = None
+
+def get_all_products():
+    """Gera todos os produtos (bulk operation, com fallback para REST)"""
+    url = iniciar_bulk_operation()
+    if url is None:
+        print("↩️  Bulk operation indisponível, usando paginação REST...")
+        yield from iter_products_rest()
+    elif url:
+        yield from iter_products_bulk(url)
+
+# Tabela de tradução para remover acentos em uma única chamada C
+ACENTOS = str.maketrans("áàâãäéèêëíìîïóòôõöúùûüç", "aaaaaeeeeiiiiooooouuuuc")
 
-    return produtos
+def normalizar(texto):
+    """Minúsculas sem acentos ("Anéis" → "aneis")"""
+    return texto.lower().translate(ACENTOS)
 
+@lru_cache(maxsize=None)
 def obter_preco_categoria(product_type):
     """Retorna preço baseado na categoria"""
-    pt_lower = product_type.lower() if product_type else ""
-
-    for cat, precos in PRECOS.items():
-        if cat in pt_lower:
-            return precos
+    encontradas = {m.lastgroup for m in PRECOS_PATTERN.finditer(normalizar(product_type or ""))}
+    if encontradas:
+        return PRECOS[min(encontradas, key=PRECOS_PRIORIDADE.__getitem__)]
 
     # Fallback
     return (99.90, 139.90)
 
-def corrigir_precos(produto):
+VARIANTS_BULK_UPDATE = '''
+mutation productVariantsBulkUpdate($productId: ID!, $variants: [ProductVariantsBulkInput!]!) {
+  productVariantsBulkUpdate(productId: $productId, variants: $variants) {
+    userErrors { field message }
+  }
+}
+'''
+
+# Corpo da requisição pré-serializado: só os ids e preços são formatados
+# por produto, sem montar dicts nem passar pelo json.dumps
+PAYLOAD_TEMPLATE = (
+    b'{"query":' + json.dumps(VARIANTS_BULK_UPDATE).encode() +
+    b',"variables":{"productId":"gid://shopify/Product/%d","variants":[%s]}}'
+)
+VARIANTE_TEMPLATE = b'{"id":"gid://shopify/ProductVariant/%d","price":"%.2f","compareAtPrice":"%.2f"}'
+
+# Máximo de variantes por mutation
+VARIANTS_POR_LOTE = 100
+
+def atualizar_variantes(pid, variants, preco_novo, preco_de):
+    """Atualiza o preço de todas as variantes com productVariantsBulkUpdate
+
+    Retorna None em caso de sucesso ou a mensagem de erro.
+    """
+    entradas = [VARIANTE_TEMPLATE % (v['id'], preco_novo, preco_de) for v in variants]
+
+    for i in range(0, len(entradas), VARIANTS_POR_LOTE):
+        payload = PAYLOAD_TEMPLATE % (pid, b','.join(entradas[i:i + VARIANTS_POR_LOTE]))
+        while True:
+            limiter.acquire()
+            r = session.post(graphql_url, data=payload)
+            data = json_loads(r.content) if r.status_code == 200 else None
+            limiter.registrar(r, data)
+            if r.status_code != 429 and not graphql_throttled(data):
+                break
+
+        if r.status_code != 200:
+            return f"Erro: {r.status_code}"
+        if data.get('errors'):
+            return f"Erro: {data['errors'][0].get('message')}"
+        erros = data['data']['productVariantsBulkUpdate']['userErrors']
+        if erros:
+            return f"Erro: {erros[0]['message']}"
+
+    return None
+
+# Journal das variantes já corrigidas: se o script for interrompido, a
+# próxima execução do mesmo dia (com a mesma tabela) retoma de onde parou
+JOURNAL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'precos_journal.db')
+
+def chave_execucao():
+    """Chave de idempotência: mesma tabela de preços, mesmo dia"""
+    tabela = json.dumps(sorted(PRECOS.items())).encode()
+    return f"{time.strftime('%Y-%m-%d')}:{hashlib.sha1(tabela).hexdigest()[:12]}"
+
+def abrir_journal():
+    conn = sqlite3.connect(JOURNAL_PATH)
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS done ('
+        'run TEXT, vid INTEGER, price REAL, ts REAL, PRIMARY KEY (run, vid))'
+    )
+    return conn
+
+def carregar_feitos(conn, run):
+    """Retorna {variant_id: preço} já gravados nesta execução"""
+    return dict(conn.execute('SELECT vid, price FROM done WHERE run = ?', (run,)))
+
+def registrar_feitos(conn, run, variants, preco):
+    agora = time.time()
+    with conn:
+        conn.executemany(
+            'INSERT OR REPLACE INTO done VALUES (?, ?, ?, ?)',
+            [(run, v['id'], preco, agora) for v in variants]
+        )
+
+def planejar_correcoes(produtos, feitos=None):
+    """Decide localmente, em uma única passada, quem precisa de novo preço
+
+    Retorna (pendentes, pulados), onde pendentes são tuplas
+    (produto, preco_atual, preco_novo, preco_de). Nada aqui toca a rede, e a
+    categoria é resolvida uma vez por product_type distinto (lru_cache).
+    Produtos cujas variantes já estão no journal (`feitos`) são pulados.
+    """
+    feitos = feitos or {}
+    pendentes = []
+    pulados = 0
+    for p in produtos:
+        variants = p.get('variants')
+        preco_atual = float(variants[0].get('price', 0)) if variants else 0.0
+        preco_novo, preco_de = obter_preco_categoria(p.get('product_type') or '')
+
+        # Se já está no preço correto (dentro da tolerância), pula
+        if variants and abs(preco_novo - preco_atual) < TOLERANCIA:
+            pulados += 1
+        elif variants and all(feitos.get(v['id']) == preco_novo for v in variants):
+            pulados += 1
+        else:
+            pendentes.append((p, preco_atual, preco_novo, preco_de))
+
+    return pendentes, pulados
+
+def corrigir_precos(produto, preco_atual, preco_novo, preco_de):
     """Corrige os preços de um produto"""
-    pid = produto['id']
-    product_type = produto.get('product_type', '')
     variants = produto.get('variants', [])
 
     if not variants:
         return False, "Sem variantes"
 
-    preco_atual = float(variants[0].get('price', 0))
-    preco_novo, preco_de = obter_preco_categoria(product_type)
-
-    # Se já está no preço correto (tolerância de R$5), pula
-    if abs(preco_novo - preco_atual) < 5:
-        return False, "OK"
-
-    # Atualiza todas as variantes
-    for v in variants:
-        vid = v['id']
-        url = f'{base_url}/variants/{vid}.json'
-        data = {
-            'variant': {
-                'id': vid,
-                'price': f'{preco_novo:.2f}',
-                'compare_at_price': f'{preco_de:.2f}'
-            }
-        }
-        r = requests.put(url, headers=headers, json=data)
-        if r.status_code != 200:
-            return False, f"Erro: {r.status_code}"
-        time.sleep(0.2)
+    # Atualiza todas as variantes em uma única requisição
+    erro = atualizar_variantes(produto['id'], variants, preco_novo, preco_de)
+    if erro:
+        return False, erro
 
     return True, f"R$ {preco_atual:.2f} → R$ {preco_novo:.2f}"
 
@@ -110,33 +423,32 @@ def main():
     print("="*60)
     print("\n📋 Tabela de preços por categoria:")
     for cat, (venda, de) in sorted(PRECOS.items()):
-        if cat in ["anéis", "relógios", "óculos", "acessórios"]:
-            continue
         print(f"   {cat.capitalize()}: R$ {venda:.2f} (de R$ {de:.2f})")
     print("="*60)
 
-    produtos = get_all_products()
-    print(f"\n📦 Total: {len(produtos)} produtos\n")
+    journal = abrir_journal()
+    run = chave_execucao()
+
+    # Os produtos chegam em streaming; só os pendentes ficam em memória
+    pendentes, pulados = planejar_correcoes(get_all_products(), carregar_feitos(journal, run))
+    print(f"\n📦 Total: {len(pendentes) + pulados} produtos verificados, {len(pendentes)} a corrigir\n")
+    corrigidos = erros = 0
 
-    corrigidos = erros = pulados = 0
+    # Um produto = uma mutation; só os pendentes vão para o pool
+    resultados = executor.map(lambda item: corrigir_precos(*item), pendentes)
 
-    for i, p in enumerate(produtos, 1):
+    for i, ((p, _, preco_novo, _), (ok, msg)) in enumerate(zip(pendentes, resultados), 1):
         titulo = p['title'][:35]
         cat = p.get('product_type', 'N/A')
 
-        ok, msg = corrigir_precos(p)
-
         if ok:
-            print(f"[{i}/{len(produtos)}] ✅ [{cat}] {titulo}... {msg}")
+            print(f"[{i}/{len(pendentes)}] ✅ [{cat}] {titulo}... {msg}")
+            registrar_feitos(journal, run, p['variants'], preco_novo)
             corrigidos += 1
-        elif "OK" in msg:
-            pulados += 1
         else:
-            print(f"[{i}/{len(produtos)}] ❌ {titulo}... {msg}")
+            print(f"[{i}/{len(pendentes)}] ❌ {titulo}... {msg}")
             erros += 1
 
-        time.sleep(0.3)
-
     print("\n" + "="*60)
     print(f"✅ CONCLUÍDO!")
     print(f"   Corrigidos: {corrigidos}")
@@ -144,6 +456,8 @@ def main():
     print(f"   Erros: {erros}")
     print("="*60)
 
+    journal.close()
+
 if __name__ == "__main__":
     main()
 
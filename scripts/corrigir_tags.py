@@ -5,15 +5,73 @@ Usa o product_type existente para definir a tag cat: correta
 """
 import requests
 import os
+import json
+import re
 import time
+import random
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from urllib.parse import quote
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
+
 load_dotenv()
 
 store = os.getenv('SHOPIFY_STORE_URL')
 token = os.getenv('SHOPIFY_ACCESS_TOKEN')
 headers = {'X-Shopify-Access-Token': token, 'Content-Type': 'application/json'}
 base_url = f'https://{store}/admin/api/2024-01'
+graphql_url = f'{base_url}/graphql.json'
+
+MAX_WORKERS = 4
+
+# Sessão com keep-alive: um único pool para o host da loja, com no máximo
+# 8 conexões (>= MAX_WORKERS); pool_block faz a thread esperar uma conexão
+# livre em vez de abrir sockets extras
+SESSION = requests.Session()
+SESSION.headers.update(headers)
+SESSION.mount(f'https://{store}/', HTTPAdapter(pool_connections=1, pool_maxsize=8, pool_block=True, max_retries=0))
+
+# Resolve o host já na importação para a primeira requisição não pagar o DNS
+# (aquece o cache do resolvedor do sistema; falha aqui não é fatal)
+if store:
+    try:
+        socket.getaddrinfo(store, 443, type=socket.SOCK_STREAM)
+    except OSError:
+        pass
+
+class TokenBucket:
+    """Token bucket reabastecido a `rate` tokens/s (REST da Shopify: 2/s)"""
+
+    def __init__(self, rate=2):
+        self.interval = 1 / rate
+        self._tokens = threading.BoundedSemaphore(max(1, int(rate)))
+        threading.Thread(target=self._refill, daemon=True).start()
+
+    def _refill(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self._tokens.release()
+            except ValueError:
+                pass  # Balde cheio
+
+    def __enter__(self):
+        self._tokens.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+bucket = TokenBucket(rate=2)
 
 # Mapeamento de product_type para tag cat:
 TYPE_TO_CAT = {
@@ -32,32 +90,122 @@ TYPE_TO_CAT = {
     "acessórios": "cat:acessorios",
 }
 
+# Chaves normalizadas uma única vez
+NORM = {k.lower().strip(): v for k, v in TYPE_TO_CAT.items()}
+
+@lru_cache(maxsize=None)
+def _classify(product_type):
+    """Tag cat: para um product_type (memoizado por valor distinto)"""
+    return NORM.get(product_type.lower().strip(), 'cat:acessorios')
+
+# Só os campos usados pelo script (o payload completo é 20-50x maior)
+CAMPOS = 'id,title,product_type,tags,updated_at'
+
+# Cache local: nas próximas execuções só busca o que mudou (updated_at_min)
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'products_cache.json')
+
+def carregar_cache():
+    try:
+        with open(CACHE_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def salvar_cache(produtos):
+    updated_at = max((p.get('updated_at') or '' for p in produtos.values()), default='')
+    with open(CACHE_PATH, 'w', encoding='utf-8') as f:
+        json.dump({'updated_at': updated_at, 'products': produtos}, f, ensure_ascii=False)
+
 def get_all_products():
-    """Busca todos os produtos com retry"""
-    import re as regex_module
+    """Busca todos os produtos (incremental a partir do cache local)"""
+    cache = carregar_cache()
+    url = f'{base_url}/products.json?limit=250&fields={CAMPOS}'
+
+    if cache and cache.get('updated_at'):
+        produtos = cache['products']
+        url += f"&updated_at_min={quote(cache['updated_at'])}"
+    else:
+        produtos = {}
+
+    for p in buscar_produtos(url):
+        produtos[str(p['id'])] = p
+
+    # Produtos removidos não aparecem no incremental: confere a contagem
+    if cache:
+        r = SESSION.get(f'{base_url}/products/count.json')
+        if r.status_code == 200 and r.json().get('count') != len(produtos):
+            print("♻️  Cache desatualizado, buscando todos os produtos...")
+            produtos = {
+                str(p['id']): p
+                for p in buscar_produtos(f'{base_url}/products.json?limit=250&fields={CAMPOS}')
+            }
+
+    salvar_cache(produtos)
+    return list(produtos.values())
+
+def respeitar_limite(r, tentativa=0):
+    """Espera o necessário de acordo com os headers de limite da Shopify
+
+    Em 429 usa o Retry-After (com backoff exponencial + jitter se as
+    tentativas se repetirem); nas demais respostas só pausa quando o bucket
+    da REST passa de 80%.
+    """
+    if r.status_code == 429:
+        retry_after = float(r.headers.get('Retry-After', '2'))
+        backoff = (2 ** tentativa) * random.uniform(0.5, 1.5)
+        time.sleep(max(retry_after, backoff))
+        return
+
+    limite = r.headers.get('X-Shopify-Shop-Api-Call-Limit')
+    if limite:
+        usado, capacidade = map(int, limite.split('/'))
+        if usado / capacidade > 0.8:
+            time.sleep(0.5)
+
+def ler_produtos(r):
+    """Extrai os produtos de uma resposta, em streaming quando possível
+
+    Com ijson, cada produto é lido direto do socket e só os campos usados
+    são mantidos, sem materializar o JSON da página inteira.
+    """
+    if not IJSON_AVAILABLE:
+        return r.json().get('products', [])
+
+    r.raw.decode_content = True
+    campos = CAMPOS.split(',')
+    return [
+        {campo: obj.get(campo) for campo in campos}
+        for obj in ijson.items(r.raw, 'products.item')
+    ]
+
+# Próxima página no header Link (compilado uma vez)
+_LINK_NEXT = re.compile(r'<([^>]+)>;\s*rel="next"')
+
+def buscar_produtos(url):
+    """Busca os produtos de uma URL paginada, com retry"""
     produtos = []
-    url = f'{base_url}/products.json?limit=250'
 
     max_retries = 3
 
     while url:
         for attempt in range(max_retries):
-            r = requests.get(url, headers=headers)
+            r = SESSION.get(url, stream=True)
+            respeitar_limite(r, attempt)
 
             if r.status_code == 200:
-                data = r.json()
-                produtos.extend(data.get('products', []))
+                produtos.extend(ler_produtos(r))
                 link = r.headers.get('Link', '')
                 if 'rel="next"' in link:
-                    match = regex_module.search(r'<([^>]+)>; rel="next"', link)
+                    match = _LINK_NEXT.search(link)
                     url = match.group(1) if match else None
                 else:
                     url = None
                 break
             elif r.status_code == 429:
-                print(f"⏳ Rate limit, aguardando 30s... (tentativa {attempt+1})")
-                time.sleep(30)
+                r.close()
+                print(f"⏳ Rate limit, aguardando... (tentativa {attempt+1})")
             else:
+                r.close()
                 print(f"Erro na API: {r.status_code}")
                 url = None
                 break
@@ -68,36 +216,87 @@ def get_all_products():
     return produtos
 
 def corrigir_tags(produto):
-    """Corrige as tags do produto para incluir cat:"""
-    pid = produto['id']
-    product_type = produto.get('product_type', '').lower().strip()
+    """Calcula as tags do produto com a cat: correta
+
+    Retorna (cat_tag, tags) ou None se o produto já tem a tag correta.
+    """
     tags_atuais = produto.get('tags', '')
 
     # Encontra a tag cat: correta
-    cat_tag = TYPE_TO_CAT.get(product_type, 'cat:acessorios')
+    cat_tag = _classify(produto.get('product_type') or '')
+
+    # Divide uma vez só; a comparação é por tag inteira, então "cat:aneisnovos"
+    # não conta como "cat:aneis"
+    tags_lista_raw = [t for t in map(str.strip, tags_atuais.split(',')) if t]
 
     # Se já tem a tag correta, pula
-    if cat_tag in tags_atuais:
-        return False, "Já tem tag correta"
+    if cat_tag in set(tags_lista_raw):
+        return None
 
     # Remove qualquer tag cat: antiga
-    tags_lista = [t.strip() for t in tags_atuais.split(',') if t.strip() and not t.strip().startswith('cat:')]
+    tags_lista = [t for t in tags_lista_raw if not t.startswith('cat:')]
 
     # Adiciona a tag cat: correta
     tags_lista.insert(0, cat_tag)
 
-    # Junta as tags
-    novas_tags = ', '.join(tags_lista)
+    return cat_tag, tags_lista
 
-    # Atualiza o produto
-    url = f'{base_url}/products/{pid}.json'
-    data = {'product': {'id': pid, 'tags': novas_tags}}
-    r = requests.put(url, headers=headers, json=data)
+# Produtos por requisição GraphQL (uma mutation aliasada por produto)
+TAMANHO_LOTE = 10
 
-    if r.status_code == 200:
-        return True, f"{cat_tag}"
-    else:
-        return False, f"Erro API: {r.status_code}"
+# Resultado por produto: só CORRIGIDO/ERRO chegaram a usar a API
+PULADO, CORRIGIDO, ERRO = 'pulado', 'corrigido', 'erro'
+
+# Produtos processados entre duas linhas de progresso no terminal
+PROGRESSO_A_CADA = 100
+
+def atualizar_lote(lote):
+    """Atualiza as tags de um lote de (produto, cat_tag, tags) em uma única requisição
+
+    Retorna uma lista de (status, msg) na mesma ordem do lote.
+    """
+    params = ', '.join(f'$p{i}: ProductInput!' for i in range(len(lote)))
+    campos = '\n'.join(
+        f'  p{i}: productUpdate(input: $p{i}) {{ userErrors {{ field message }} }}'
+        for i in range(len(lote))
+    )
+    query = f'mutation({params}) {{\n{campos}\n}}'
+    variables = {
+        f'p{i}': {'id': f"gid://shopify/Product/{p['id']}", 'tags': tags}
+        for i, (p, _, tags) in enumerate(lote)
+    }
+
+    for tentativa in range(3):
+        r = SESSION.post(graphql_url, json={'query': query, 'variables': variables})
+        respeitar_limite(r, tentativa)
+        if r.status_code != 429:
+            break
+
+    if r.status_code != 200:
+        return [(ERRO, f"Erro API: {r.status_code}")] * len(lote)
+
+    data = r.json()
+
+    # Respeita o custo da GraphQL: espera recuperar pontos para o próximo lote
+    custo = (data.get('extensions') or {}).get('cost')
+    if custo:
+        throttle = custo['throttleStatus']
+        faltando = custo['requestedQueryCost'] - throttle['currentlyAvailable']
+        if faltando > 0:
+            time.sleep(faltando / throttle['restoreRate'])
+
+    if data.get('errors'):
+        msg = f"Erro API: {data['errors'][0].get('message')}"
+        return [(ERRO, msg)] * len(lote)
+
+    resultados = []
+    for i, (_, cat_tag, _) in enumerate(lote):
+        erros = data['data'][f'p{i}']['userErrors']
+        if erros:
+            resultados.append((ERRO, f"Erro API: {erros[0]['message']}"))
+        else:
+            resultados.append((CORRIGIDO, cat_tag))
+    return resultados
 
 def main():
     print("\n" + "="*60)
@@ -107,34 +306,46 @@ def main():
     produtos = get_all_products()
     print(f"\n📦 Total de produtos: {len(produtos)}\n")
 
-    corrigidos = 0
-    erros = 0
-    pulados = 0
+    contagem = {PULADO: 0, CORRIGIDO: 0, ERRO: 0}
 
-    for i, p in enumerate(produtos, 1):
-        titulo = p['title'][:40]
-        product_type = p.get('product_type', 'Sem tipo')
+    # Só os produtos que mudam entram nos lotes; pulados custam só CPU
+    pendentes = []
+    for p in produtos:
+        correcao = corrigir_tags(p)
+        if correcao is None:
+            contagem[PULADO] += 1
+        else:
+            pendentes.append((p, *correcao))
 
-        ok, msg = corrigir_tags(p)
+    lotes = [pendentes[i:i + TAMANHO_LOTE] for i in range(0, len(pendentes), TAMANHO_LOTE)]
 
-        if ok:
-            print(f"[{i}/{len(produtos)}] ✅ {titulo}... → {msg}")
-            corrigidos += 1
-        elif "Já tem" in msg:
-            pulados += 1
-        else:
-            print(f"[{i}/{len(produtos)}] ❌ {titulo}... → {msg}")
-            erros += 1
+    def _task(lote):
+        with bucket:
+            return atualizar_lote(lote)
 
-        time.sleep(0.3)
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        futures = {pool.submit(_task, lote): lote for lote in lotes}
+
+        # Erros saem na hora; o progresso é agrupado a cada PROGRESSO_A_CADA
+        i = 0
+        for future in as_completed(futures):
+            for (p, _, _), (status, msg) in zip(futures[future], future.result()):
+                i += 1
+                contagem[status] += 1
+                if status == ERRO:
+                    print(f"[{i}/{len(pendentes)}] ❌ {p['title'][:40]}... → {msg}")
+                if i % PROGRESSO_A_CADA == 0 or i == len(pendentes):
+                    print(f"[{i}/{len(pendentes)}] ✅ {contagem[CORRIGIDO]} corrigidos, ❌ {contagem[ERRO]} erros", flush=True)
 
     print("\n" + "="*60)
     print(f"✅ CONCLUÍDO!")
-    print(f"   Corrigidos: {corrigidos}")
-    print(f"   Pulados: {pulados}")
-    print(f"   Erros: {erros}")
+    print(f"   Corrigidos: {contagem[CORRIGIDO]}")
+    print(f"   Pulados: {contagem[PULADO]}")
+    print(f"   Erros: {contagem[ERRO]}")
     print("="*60)
 
+    SESSION.close()
+
 if __name__ == "__main__":
     main()
 
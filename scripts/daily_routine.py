@@ -6,38 +6,73 @@ Pode ser configurada para rodar 3x ao dia (manhã, tarde, noite)
 """
 import os
 import sys
+import json
+import hashlib
 import argparse
+import atexit
 import logging
+import logging.handlers
 import schedule
 import time
+import queue
+import threading
 from datetime import datetime
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.mining.aliexpress_scraper import AliExpressScraper
-from src.mining.criteria import CriteriosMineracao
-from src.ai.claude_client import ClaudeClient
-from src.dsers.automation import DSersAutomation
-from src.shopify.client import ShopifyClient
-from src.health.checker import HealthChecker
+# Scraper, Claude, DSers e health check (Selenium, BS4, SDKs) são importados
+# dentro das fases que os usam: --dashboard só carrega o Dashboard
 from src.dashboard import Dashboard
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler(f'logs/routine_{datetime.now().strftime("%Y%m%d")}.log')
-    ]
-)
-logger = logging.getLogger(__name__)
-
 # Diretórios
 Path("logs").mkdir(exist_ok=True)
 Path("data").mkdir(exist_ok=True)
 Path("relatorios").mkdir(exist_ok=True)
 
+# Logging via fila: o loop de mineração/IA só enfileira o registro e uma
+# thread do QueueListener faz a escrita em console e arquivo
+_log_formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(message)s')
+_log_handlers = [
+    logging.StreamHandler(),
+    logging.FileHandler(f'logs/routine_{datetime.now().strftime("%Y%m%d")}.log', encoding='utf-8')
+]
+for _handler in _log_handlers:
+    _handler.setFormatter(_log_formatter)
+
+_log_queue = queue.Queue(-1)
+logging.basicConfig(level=logging.INFO, handlers=[logging.handlers.QueueHandler(_log_queue)])
+_log_listener = logging.handlers.QueueListener(_log_queue, *_log_handlers)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+logger = logging.getLogger(__name__)
+
+# Cache das buscas no AliExpress: a lista "mais vendidos" muda devagar, então
+# execuções na mesma hora reaproveitam o resultado sem abrir o Chrome
+SCRAPE_CACHE_DIR = Path("data/scrape_cache")
+
+
+def buscar_categoria_cache(scraper, categoria: str, quantidade: int) -> tuple:
+    """
+    Busca uma categoria usando cache em disco por (categoria, quantidade, hora)
+
+    Returns:
+        (produtos, veio_do_cache)
+    """
+    chave = f"{categoria}:{quantidade}:{time.strftime('%Y%m%d%H')}"
+    arquivo = SCRAPE_CACHE_DIR / f"{hashlib.sha1(chave.encode()).hexdigest()}.json"
+
+    if arquivo.exists():
+        logger.info(f"♻️ Usando busca em cache: {categoria}")
+        return json.loads(arquivo.read_text(encoding="utf-8")), True
+
+    produtos = scraper.buscar_categoria(categoria, quantidade)
+    if produtos:
+        SCRAPE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        arquivo.write_text(json.dumps(produtos, ensure_ascii=False), encoding="utf-8")
+    return produtos, False
+
 
 class RotinaAutomatizada:
     """Gerencia rotina diária de automação"""
@@ -46,6 +81,54 @@ class RotinaAutomatizada:
         self.dashboard = Dashboard()
         self.categorias = ["jewelry", "watches", "bags", "earrings", "necklaces"]
         self.produtos_por_categoria = 5
+        self._parar_produtor = threading.Event()
+        self._scraper = None
+
+    def _obter_scraper(self):
+        """Scraper único do processo: o Chrome sobrevive entre categorias e execuções agendadas"""
+        if self._scraper is None:
+            from src.mining.aliexpress_scraper import AliExpressScraper
+
+            self._scraper = AliExpressScraper(headless=True)
+            atexit.register(self._shutdown)
+        return self._scraper
+
+    def _shutdown(self):
+        if self._scraper:
+            self._scraper._close_driver()
+
+    def _produzir_categorias(self, scraper, fila: queue.Queue):
+        """Thread produtora: busca cada categoria e entrega (categoria, produtos)"""
+        try:
+            for categoria in self.categorias:
+                if self._parar_produtor.is_set():
+                    break
+                logger.info(f"\n📁 Categoria: {categoria}")
+
+                try:
+                    produtos, em_cache = buscar_categoria_cache(
+                        scraper, categoria, self.produtos_por_categoria * 2
+                    )
+                except Exception as e:
+                    logger.error(f"Erro ao buscar {categoria}: {e}")
+                    continue
+
+                self._entregar(fila, (categoria, produtos))
+
+                if not em_cache:
+                    time.sleep(2)
+        finally:
+            # Sinaliza fim para o consumidor
+            self._entregar(fila, None)
+
+    def _entregar(self, fila: queue.Queue, item):
+        """put() que desiste se o consumidor já parou (evita travar a thread)"""
+        while not self._parar_produtor.is_set():
+            try:
+                fila.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
 
     def executar_mineracao(self) -> list:
         """Fase 1: Mineração de produtos"""
@@ -53,22 +136,38 @@ class RotinaAutomatizada:
         logger.info("🔍 FASE 1: MINERAÇÃO DE PRODUTOS")
         logger.info("="*60)
 
-        scraper = AliExpressScraper(headless=True)
+        from src.ai.claude_client import ClaudeClient
+
+        scraper = self._obter_scraper()
         ai_client = ClaudeClient(modelo="opus")
 
         produtos_aprovados = []
         total_minerados = 0
+        score_sum = 0
+
+        # Pipeline: a thread do scraper busca a próxima categoria enquanto a
+        # IA analisa a atual. Só essa thread toca no Selenium.
+        fila = queue.Queue(maxsize=2)
+        self._parar_produtor.clear()
+        produtor = threading.Thread(
+            target=self._produzir_categorias, args=(scraper, fila),
+            name="scraper", daemon=True
+        )
+        produtor.start()
 
         try:
-            for categoria in self.categorias:
-                logger.info(f"\n📁 Categoria: {categoria}")
-
-                produtos = scraper.buscar_categoria(categoria, self.produtos_por_categoria * 2)
+            while True:
+                item = fila.get()
+                if item is None:
+                    break
+                categoria, produtos = item
                 total_minerados += len(produtos)
 
-                for produto in produtos[:self.produtos_por_categoria]:
-                    # Análise com IA
-                    analise = ai_client.analisar_produto(produto)
+                # Análise com IA: uma chamada por lote em vez de uma por produto
+                selecionados = produtos[:self.produtos_por_categoria]
+                analises = ai_client.analisar_lote(selecionados)
+
+                for produto, analise in zip(selecionados, analises):
 
                     if analise and analise.aprovado and analise.score >= 70:
                         produto['ai_score'] = analise.score
@@ -76,19 +175,19 @@ class RotinaAutomatizada:
                         produto['ai_preco'] = analise.preco_sugerido
                         produto['viralidade_score'] = analise.viralidade.score if analise.viralidade else 0
                         produtos_aprovados.append(produto)
+                        score_sum += analise.score
 
                         logger.info(f"✅ Aprovado (Score: {analise.score}, Viral: {produto['viralidade_score']}): {produto['title'][:40]}...")
                     else:
                         score = analise.score if analise else 0
                         logger.debug(f"❌ Reprovado (Score: {score})")
 
-                time.sleep(2)
-
         finally:
-            scraper._close_driver()
+            self._parar_produtor.set()
+            produtor.join()
 
         # Registra métricas
-        score_medio = sum(p.get('ai_score', 0) for p in produtos_aprovados) / len(produtos_aprovados) if produtos_aprovados else 0
+        score_medio = score_sum / len(produtos_aprovados) if produtos_aprovados else 0
         self.dashboard.registrar_mineracao(total_minerados, len(produtos_aprovados), score_medio)
 
         logger.info(f"\n📊 Mineração: {len(produtos_aprovados)}/{total_minerados} aprovados")
@@ -104,6 +203,8 @@ class RotinaAutomatizada:
             logger.info("Nenhum produto para sincronizar")
             return {"adicionados": 0}
 
+        from src.dsers.automation import DSersAutomation
+
         dsers = DSersAutomation(headless=False)
 
         try:
@@ -122,6 +223,8 @@ class RotinaAutomatizada:
         logger.info("="*60)
 
         try:
+            from src.health.checker import HealthChecker
+
             checker = HealthChecker()
             resultado = checker.executar_verificacao_completa()
 
@@ -184,6 +287,16 @@ class RotinaAutomatizada:
         self.gerar_relatorios()
         return produtos
 
+    def _executar_agendado(self):
+        """Execução agendada: reaproveita o Chrome, mas sem cookies da rodada anterior"""
+        if self._scraper and self._scraper.driver:
+            try:
+                self._scraper.driver.delete_all_cookies()
+            except Exception as e:
+                logger.warning(f"⚠️ Chrome indisponível, reiniciando: {e}")
+                self._scraper._close_driver()
+        self.executar_rotina_completa()
+
     def agendar_execucoes(self, horarios: list = None):
         """
         Agenda execuções diárias
@@ -195,7 +308,7 @@ class RotinaAutomatizada:
             horarios = ["08:00", "14:00", "20:00"]
 
         for horario in horarios:
-            schedule.every().day.at(horario).do(self.executar_rotina_completa)
+            schedule.every().day.at(horario).do(self._executar_agendado)
             logger.info(f"⏰ Agendado para: {horario}")
 
         logger.info(f"🔄 Executando agendador... (Ctrl+C para parar)")
@@ -4,26 +4,51 @@
 """
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
 from bs4 import BeautifulSoup
+import soupsieve
 import time
 import re
 
+try:
+    import lxml  # noqa: F401
+    PARSER = 'lxml'
+except ImportError:
+    PARSER = 'html.parser'
+
 options = Options()
 options.add_argument('--window-size=1920,1080')
+# Sem imagens: a página carrega bem mais rápido e o diagnóstico é só do DOM
+options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
 
 print('🔍 Abrindo AliExpress...')
 driver = webdriver.Chrome(options=options)
 driver.get('https://www.aliexpress.com/category/200001679/jewelry-accessories.html?sortType=total_tranpro_desc')
-time.sleep(10)
+try:
+    WebDriverWait(driver, 15).until(
+        EC.presence_of_element_located((By.CSS_SELECTOR, 'a[href*="/item/"]'))
+    )
+except TimeoutException:
+    print('⚠️ Nenhum produto apareceu em 15s')
 
-# Scroll para carregar produtos
+# Scroll para carregar produtos (espera a página crescer, não um tempo fixo)
 print('📜 Fazendo scroll...')
 for i in range(5):
+    altura = driver.execute_script('return document.body.scrollHeight')
     driver.execute_script('window.scrollTo(0, document.body.scrollHeight);')
-    time.sleep(2)
+    try:
+        WebDriverWait(driver, 5).until(
+            lambda d: d.execute_script('return document.body.scrollHeight') > altura
+        )
+    except TimeoutException:
+        print('   Fim da página')
+        break
     print(f'   Scroll {i+1}/5')
 
-soup = BeautifulSoup(driver.page_source, 'html.parser')
+soup = BeautifulSoup(driver.page_source, PARSER)
 
 print(f'\n📄 Título: {driver.title}')
 print(f'📄 URL: {driver.current_url}')
@@ -41,17 +66,22 @@ seletores = [
     'div[data-widget-cid]',
 ]
 
-for sel in seletores:
-    try:
-        elementos = soup.select(sel)
-        if elementos:
-            print(f'\n✅ ENCONTRADO: {sel}')
-            print(f'   Total: {len(elementos)}')
-            if elementos:
-                classes = elementos[0].get('class', [])
-                print(f'   Classes: {classes[:3]}...' if len(classes) > 3 else f'   Classes: {classes}')
-    except Exception as e:
-        print(f'❌ Erro com {sel}: {e}')
+# Um único percurso da árvore com todos os seletores; depois cada elemento
+# é atribuído aos seletores que ele satisfaz (compilados uma vez)
+compilados = {sel: soupsieve.compile(sel) for sel in seletores}
+encontrados = {sel: [] for sel in seletores}
+
+for elem in soup.select(', '.join(seletores)):
+    for sel, padrao in compilados.items():
+        if padrao.match(elem):
+            encontrados[sel].append(elem)
+
+for sel, elementos in encontrados.items():
+    if elementos:
+        print(f'\n✅ ENCONTRADO: {sel}')
+        print(f'   Total: {len(elementos)}')
+        classes = elementos[0].get('class', [])
+        print(f'   Classes: {classes[:3]}...' if len(classes) > 3 else f'   Classes: {classes}')
 
 # Procura por links de produtos
 links = soup.find_all('a', href=re.compile(r'/item/\d+'))
@@ -3,28 +3,154 @@
 🤖 Automação Completa DSers + Claude Opus
 Busca produtos no DSers, analisa com IA e envia para Shopify automaticamente
 """
+import re
 import sys
+import json
 import time
+import random
+import asyncio
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque
 from pathlib import Path
+from typing import Optional
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.dsers.automation import DSersAutomation
 from src.dashboard import Dashboard
-from anthropic import Anthropic
+from src.cache import LLMCache, FileBackend
+import anthropic
+from anthropic import AsyncAnthropic
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.keys import Keys
+from selenium.common.exceptions import TimeoutException
 from dotenv import load_dotenv
 import os
+import requests
 
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
 logger = logging.getLogger(__name__)
 
+# Extrai todos os cards visíveis em uma única chamada ao navegador. Cada campo
+# usa a mesma ordem de seletores de fallback da versão com find_element; o
+# card recebe data-auto-idx para ser localizado depois só se for aprovado.
+_EXTRACT_PRODUCTS_JS = """
+const cardSelectors = [".product-item", "[class*='product-card']", "[class*='ProductCard']",
+                       ".supplier-product", "[class*='goods-item']"];
+const fieldSelectors = {
+    title: ["[class*='title']", "h3", "h4", ".name", "[class*='name']"],
+    price: ["[class*='price']", ".price", "span[class*='price']"],
+    orders: ["[class*='order']", "[class*='sold']", "[class*='sale']"],
+    rating: ["[class*='rating']", "[class*='star']", "[class*='score']"]
+};
+
+let cards = [];
+for (const sel of cardSelectors) {
+    cards = document.querySelectorAll(sel);
+    if (cards.length) break;
+}
+
+const firstText = (card, selectors) => {
+    for (const sel of selectors) {
+        const el = card.querySelector(sel);
+        const text = el ? el.innerText.trim() : "";
+        if (text) return text;
+    }
+    return "N/A";
+};
+
+// Identificador estável do card: atributo do produto, link do item ou título+preço
+const stableId = (card, product) => {
+    const attr = card.getAttribute("data-product-id") || card.getAttribute("data-id");
+    if (attr) return attr;
+    const link = card.querySelector("a[href*='/item/'], a[href*='product']");
+    if (link) return link.href;
+    return product.title + "|" + product.price;
+};
+
+return JSON.stringify(Array.from(cards, (card, index) => {
+    card.setAttribute("data-auto-idx", index);
+    const product = {index: index};
+    for (const field in fieldSelectors) product[field] = firstText(card, fieldSelectors[field]);
+    product.id = stableId(card, product);
+    return product;
+}));
+"""
+
+MODELO_CLAUDE = "claude-opus-4-20250514"
+
+# Endpoint JSON presumido da tela Find Supplier. NÃO VERIFICADO: URL, parâmetros
+# e formato da resposta não foram confirmados contra a DSers. Se a resposta não
+# tiver a lista esperada, search_products_api retorna None e a busca volta para a tela
+DSERS_SEARCH_API = "https://www.dsers.com/api/find-supplier/search"
+DSERS_API_MAX_PAGES = 10
+
+# Condições de espera no lugar dos sleeps fixos
+CARD_CSS = ".product-item, [class*='product-card'], [class*='ProductCard'], .supplier-product, [class*='goods-item']"
+TOAST_CSS = ".ant-message-notice, .ant-notification-notice, .toast"
+IMPORT_LIST_ITEM_CSS = ".ant-table-row, [class*='import-list'] [class*='product-item']"
+CONFIRM_XPATH = ("//button[contains(text(), 'Confirm') or contains(text(), 'OK') "
+                 "or contains(text(), 'Yes')]")
+
+# Navegadores (instâncias do DSers) em paralelo no run_full_cycle
+MAX_NAVEGADORES = 4
+
+# Produtos avaliados por chamada ao Claude: os critérios vão uma vez por lote
+CLAUDE_BATCH_SIZE = 10
+
+# Chamadas simultâneas e limites por minuto (80% do Tier 1 da Anthropic)
+CLAUDE_CONCORRENCIA = 4
+CLAUDE_RPM = 40
+CLAUDE_TPM = 16000
+CLAUDE_MAX_TENTATIVAS = 3
+
+# Scores já calculados valem por 7 dias (pedidos/rating mudam com o tempo)
+CLAUDE_CACHE_TTL = 7 * 86400
+
+# Message Batches API (--async): metade do custo, resultado em até 24h
+CLAUDE_BATCH_POLL = 30
+
+CRITERIOS_PROMPT = """CRITÉRIOS:
+1. Potencial viral (TikTok/Instagram)
+2. Margem de lucro (vender por 2-3x)
+3. Qualidade percebida
+4. Apelo visual/emocional
+5. Não ser produto muito saturado"""
+
+
+class LimitadorClaude:
+    """Limita requisições e tokens por minuto antes de cada chamada (proativo, não espera o 429)"""
+
+    def __init__(self, rpm: int = CLAUDE_RPM, tpm: int = CLAUDE_TPM):
+        self.intervalo = 60 / rpm
+        self.tpm = tpm
+        self._proxima = 0.0
+        self._janela = deque()  # (instante, tokens) do último minuto
+        self._lock = asyncio.Lock()
+
+    async def aguardar(self, tokens: int):
+        async with self._lock:
+            while True:
+                agora = time.monotonic()
+                while self._janela and self._janela[0][0] <= agora - 60:
+                    self._janela.popleft()
+
+                espera = self._proxima - agora
+                if self._janela and sum(t for _, t in self._janela) + tokens > self.tpm:
+                    espera = max(espera, self._janela[0][0] + 60 - agora)
+                if espera <= 0:
+                    break
+                await asyncio.sleep(espera)
+
+            self._proxima = agora + self.intervalo
+            self._janela.append((agora, tokens))
+
 
 class DSersFullAutomation:
     """Automação completa: DSers + Claude + Shopify"""
@@ -41,20 +167,71 @@ class DSersFullAutomation:
         "bag": "bolsas",
     }
 
-    def __init__(self):
-        self.dsers = DSersAutomation(headless=False)
+    def __init__(self, dsers: DSersAutomation = None, compartilhar_com: "DSersFullAutomation" = None):
+        """
+        Args:
+            dsers: Instância do DSers (um navegador); cria uma nova se None
+            compartilhar_com: Reaproveita Claude, cache, limitador e dashboard de
+                outra instância (workers paralelos do run_full_cycle)
+        """
+        self.dsers = dsers or DSersAutomation(headless=False)
+        self._api_session = None
+        self.modo_batch = False  # Scores pela Message Batches API (--async)
+
+        if compartilhar_com is not None:
+            self.modo_batch = compartilhar_com.modo_batch
+            self.dashboard = compartilhar_com.dashboard
+            self._dashboard_lock = compartilhar_com._dashboard_lock
+            self._loop = compartilhar_com._loop
+            self.claude = compartilhar_com.claude
+            self._limitador = compartilhar_com._limitador
+            self._cache = compartilhar_com._cache
+            self._dono_do_loop = False
+            return
+
         self.dashboard = Dashboard()
+        self._dashboard_lock = threading.Lock()
 
         # Claude API
         api_key = os.getenv("ANTHROPIC_API_KEY")
         if not api_key:
             raise ValueError("ANTHROPIC_API_KEY não configurada no .env")
 
-        self.claude = Anthropic(api_key=api_key)
+        # Cliente assíncrono em um event loop rodando em thread própria: qualquer
+        # thread envia corrotinas para ele e o limitador continua global
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="claude-loop", daemon=True).start()
+        self.claude = AsyncAnthropic(api_key=api_key)
+        self._limitador = LimitadorClaude()
+        self._cache = LLMCache(FileBackend(".cache/claude"))
+        self._dono_do_loop = True
         logger.info("✅ Claude Opus inicializado")
 
-    def analyze_product_with_claude(self, product_data: dict) -> int:
-        """Analisa produto com Claude Opus e retorna score 0-100"""
+    def _run(self, coro):
+        """Executa uma corrotina no loop do Claude e espera o resultado"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def _chamar_claude(self, prompt: str, max_tokens: int) -> str:
+        """Uma chamada ao Claude respeitando o limitador, com backoff em 429"""
+        await self._limitador.aguardar(len(prompt) // 4 + max_tokens)
+
+        for tentativa in range(CLAUDE_MAX_TENTATIVAS + 1):
+            try:
+                message = await self.claude.messages.create(
+                    model=MODELO_CLAUDE,
+                    max_tokens=max_tokens,
+                    messages=[{"role": "user", "content": prompt}]
+                )
+                return message.content[0].text
+            except anthropic.RateLimitError:
+                if tentativa == CLAUDE_MAX_TENTATIVAS:
+                    raise
+                espera = 2 ** tentativa + random.random()
+                logger.warning(f"⏳ Rate limit do Claude, aguardando {espera:.1f}s...")
+                await asyncio.sleep(espera)
+
+    async def _score_one(self, sem: asyncio.Semaphore, product_data: dict) -> Optional[int]:
+        """Analisa um produto e retorna score 0-100 (None se a chamada falhar)"""
         prompt = f"""Analise este produto de dropshipping para uma loja de acessórios femininos no Brasil.
 Dê um score de 0-100 baseado nos critérios abaixo.
 
@@ -64,32 +241,198 @@ PRODUTO:
 - Pedidos: {product_data.get('orders', 'N/A')}
 - Rating: {product_data.get('rating', 'N/A')}
 
-CRITÉRIOS:
-1. Potencial viral (TikTok/Instagram)
-2. Margem de lucro (vender por 2-3x)
-3. Qualidade percebida
-4. Apelo visual/emocional
-5. Não ser produto muito saturado
+{CRITERIOS_PROMPT}
 
 RESPONDA APENAS com um número inteiro de 0 a 100. Nada mais."""
 
+        async with sem:
+            try:
+                response = (await self._chamar_claude(prompt, max_tokens=10)).strip()
+                # Extrai apenas números
+                score = int(''.join(filter(str.isdigit, response[:3])))
+                return min(max(score, 0), 100)  # Garante 0-100
+
+            except Exception as e:
+                logger.error(f"Erro ao analisar com Claude: {e}")
+                return None
+
+    @staticmethod
+    def _prompt_lote(products: list) -> str:
+        linhas = '\n'.join(
+            f"{i}. Título: {p.get('title', 'N/A')} | Preço: {p.get('price', 'N/A')} | "
+            f"Pedidos: {p.get('orders', 'N/A')} | Rating: {p.get('rating', 'N/A')}"
+            for i, p in enumerate(products, 1)
+        )
+        return f"""Analise estes {len(products)} produtos de dropshipping para uma loja de acessórios femininos no Brasil.
+Dê um score de 0-100 para cada um baseado nos critérios abaixo.
+
+PRODUTOS:
+{linhas}
+
+{CRITERIOS_PROMPT}
+
+RESPONDA APENAS com um array JSON de {len(products)} números inteiros de 0 a 100, na ordem dos produtos. Nada mais."""
+
+    @staticmethod
+    def _parse_lote(text: str, n: int) -> Optional[list]:
+        """Scores do array JSON da resposta, ou None se não vierem n números"""
+        match = re.search(r'\[.*\]', text, re.DOTALL)
         try:
-            message = self.claude.messages.create(
-                model="claude-opus-4-20250514",
-                max_tokens=50,
-                messages=[{"role": "user", "content": prompt}]
-            )
+            scores = json.loads(match.group()) if match else []
+            if len(scores) == n:
+                return [min(max(int(score), 0), 100) for score in scores]
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Resposta do lote inválida: {e}")
+            return None
+        logger.warning(f"Resposta do lote com {len(scores)} scores para {n} produtos")
+        return None
+
+    async def _score_lote(self, sem: asyncio.Semaphore, products: list) -> list:
+        """Analisa um lote em uma única chamada e retorna os scores na mesma ordem"""
+        if len(products) == 1:
+            return [await self._score_one(sem, products[0])]
+
+        async with sem:
+            try:
+                text = await self._chamar_claude(self._prompt_lote(products), max_tokens=10 * len(products))
+                scores = self._parse_lote(text, len(products))
+                if scores is not None:
+                    return scores
 
-            response = message.content[0].text.strip()
-            # Extrai apenas números
-            score = int(''.join(filter(str.isdigit, response[:3])))
-            return min(max(score, 0), 100)  # Garante 0-100
+            except Exception as e:
+                logger.error(f"Erro ao analisar lote com Claude: {e}")
+
+        # Resposta inválida: cai para a análise individual (em paralelo)
+        return list(await asyncio.gather(*(self._score_one(sem, p) for p in products)))
+
+    def _cache_key(self, product_data: dict) -> str:
+        return LLMCache.chave(
+            model=MODELO_CLAUDE,
+            title=product_data.get('title'),
+            price=product_data.get('price'),
+            orders=product_data.get('orders'),
+            rating=product_data.get('rating'),
+        )
+
+    async def _score_batch(self, products: list) -> list:
+        """Consulta o cache e dispara os lotes restantes em paralelo (até CLAUDE_CONCORRENCIA)"""
+        chaves, scores, lotes = self._lotes_sem_cache(products)
+
+        sem = asyncio.Semaphore(CLAUDE_CONCORRENCIA)
+        resultados = await asyncio.gather(
+            *(self._score_lote(sem, [products[i] for i in lote]) for lote in lotes)
+        )
+        return self._gravar_scores(chaves, scores, lotes, resultados)
+
+    def _lotes_sem_cache(self, products: list):
+        """Scores do cache e os índices que faltam, agrupados em lotes"""
+        chaves = [self._cache_key(p) for p in products]
+        scores = [self._cache.get(chave) for chave in chaves]
+        faltando = [i for i, score in enumerate(scores) if score is None]
+
+        if len(faltando) < len(products):
+            print(f"   💾 {len(products) - len(faltando)} scores vindos do cache")
+
+        lotes = [faltando[i:i + CLAUDE_BATCH_SIZE] for i in range(0, len(faltando), CLAUDE_BATCH_SIZE)]
+        return chaves, scores, lotes
+
+    def _gravar_scores(self, chaves: list, scores: list, lotes: list, resultados: list) -> list:
+        for lote, resultado in zip(lotes, resultados):
+            for i, score in zip(lote, resultado):
+                if score is None:
+                    score = 50  # Score neutro em caso de erro (não vai para o cache)
+                else:
+                    self._cache.set(chaves[i], score, ttl=CLAUDE_CACHE_TTL)
+                scores[i] = score
+        return scores
+
+    async def _score_batch_api(self, products: list, wait: bool):
+        """Mesmo fluxo do _score_batch, mas os lotes vão em um único Message Batch"""
+        chaves, scores, lotes = self._lotes_sem_cache(products)
+        if not lotes:
+            return scores
+
+        batch = await self.claude.messages.batches.create(requests=[
+            {
+                "custom_id": str(n),
+                "params": {
+                    "model": MODELO_CLAUDE,
+                    "max_tokens": 10 * len(lote),
+                    "messages": [{"role": "user", "content": self._prompt_lote([products[i] for i in lote])}]
+                }
+            }
+            for n, lote in enumerate(lotes)
+        ])
+        print(f"   📨 Message Batch {batch.id} enviado ({len(lotes)} lotes)")
+        if not wait:
+            return batch.id
+
+        while batch.processing_status != "ended":
+            await asyncio.sleep(CLAUDE_BATCH_POLL)
+            batch = await self.claude.messages.batches.retrieve(batch.id)
+
+        resultados = [None] * len(lotes)
+        async for entrada in await self.claude.messages.batches.results(batch.id):
+            n = int(entrada.custom_id)
+            if entrada.result.type == "succeeded":
+                resultados[n] = self._parse_lote(entrada.result.message.content[0].text, len(lotes[n]))
+
+        # Lotes que falharam no batch passam pelo fluxo síncrono (em paralelo)
+        sem = asyncio.Semaphore(CLAUDE_CONCORRENCIA)
+        falhos = [n for n, resultado in enumerate(resultados) if resultado is None]
+        refeitos = await asyncio.gather(
+            *(self._score_lote(sem, [products[i] for i in lotes[n]]) for n in falhos)
+        )
+        for n, resultado in zip(falhos, refeitos):
+            resultados[n] = resultado
+
+        return self._gravar_scores(chaves, scores, lotes, resultados)
 
-        except Exception as e:
-            logger.error(f"Erro ao analisar com Claude: {e}")
-            return 50  # Score neutro em caso de erro
+    def analyze_product_with_claude(self, product_data: dict) -> int:
+        """Analisa produto com Claude Opus e retorna score 0-100"""
+        return self.analyze_products_batch([product_data])[0]
+
+    def analyze_products_batch(self, products: list) -> list:
+        """Analisa vários produtos e retorna os scores na mesma ordem"""
+        if not products:
+            return []
+        if self.modo_batch:
+            return self.analyze_products_batch_async(products)
+        return self._run(self._score_batch(products))
+
+    def analyze_products_batch_async(self, products: list, wait: bool = True):
+        """Analisa pela Message Batches API (50% do custo, sem limite de RPM)
 
-    def search_and_add_products(self, category: str = "jewelry", min_score: int = 70, quantity: int = 10):
+        Para execuções agendadas: o batch pode levar minutos ou horas. Com
+        wait=False retorna só o id do batch em vez dos scores.
+        """
+        if not products:
+            return []
+        return self._run(self._score_batch_api(products, wait))
+
+    def _esperar(self, condicao, timeout: float) -> bool:
+        """WebDriverWait que devolve False no timeout em vez de lançar exceção"""
+        try:
+            WebDriverWait(self.dsers.driver, timeout, poll_frequency=0.25).until(condicao)
+            return True
+        except TimeoutException:
+            return False
+
+    def _contar_cards(self) -> int:
+        return self.dsers.driver.execute_script(
+            "return document.querySelectorAll(arguments[0]).length;", CARD_CSS
+        )
+
+    def _extract_products(self) -> list:
+        """Snapshot dos produtos na tela: [{'index', 'id', 'title', 'price', 'orders', 'rating'}, ...]"""
+        return json.loads(self.dsers.driver.execute_script(_EXTRACT_PRODUCTS_JS) or "[]")
+
+    def _product_element(self, index: int):
+        """Materializa o WebElement de um card do último snapshot"""
+        return self.dsers.driver.find_element(By.CSS_SELECTOR, f"[data-auto-idx='{index}']")
+
+    def search_and_add_products(self, category: str = "jewelry", min_score: int = 70, quantity: int = 10,
+                                push: bool = True) -> int:
         """
         Busca produtos no DSers, analisa com Claude e adiciona os aprovados
 
@@ -97,6 +440,10 @@ RESPONDA APENAS com um número inteiro de 0 a 100. Nada mais."""
             category: Categoria para buscar (jewelry, earrings, watch, etc)
             min_score: Score mínimo para aprovar (0-100)
             quantity: Quantidade de produtos para adicionar
+            push: Envia a Import List para a Shopify ao final
+
+        Returns:
+            Quantidade de produtos adicionados
         """
         print("\n" + "="*60)
         print(f"🔍 BUSCANDO {quantity} PRODUTOS: {category.upper()}")
@@ -106,14 +453,150 @@ RESPONDA APENAS com um número inteiro de 0 a 100. Nada mais."""
         # Login
         if not self.dsers.login():
             print("❌ Falha no login DSers")
-            return
+            return 0
 
         print("✅ Login OK!\n")
 
+        # Listagem pela API JSON do DSers; sem ela, cai para a tela do Find Supplier
+        resultado = self._search_via_api(category, min_score, quantity)
+        if resultado is None:
+            resultado = self._search_via_dom(category, min_score, quantity)
+        added_count, total_minerados = resultado
+
+        # Registra métricas
+        with self._dashboard_lock:
+            self.dashboard.registrar_mineracao(total_minerados, added_count, min_score)
+
+        print(f"\n{'='*60}")
+        print(f"📊 RESULTADO: {added_count} produtos adicionados de {total_minerados} analisados")
+        print(f"{'='*60}")
+
+        if push and added_count > 0:
+            self._push_to_shopify()
+
+        return added_count
+
+    def _dsers_session_from_selenium(self) -> requests.Session:
+        """Sessão requests autenticada com os cookies do login feito no Selenium"""
+        if self._api_session is None:
+            driver = self.dsers.driver
+            session = requests.Session()
+            session.headers.update({
+                'User-Agent': driver.execute_script("return navigator.userAgent"),
+                'Accept': 'application/json',
+                'Referer': 'https://www.dsers.com/app/find-supplier',
+            })
+            for cookie in driver.get_cookies():
+                session.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain'), path=cookie.get('path', '/'))
+            self._api_session = session
+        return self._api_session
+
+    def search_products_api(self, category: str, page: int = 1) -> Optional[list]:
+        """
+        Busca uma página do Find Supplier direto no endpoint JSON (mesma XHR da tela)
+
+        Returns:
+            [{'title', 'price', 'orders', 'rating', 'product_id'}, ...] ou None se a API não respondeu JSON
+        """
+        try:
+            r = self._dsers_session_from_selenium().get(
+                DSERS_SEARCH_API, params={'keyword': category, 'page': page}, timeout=15
+            )
+            if r.status_code != 200:
+                logger.debug(f"API Find Supplier: {r.status_code}")
+                return None
+            data = r.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.debug(f"API Find Supplier indisponível: {e}")
+            return None
+
+        # O corpo vem como {"data": {"list": [...]}} (ou variações com items/products)
+        if isinstance(data, dict):
+            data = data.get('data', data)
+        if isinstance(data, dict):
+            # Sem nenhuma das chaves de lista (erro, auth, formato novo): API indisponível
+            chave = next((k for k in ('list', 'items', 'products') if isinstance(data.get(k), list)), None)
+            if chave is None:
+                logger.debug(f"API Find Supplier: resposta sem lista ({list(data)[:5]})")
+                return None
+            data = data[chave]
+        if not isinstance(data, list):
+            return None
+
+        def campo(item, *nomes):
+            for nome in nomes:
+                if item.get(nome) not in (None, ''):
+                    return item[nome]
+            return 'N/A'
+
+        return [
+            {
+                'title': str(campo(item, 'title', 'subject', 'name')),
+                'price': str(campo(item, 'price', 'salePrice', 'minPrice')),
+                'orders': str(campo(item, 'orders', 'sales', 'tradeCount')),
+                'rating': str(campo(item, 'rating', 'evaluateRate', 'score')),
+                'product_id': campo(item, 'productId', 'product_id', 'id'),
+            }
+            for item in data if isinstance(item, dict)
+        ]
+
+    def _search_via_api(self, category: str, min_score: int, quantity: int):
+        """Lista pela API, pontua com Claude e adiciona os aprovados pela URL do produto
+
+        Retorna (adicionados, analisados) ou None se a API não estiver disponível.
+        """
+        added_count = 0
+        total_minerados = 0
+
+        for page in range(1, DSERS_API_MAX_PAGES + 1):
+            products = self.search_products_api(category, page)
+            if products is None:
+                if page == 1:
+                    print("↩️  API do Find Supplier indisponível, usando a tela...")
+                    return None
+                break
+
+            novos = [p for p in products if p['title'] != "N/A" and p['product_id'] != "N/A"]
+            if not novos:
+                break
+
+            print(f"\n🤖 Analisando {len(novos)} produtos com Claude (página {page})...")
+            scores = self.analyze_products_batch(novos)
+            total_minerados += len(novos)
+
+            for product, score in zip(novos, scores):
+                print(f"\n📦 [{total_minerados}] {product['title'][:50]}...")
+                print(f"   💰 {product['price']} | 📊 {product['orders']} | ⭐ {product['rating']}")
+                print(f"   📊 Score: {score}/100")
+
+                if score < min_score:
+                    print(f"   ⏭️ Ignorado (score < {min_score})")
+                    continue
+
+                # Só o "Add to Import List" precisa do navegador
+                # Presume que product_id é o id do item no AliExpress (não verificado)
+                url = f"https://www.aliexpress.com/item/{product['product_id']}.html"
+                try:
+                    added = self.dsers.adicionar_produto(url)
+                except Exception as e:
+                    logger.debug(f"Erro ao adicionar {url}: {e}")
+                    added = False
+
+                if added:
+                    added_count += 1
+                    print(f"   ✅ ADICIONADO! ({added_count}/{quantity})")
+                    if added_count >= quantity:
+                        return added_count, total_minerados
+                else:
+                    print(f"   ⚠️ Falha ao adicionar")
+
+        return added_count, total_minerados
+
+    def _search_via_dom(self, category: str, min_score: int, quantity: int):
+        """Fluxo pela tela do Find Supplier; retorna (adicionados, analisados)"""
         # Vai para Find Supplier
         print("📌 Navegando para Find Supplier...")
         self.dsers.driver.get('https://www.dsers.com/app/find-supplier')
-        time.sleep(5)
 
         # Busca pela categoria
         try:
@@ -139,7 +622,7 @@ RESPONDA APENAS com um número inteiro de 0 a 100. Nada mais."""
                 search_box.send_keys(category)
                 search_box.send_keys(Keys.RETURN)
                 print(f"🔍 Buscando: {category}")
-                time.sleep(5)
+                self._esperar(EC.presence_of_element_located((By.CSS_SELECTOR, CARD_CSS)), 10)
             else:
                 print("⚠️ Campo de busca não encontrado, continuando...")
 
@@ -147,8 +630,8 @@ RESPONDA APENAS com um número inteiro de 0 a 100. Nada mais."""
             print(f"⚠️ Erro na busca: {e}")
 
         added_count = 0
-        analyzed_count = 0
         total_minerados = 0
+        seen_ids = set()
 
         # Loop principal - busca e analisa produtos
         max_iterations = 20  # Limite de iterações para evitar loop infinito
@@ -157,99 +640,40 @@ RESPONDA APENAS com um número inteiro de 0 a 100. Nada mais."""
         while added_count < quantity and iteration < max_iterations:
             iteration += 1
 
-            # Pega produtos na tela
-            product_selectors = [
-                ".product-item",
-                "[class*='product-card']",
-                "[class*='ProductCard']",
-                ".supplier-product",
-                "[class*='goods-item']"
-            ]
-
-            products = []
-            for selector in product_selectors:
-                try:
-                    products = self.dsers.driver.find_elements(By.CSS_SELECTOR, selector)
-                    if products:
-                        break
-                except:
-                    continue
+            # Pega produtos na tela (um único round-trip ao navegador)
+            try:
+                products = self._extract_products()
+            except Exception as e:
+                logger.debug(f"Erro ao extrair produtos: {e}")
+                products = []
 
             if not products:
                 print("⚠️ Nenhum produto encontrado na página")
                 # Tenta rolar para carregar mais
                 self.dsers.driver.execute_script("window.scrollBy(0, 1000);")
-                time.sleep(3)
+                self._esperar(EC.presence_of_element_located((By.CSS_SELECTOR, CARD_CSS)), 3)
                 continue
 
-            # Analisa produtos ainda não vistos
-            for product in products[analyzed_count:]:
+            # Separa os produtos ainda não vistos (pelo id, não pela posição) que têm título
+            novos = []
+            for product in products:
+                if product['id'] in seen_ids:
+                    continue
+                seen_ids.add(product['id'])
+                if product['title'] != "N/A":
+                    product['n'] = len(seen_ids)
+                    novos.append(product)
+
+            # Analisa com Claude (lotes em paralelo) e adiciona os aprovados
+            if novos:
+                print(f"\n🤖 Analisando {len(novos)} produtos com Claude...")
+            scores = self.analyze_products_batch(novos)
+            total_minerados += len(novos)
+
+            for product, score in zip(novos, scores):
                 try:
-                    analyzed_count += 1
-                    total_minerados += 1
-
-                    # Extrai dados do produto
-                    title = "N/A"
-                    price = "N/A"
-                    orders = "N/A"
-                    rating = "N/A"
-
-                    # Título
-                    title_selectors = ["[class*='title']", "h3", "h4", ".name", "[class*='name']"]
-                    for sel in title_selectors:
-                        try:
-                            title = product.find_element(By.CSS_SELECTOR, sel).text.strip()
-                            if title:
-                                break
-                        except:
-                            continue
-
-                    # Preço
-                    price_selectors = ["[class*='price']", ".price", "span[class*='price']"]
-                    for sel in price_selectors:
-                        try:
-                            price = product.find_element(By.CSS_SELECTOR, sel).text.strip()
-                            if price:
-                                break
-                        except:
-                            continue
-
-                    # Pedidos
-                    order_selectors = ["[class*='order']", "[class*='sold']", "[class*='sale']"]
-                    for sel in order_selectors:
-                        try:
-                            orders = product.find_element(By.CSS_SELECTOR, sel).text.strip()
-                            if orders:
-                                break
-                        except:
-                            continue
-
-                    # Rating
-                    rating_selectors = ["[class*='rating']", "[class*='star']", "[class*='score']"]
-                    for sel in rating_selectors:
-                        try:
-                            rating = product.find_element(By.CSS_SELECTOR, sel).text.strip()
-                            if rating:
-                                break
-                        except:
-                            continue
-
-                    if title == "N/A" or not title:
-                        continue
-
-                    product_data = {
-                        'title': title,
-                        'price': price,
-                        'orders': orders,
-                        'rating': rating
-                    }
-
-                    print(f"\n📦 [{analyzed_count}] {title[:50]}...")
-                    print(f"   💰 {price} | 📊 {orders} | ⭐ {rating}")
-
-                    # Analisa com Claude
-                    print(f"   🤖 Analisando com Claude...")
-                    score = self.analyze_product_with_claude(product_data)
+                    print(f"\n📦 [{product['n']}] {product['title'][:50]}...")
+                    print(f"   💰 {product['price']} | 📊 {product['orders']} | ⭐ {product['rating']}")
                     print(f"   📊 Score: {score}/100")
 
                     if score >= min_score:
@@ -261,12 +685,15 @@ RESPONDA APENAS com um número inteiro de 0 a 100. Nada mais."""
                             ".add-to-import"
                         ]
 
+                        card = self._product_element(product['index'])
+
                         added = False
                         for sel in add_selectors:
                             try:
-                                add_button = product.find_element(By.CSS_SELECTOR, sel)
+                                add_button = card.find_element(By.CSS_SELECTOR, sel)
                                 add_button.click()
-                                time.sleep(2)
+                                # Espera o aviso "Added" do DSers
+                                self._esperar(EC.presence_of_element_located((By.CSS_SELECTOR, TOAST_CSS)), 5)
                                 added = True
                                 break
                             except:
@@ -287,25 +714,17 @@ RESPONDA APENAS com um número inteiro de 0 a 100. Nada mais."""
                     logger.debug(f"Erro ao processar produto: {e}")
                     continue
 
-            # Rola para carregar mais produtos
+            # Rola para carregar mais produtos e espera novos cards aparecerem
+            antes = len(products)
             self.dsers.driver.execute_script("window.scrollBy(0, 800);")
-            time.sleep(2)
+            self._esperar(lambda d: self._contar_cards() > antes, 5)
 
-        # Registra métricas
-        self.dashboard.registrar_mineracao(total_minerados, added_count, min_score)
-
-        print(f"\n{'='*60}")
-        print(f"📊 RESULTADO: {added_count} produtos adicionados de {total_minerados} analisados")
-        print(f"{'='*60}")
-
-        if added_count > 0:
-            self._push_to_shopify()
+        return added_count, total_minerados
 
     def _push_to_shopify(self):
         """Envia produtos da Import List para Shopify"""
         print("\n📋 Navegando para Import List...")
         self.dsers.driver.get('https://www.dsers.com/app/import-list')
-        time.sleep(5)
 
         try:
             # Tenta encontrar e clicar no botão Push
@@ -322,25 +741,17 @@ RESPONDA APENAS com um número inteiro de 0 a 100. Nada mais."""
                     )
                     push_button.click()
                     print("✅ Push to Shopify iniciado!")
-                    time.sleep(3)
 
                     # Tenta confirmar (se houver modal)
-                    confirm_xpaths = [
-                        "//button[contains(text(), 'Confirm')]",
-                        "//button[contains(text(), 'OK')]",
-                        "//button[contains(text(), 'Yes')]"
-                    ]
-
-                    for confirm_xpath in confirm_xpaths:
+                    if self._esperar(EC.visibility_of_element_located((By.XPATH, CONFIRM_XPATH)), 5):
                         try:
-                            confirm = self.dsers.driver.find_element(By.XPATH, confirm_xpath)
-                            confirm.click()
+                            self.dsers.driver.find_element(By.XPATH, CONFIRM_XPATH).click()
                             print("✅ Push confirmado!")
-                            break
-                        except:
-                            continue
+                        except Exception:
+                            pass
 
-                    self.dashboard.registrar_sincronizacao(1)
+                    with self._dashboard_lock:
+                        self.dashboard.registrar_sincronizacao(1)
                     break
 
                 except:
@@ -350,8 +761,10 @@ RESPONDA APENAS com um número inteiro de 0 a 100. Nada mais."""
             print(f"⚠️ Erro ao fazer push: {e}")
             print("   Faça manualmente: Import List > Push to Shopify")
 
-        print("\n⏳ Aguardando 15s para sincronização...")
-        time.sleep(15)
+        # Sincronização termina quando a Import List esvazia (até 15s)
+        print("\n⏳ Aguardando sincronização...")
+        if not self._esperar(lambda d: not d.find_elements(By.CSS_SELECTOR, IMPORT_LIST_ITEM_CSS), 15):
+            print("   ⚠️ Import List ainda com itens após 15s")
 
     def run_full_cycle(self, categorias: list = None, produtos_por_categoria: int = 3, min_score: int = 70):
         """
@@ -373,18 +786,45 @@ RESPONDA APENAS com um número inteiro de 0 a 100. Nada mais."""
         print(f"📊 Score mínimo: {min_score}")
         print("="*60)
 
-        for categoria in categorias:
+        # Uma categoria por navegador, até MAX_NAVEGADORES em paralelo; a primeira
+        # usa o DSers desta instância e as outras abrem o próprio Chrome
+        workers = [self] + [
+            DSersFullAutomation(DSersAutomation(headless=False), compartilhar_com=self)
+            for _ in range(min(MAX_NAVEGADORES, len(categorias)) - 1)
+        ]
+        livres = list(workers)
+        livres_lock = threading.Lock()
+
+        def _processar(categoria):
+            with livres_lock:
+                worker = livres.pop()
             try:
-                self.search_and_add_products(
+                # O push é feito uma vez só no final: a Import List é da conta toda
+                return worker.search_and_add_products(
                     category=categoria,
                     min_score=min_score,
-                    quantity=produtos_por_categoria
+                    quantity=produtos_por_categoria,
+                    push=False
                 )
-            except Exception as e:
-                print(f"❌ Erro na categoria {categoria}: {e}")
-                continue
+            finally:
+                with livres_lock:
+                    livres.append(worker)
 
-            time.sleep(5)
+        total_adicionados = 0
+        try:
+            with ThreadPoolExecutor(max_workers=len(workers)) as pool:
+                futures = {pool.submit(_processar, categoria): categoria for categoria in categorias}
+                for future in as_completed(futures):
+                    try:
+                        total_adicionados += future.result()
+                    except Exception as e:
+                        print(f"❌ Erro na categoria {futures[future]}: {e}")
+        finally:
+            for worker in workers[1:]:
+                worker.close()
+
+        if total_adicionados > 0:
+            self._push_to_shopify()
 
         print("\n" + "="*60)
         print("✅ CICLO COMPLETO FINALIZADO!")
@@ -399,6 +839,15 @@ RESPONDA APENAS com um número inteiro de 0 a 100. Nada mais."""
         except:
             pass
 
+        if not self._dono_do_loop:
+            return
+
+        try:
+            self._run(self.claude.close())
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        except:
+            pass
+
 
 def main():
     import argparse
@@ -408,6 +857,8 @@ def main():
     parser.add_argument("--quantidade", "-q", type=int, default=5, help="Quantidade de produtos")
     parser.add_argument("--score", "-s", type=int, default=70, help="Score mínimo (0-100)")
     parser.add_argument("--todas", "-t", action="store_true", help="Buscar em todas categorias")
+    parser.add_argument("--async", dest="modo_batch", action="store_true",
+                        help="Scores pela Message Batches API (metade do custo, mais lento)")
 
     args = parser.parse_args()
 
@@ -416,6 +867,7 @@ def main():
     print("="*60)
 
     bot = DSersFullAutomation()
+    bot.modo_batch = args.modo_batch
 
     try:
         if args.todas:
@@ -10,12 +10,21 @@ Funcionalidades:
 4. Atualiza na Shopify
 """
 import os
+import re
 import sys
 import time
 import json
 import logging
+import asyncio
 import argparse
+import functools
+import string
+import statistics
+from array import array
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional
@@ -29,7 +38,6 @@ load_dotenv()
 from src.media.image_processor import AestheticImageProcessor
 from src.ai.content_generator import GeminiContentGenerator
 from src.pricing.advanced_calculator import AdvancedPriceCalculator
-from src.shopify.client import ShopifyClient
 
 # Configurar logging
 logging.basicConfig(
@@ -39,6 +47,157 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Campos do produto usados no pós-processamento; imagens e variantes vêm como
+# linhas filhas no JSONL da bulk operation
+BULK_PRODUCT_FIELDS = """
+          node {
+            id
+            title
+            productType
+            tags
+            variants {
+              edges {
+                node {
+                  id
+                  price
+                  selectedOptions { value }
+                }
+              }
+            }
+            images {
+              edges {
+                node {
+                  id
+                  url
+                }
+              }
+            }
+          }
+"""
+
+BULK_STATUS_QUERY = """
+{
+  currentBulkOperation {
+    id
+    status
+    errorCode
+    url
+  }
+}
+"""
+
+# Tradução das opções de variante (usada por ShopifyEnhancer._limpar_opcao)
+_TRADUCOES = {
+    'black': 'Preto', 'white': 'Branco', 'red': 'Vermelho',
+    'blue': 'Azul', 'green': 'Verde', 'pink': 'Rosa',
+    'gold': 'Dourado', 'golden': 'Dourado', 'silver': 'Prata',
+    'brown': 'Marrom', 'beige': 'Bege', 'grey': 'Cinza', 'gray': 'Cinza',
+    'purple': 'Roxo', 'orange': 'Laranja', 'yellow': 'Amarelo',
+    'navy': 'Azul Marinho', 'wine': 'Vinho', 'cream': 'Creme',
+    'khaki': 'Cáqui', 'coffee': 'Café', 'caramel': 'Caramelo',
+    'rose': 'Rosé', 'champagne': 'Champanhe', 'ivory': 'Marfim',
+    'apricot': 'Damasco', 'coral': 'Coral', 'mint': 'Menta',
+    'small': 'Pequeno', 'medium': 'Médio', 'large': 'Grande',
+}
+
+_RE_COLOR_SUFFIX = re.compile(r'\s*[-_]?\s*(color|colour|cor)\s*$', re.IGNORECASE)
+_RE_IN_METAL = re.compile(r'\s+in\s+(golden|silver|gold)\s*$', re.IGNORECASE)
+_RE_NON_ALPHA = re.compile(r'[^a-z]')
+
+# Rodapé fixo da descrição; só a descrição e a parcela mudam por produto
+_DESC_TEMPLATE = string.Template("""
+<div style="font-family: 'Inter', sans-serif; line-height: 1.6;">
+    ${descricao}
+    
+    <hr style="margin: 30px 0; border: none; border-top: 1px solid #eee;">
+    
+    <h4>🚚 Entrega e Garantia</h4>
+    <ul>
+        <li>✅ Frete Grátis para todo Brasil</li>
+        <li>✅ Prazo de entrega: 15-25 dias úteis</li>
+        <li>✅ Garantia de 30 dias</li>
+        <li>✅ 7 dias para troca/devolução</li>
+    </ul>
+    
+    <p style="font-weight: bold; color: #2e7d32;">
+        💳 Parcele em até 6x de R$$ ${parcela_6x} sem juros
+    </p>
+</div>
+""")
+
+
+@functools.lru_cache(maxsize=1024)
+def _render_description(descricao: str, parcela_6x: str) -> str:
+    return _DESC_TEMPLATE.substitute(descricao=descricao, parcela_6x=parcela_6x)
+
+
+def _montar_bulk_query(collection_handle: str = None) -> str:
+    """Mutation bulkOperationRunQuery para a loja inteira ou uma coleção"""
+    if collection_handle:
+        raiz = f'collectionByHandle(handle: {json.dumps(collection_handle)}) {{ products {{ edges {{ {BULK_PRODUCT_FIELDS} }} }} }}'
+    else:
+        raiz = f'products {{ edges {{ {BULK_PRODUCT_FIELDS} }} }}'
+
+    return (
+        'mutation { bulkOperationRunQuery(query: """{ ' + raiz + ' }""") '
+        '{ bulkOperation { id status } userErrors { field message } } }'
+    )
+
+
+def _gid_tipo_id(gid: str):
+    """'gid://shopify/ProductVariant/123' → ('ProductVariant', 123)"""
+    _, _, tipo, numero = gid.rsplit('/', 3)
+    return tipo, int(numero)
+
+# Nichos reconhecidos no product_type (sem match: 'acessorios')
+_NICHO_RE = re.compile(r'(bolsas|brincos|colares|pulseiras|aneis|relogios|oculos)', re.IGNORECASE)
+
+# Produto + variantes em uma única requisição (duas mutations no mesmo documento)
+PRODUCT_UPDATE_MUTATION = """
+mutation($product: ProductInput!, $productId: ID!, $variants: [ProductVariantsBulkInput!]!) {
+  productUpdate(input: $product) {
+    userErrors { field message }
+  }
+  productVariantsBulkUpdate(productId: $productId, variants: $variants) {
+    userErrors { field message }
+  }
+}
+"""
+
+# Upload de imagens: URLs pré-assinadas (PUT binário, sem base64) + mídia do produto
+STAGED_UPLOADS_MUTATION = """
+mutation($input: [StagedUploadInput!]!) {
+  stagedUploadsCreate(input: $input) {
+    stagedTargets { url resourceUrl parameters { name value } }
+    userErrors { field message }
+  }
+}
+"""
+
+PRODUCT_MEDIA_QUERY = """
+query($id: ID!) {
+  product(id: $id) { media(first: 250) { nodes { id } } }
+}
+"""
+
+REPLACE_MEDIA_MUTATION = """
+mutation($productId: ID!, $mediaIds: [ID!]!, $media: [CreateMediaInput!]!) {
+  productDeleteMedia(productId: $productId, mediaIds: $mediaIds) {
+    mediaUserErrors { field message }
+  }
+  productCreateMedia(productId: $productId, media: $media) {
+    mediaUserErrors { field message }
+  }
+}
+"""
+
+# Downloads simultâneos de imagens por produto
+IMAGENS_EM_PARALELO = 8
+
+# IDs já processados (além da tag "processado" na Shopify), para reexecuções
+PROCESSED_PATH = Path('.cache/processed.json')
+PROCESSED_FLUSH_A_CADA = 10
+
 
 class ShopifyEnhancer:
     """Melhora produtos existentes na Shopify"""
@@ -53,10 +212,18 @@ class ShopifyEnhancer:
             'Content-Type': 'application/json'
         }
 
+        # Sessão com keep-alive para as chamadas síncronas (conexão, busca, GraphQL)
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False)
+        self.session.mount('https://', HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry))
+
         self.image_processor = AestheticImageProcessor()
         self.content_generator = GeminiContentGenerator()
         self.price_calculator = AdvancedPriceCalculator()
-        self.shopify_client = ShopifyClient()  # Cliente para upload de imagens
+
+        # Event loop para o download paralelo de imagens
+        self._loop = asyncio.new_event_loop()
 
         self.dry_run = dry_run
         self.stats = {
@@ -65,6 +232,8 @@ class ShopifyEnhancer:
             'erros': 0,
             'inicio': datetime.now()
         }
+        # Duração (s) de cada produto, para os percentis do relatório
+        self.duracoes = array('d')
 
         # Verificar conexão
         self._verificar_conexao()
@@ -72,7 +241,7 @@ class ShopifyEnhancer:
     def _verificar_conexao(self):
         """Verifica conexão com Shopify"""
         try:
-            r = requests.get(f'{self.base_url}/shop.json', headers=self.headers)
+            r = self.session.get(f'{self.base_url}/shop.json')
             if r.status_code == 200:
                 shop = r.json()['shop']
                 logger.info(f"✅ Conectado: {shop['name']}")
@@ -83,32 +252,232 @@ class ShopifyEnhancer:
             logger.error(f"❌ Erro: {e}")
             sys.exit(1)
 
+    async def _fetch_all(self, urls: List[str]) -> List[bytes]:
+        """Baixa todas as imagens em paralelo (sessão sem o token da Shopify)"""
+        async def _baixar(http, url):
+            try:
+                async with http.get(url) as r:
+                    r.raise_for_status()
+                    return await r.read()
+            except Exception as e:
+                logger.error(f"Erro no download: {e}")
+                return None
+
+        timeout = aiohttp.ClientTimeout(total=self.image_processor.timeout)
+        connector = aiohttp.TCPConnector(limit=IMAGENS_EM_PARALELO)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as http:
+            blobs = await asyncio.gather(*(_baixar(http, url) for url in urls))
+        return [b for b in blobs if b]
+
+    async def _upload_all(self, targets: List[Dict], images: List[bytes]) -> List[bool]:
+        """PUT binário das imagens nas URLs pré-assinadas, em paralelo"""
+        async def _enviar(http, target, img):
+            params = {p['name']: p['value'] for p in target['parameters']}
+            headers = {'Content-Type': params.get('content_type', 'image/webp')}
+            if 'acl' in params:
+                headers['x-goog-acl'] = params['acl']
+            try:
+                async with http.put(target['url'], data=img, headers=headers) as r:
+                    return r.status in (200, 201, 204)
+            except Exception as e:
+                logger.error(f"Erro no upload: {e}")
+                return False
+
+        timeout = aiohttp.ClientTimeout(total=60)
+        connector = aiohttp.TCPConnector(limit=IMAGENS_EM_PARALELO)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as http:
+            return await asyncio.gather(*(
+                _enviar(http, t, img) for t, img in zip(targets, images)
+            ))
+
+    def _substituir_imagens(self, pid: int, images: List[bytes]) -> bool:
+        """Troca as imagens do produto via staged uploads
+
+        1. stagedUploadsCreate devolve uma URL pré-assinada por imagem
+        2. Bytes enviados direto para as URLs, em paralelo
+        3. Mídia antiga removida e nova criada na mesma requisição
+        """
+        if not images:
+            return False
+        product_gid = f'gid://shopify/Product/{pid}'
+
+        data = self._graphql(STAGED_UPLOADS_MUTATION, {'input': [
+            {
+                'resource': 'IMAGE',
+                'filename': f'{pid}-{idx}.webp',
+                'mimeType': 'image/webp',
+                'httpMethod': 'PUT'
+            }
+            for idx, _ in enumerate(images, start=1)
+        ]})
+        if data is None or data['stagedUploadsCreate']['userErrors']:
+            print(f"      ⚠️ Erros no staged upload: {data and data['stagedUploadsCreate']['userErrors']}")
+            return False
+        targets = data['stagedUploadsCreate']['stagedTargets']
+
+        print(f"      📤 Enviando {len(images)} novas imagens...")
+        enviados = self._loop.run_until_complete(self._upload_all(targets, images))
+        novas = [t for t, ok in zip(targets, enviados) if ok]
+        if not novas:
+            return False
+
+        data = self._graphql(PRODUCT_MEDIA_QUERY, {'id': product_gid})
+        antigas = [m['id'] for m in data['product']['media']['nodes']] if data else []
+
+        data = self._graphql(REPLACE_MEDIA_MUTATION, {
+            'productId': product_gid,
+            'mediaIds': antigas,
+            'media': [
+                {'originalSource': t['resourceUrl'], 'mediaContentType': 'IMAGE'}
+                for t in novas
+            ]
+        })
+        if data is None:
+            return False
+
+        erros = (data['productDeleteMedia']['mediaUserErrors']
+                 + data['productCreateMedia']['mediaUserErrors'])
+        if erros:
+            print(f"      ⚠️ Erros na mídia: {erros}")
+            return False
+
+        print(f"      ✅ {len(novas)}/{len(images)} imagens enviadas ({len(antigas)} antigas removidas)")
+        return len(novas) == len(images)
+
+    def close(self):
+        """Fecha o event loop e a sessão HTTP"""
+        self._loop.close()
+        self.session.close()
+
+    def _graphql(self, query: str, variables: Dict = None) -> Optional[Dict]:
+        """Executa uma query GraphQL e retorna `data` (ou None em erro)
+
+        Em THROTTLED espera o balde de custo reabastecer e tenta de novo.
+        """
+        payload = {'query': query}
+        if variables:
+            payload['variables'] = variables
+
+        for _ in range(5):
+            r = self.session.post(f'{self.base_url}/graphql.json', json=payload)
+            if r.status_code != 200:
+                logger.error(f"Erro GraphQL: {r.status_code}")
+                return None
+            data = r.json()
+
+            erros = data.get('errors') or []
+            if any(e.get('extensions', {}).get('code') == 'THROTTLED' for e in erros):
+                throttle = data.get('extensions', {}).get('cost', {}).get('throttleStatus', {})
+                falta = throttle.get('maximumAvailable', 1000) - throttle.get('currentlyAvailable', 0)
+                time.sleep(max(1.0, falta / throttle.get('restoreRate', 50)))
+                continue
+
+            if erros:
+                logger.error(f"Erro GraphQL: {erros}")
+                return None
+            return data.get('data')
+
+        logger.error("Erro GraphQL: THROTTLED após 5 tentativas")
+        return None
+
+    def _fetch_products_bulk(self, collection_handle: str = None) -> Optional[List[Dict]]:
+        """Busca produtos + variantes + imagens em uma bulk operation
+
+        Retorna None se a bulk operation não estiver disponível (o chamador
+        cai para a REST). Os produtos saem no mesmo formato da REST.
+        """
+        data = self._graphql(_montar_bulk_query(collection_handle))
+        if not data:
+            return None
+
+        erros = data['bulkOperationRunQuery']['userErrors']
+        if erros:
+            logger.error(f"Bulk operation recusada: {erros}")
+            return None
+
+        while True:
+            time.sleep(2)
+            status = self._graphql(BULK_STATUS_QUERY)
+            if not status:
+                return None
+            op = status['currentBulkOperation']
+            if op['status'] == 'COMPLETED':
+                break
+            if op['status'] in ('FAILED', 'CANCELED', 'EXPIRED'):
+                logger.error(f"Bulk operation {op['status']}: {op.get('errorCode')}")
+                return None
+
+        # Sem URL = nenhum produto
+        if not op.get('url'):
+            return []
+
+        # O JSONL fica em storage externo: requests sem o token da Shopify
+        produtos = {}
+        with requests.get(op['url'], stream=True) as r:
+            r.raise_for_status()
+            for line in r.iter_lines():
+                if not line:
+                    continue
+                node = json.loads(line)
+                tipo, nid = _gid_tipo_id(node['id'])
+
+                if tipo == 'Product':
+                    produtos[nid] = {
+                        'id': nid,
+                        'title': node.get('title', ''),
+                        'product_type': node.get('productType') or '',
+                        'tags': ', '.join(node.get('tags') or []),
+                        'variants': [],
+                        'images': [],
+                    }
+                    continue
+
+                pai = produtos.get(_gid_tipo_id(node.get('__parentId', 'gid://shopify/x/0'))[1])
+                if pai is None:
+                    continue
+                if tipo == 'ProductVariant':
+                    opcoes = node.get('selectedOptions') or []
+                    pai['variants'].append({
+                        'id': nid,
+                        'price': node.get('price', '0'),
+                        'option1': opcoes[0]['value'] if opcoes else None,
+                    })
+                elif node.get('url'):
+                    pai['images'].append({'id': nid, 'src': node['url']})
+
+        return list(produtos.values())
+
+    @functools.lru_cache(maxsize=None)
+    def _resolve_collection_id(self, collection_handle: str) -> Optional[int]:
+        """ID da coleção pelo handle: smart primeiro, custom só se não achar"""
+        for tipo in ('smart_collections', 'custom_collections'):
+            r = self.session.get(f'{self.base_url}/{tipo}.json', params={'handle': collection_handle, 'fields': 'id,handle'})
+            if r.status_code != 200:
+                continue
+            for c in r.json().get(tipo, []):
+                if c['handle'] == collection_handle:
+                    return c['id']
+        return None
+
     def get_products(self, collection_handle: str = None, limit: int = None) -> List[Dict]:
-        """Busca produtos da loja"""
+        """Busca produtos da loja (bulk operation, com fallback para REST)"""
+        produtos = self._fetch_products_bulk(collection_handle)
+        if produtos is not None:
+            return produtos[:limit] if limit else produtos
+
+        logger.warning("↩️  Bulk operation indisponível, usando REST...")
         produtos = []
 
         if collection_handle:
-            # Buscar ID da coleção
-            url = f'{self.base_url}/smart_collections.json'
-            r = requests.get(url, headers=self.headers)
-            if r.status_code == 200:
-                for c in r.json().get('smart_collections', []):
-                    if c['handle'] == collection_handle:
-                        url = f'{self.base_url}/products.json?collection_id={c["id"]}&limit=250'
-                        break
-
-            # Tentar custom collections também
-            url = f'{self.base_url}/custom_collections.json'
-            r = requests.get(url, headers=self.headers)
-            if r.status_code == 200:
-                for c in r.json().get('custom_collections', []):
-                    if c['handle'] == collection_handle:
-                        url = f'{self.base_url}/products.json?collection_id={c["id"]}&limit=250'
-                        break
+            cid = self._resolve_collection_id(collection_handle)
+            if cid is None:
+                logger.error(f"❌ Coleção não encontrada: {collection_handle}")
+                return []
+            url = f'{self.base_url}/products.json?collection_id={cid}&limit=250'
         else:
             url = f'{self.base_url}/products.json?limit=250'
 
-        r = requests.get(url, headers=self.headers)
+        r = self.session.get(url)
         if r.status_code == 200:
             produtos = r.json().get('products', [])
 
@@ -117,7 +486,17 @@ class ShopifyEnhancer:
 
         return produtos
 
-    def process_collection(self, collection: str = None, limit: int = None):
+    def _carregar_processados(self) -> set:
+        try:
+            return set(json.loads(PROCESSED_PATH.read_text(encoding='utf-8')))
+        except (OSError, ValueError):
+            return set()
+
+    def _salvar_processados(self):
+        PROCESSED_PATH.parent.mkdir(parents=True, exist_ok=True)
+        PROCESSED_PATH.write_text(json.dumps(sorted(self._processed)), encoding='utf-8')
+
+    def process_collection(self, collection: str = None, limit: int = None, reprocessar: bool = False):
         """Processa todos os produtos de uma coleção"""
         print("\n" + "="*60)
         print("🚀 PÓS-PROCESSAMENTO DE PRODUTOS")
@@ -127,20 +506,44 @@ class ShopifyEnhancer:
             print("⚠️  MODO DRY-RUN: Nenhuma alteração será feita")
 
         print(f"📦 Buscando produtos...")
-        produtos = self.get_products(collection, limit)
-        print(f"   Encontrados: {len(produtos)} produtos\n")
+        produtos = self.get_products(collection)
+        print(f"   Encontrados: {len(produtos)} produtos")
+
+        # Pula o que já foi processado: pelo arquivo local ou pela tag na loja
+        # (a tag reconstrói o estado em uma máquina nova)
+        self._processed = set() if reprocessar else self._carregar_processados()
+        if not reprocessar:
+            for produto in produtos:
+                tags = {t.strip() for t in (produto.get('tags') or '').split(',')}
+                if 'processado' in tags:
+                    self._processed.add(produto['id'])
+
+            total = len(produtos)
+            produtos = [p for p in produtos if p['id'] not in self._processed]
+            if total > len(produtos):
+                print(f"   ⏭️  {total - len(produtos)} já processados (use --reprocessar para refazer)")
+
+        if limit:
+            produtos = produtos[:limit]
+        print()
 
         for idx, produto in enumerate(produtos, 1):
             print(f"\n{'─'*60}")
             print(f"[{idx}/{len(produtos)}] {produto['title'][:50]}...")
             print(f"{'─'*60}")
 
+            t0 = time.perf_counter()
             try:
                 resultado = self.process_single_product(produto)
 
                 if resultado['success']:
                     self.stats['sucesso'] += 1
                     print(f"✅ Produto processado com sucesso!")
+
+                    if not self.dry_run:
+                        self._processed.add(produto['id'])
+                        if self.stats['sucesso'] % PROCESSED_FLUSH_A_CADA == 0:
+                            self._salvar_processados()
                 else:
                     self.stats['erros'] += 1
                     print(f"❌ Erro: {resultado.get('error', 'Desconhecido')}")
@@ -149,8 +552,11 @@ class ShopifyEnhancer:
                 self.stats['erros'] += 1
                 print(f"❌ Exceção: {str(e)}")
 
+            self.duracoes.append(time.perf_counter() - t0)
             self.stats['processados'] += 1
-            time.sleep(1)  # Rate limiting
+
+        if not self.dry_run:
+            self._salvar_processados()
 
         self._print_report()
 
@@ -165,7 +571,9 @@ class ShopifyEnhancer:
         if not image_urls:
             return {'success': False, 'error': 'Produto sem imagens'}
 
-        processed_images = self.image_processor.process_product_images(image_urls)
+        # Download em paralelo; o processamento (CPU) continua sequencial
+        blobs = self._loop.run_until_complete(self._fetch_all(image_urls[:20]))
+        processed_images = self.image_processor.process_bytes_batch(blobs)
         print(f"   ✓ {len(processed_images)} imagens processadas")
 
         # 2. GERAR CONTEÚDO COM GEMINI
@@ -193,12 +601,8 @@ class ShopifyEnhancer:
         print("💰 Etapa 3/4: Calculando preço (markup 2.5)...")
 
         # Detectar nicho pelo product_type
-        product_type = produto.get('product_type', '').lower()
-        nicho = 'acessorios'
-        for n in ['bolsas', 'brincos', 'colares', 'pulseiras', 'aneis', 'relogios', 'oculos']:
-            if n in product_type:
-                nicho = n
-                break
+        m = _NICHO_RE.search(produto.get('product_type') or '')
+        nicho = m.group(1).lower() if m else 'acessorios'
 
         # Estimar custo (assumindo que preço atual tem markup errado)
         preco_atual = float(produto['variants'][0].get('price', 100))
@@ -226,49 +630,31 @@ class ShopifyEnhancer:
 
             # 4A. SUBSTITUIR IMAGENS (upload das imagens processadas)
             print("   📸 Substituindo imagens...")
-            images_updated = self.shopify_client.replace_product_images(pid, processed_images)
+            images_updated = self._substituir_imagens(pid, processed_images)
 
             if not images_updated:
                 print("   ⚠️ Falha ao atualizar imagens - continuando com outros campos...")
 
-            # 4B. ATUALIZAR TÍTULO, DESCRIÇÃO, TAGS
-            print("   📝 Atualizando textos...")
-            update_data = {
-                'product': {
-                    'id': pid,
-                    'title': new_content['titulo'],
-                    'body_html': self._format_description(
-                        new_content['descricao'],
-                        pricing
-                    ),
-                    'tags': ', '.join(new_content.get('tags', []) + ['processado', 'clean-aesthetic'])
-                }
+            # 4B. TÍTULO, DESCRIÇÃO, TAGS
+            product_input = {
+                'id': f'gid://shopify/Product/{pid}',
+                'title': new_content['titulo'],
+                'descriptionHtml': self._format_description(
+                    new_content['descricao'],
+                    pricing
+                ),
+                'tags': new_content.get('tags', []) + ['processado', 'clean-aesthetic']
             }
 
-            r = requests.put(
-                f'{self.base_url}/products/{pid}.json',
-                headers=self.headers,
-                json=update_data
-            )
-
-            if r.status_code != 200:
-                print(f"   ❌ Erro ao atualizar textos: {r.status_code}")
-            else:
-                print("   ✓ Textos atualizados")
-
-            # 4C. ATUALIZAR VARIANTES (preço + opções traduzidas)
-            print("   🔄 Atualizando variantes...")
+            # 4C. VARIANTES (preço + opções traduzidas)
             opcoes_traduzidas = new_content.get('opcoes_padronizadas', [])
-            variantes_atualizadas = 0
+            variantes = []
 
             for idx, variant in enumerate(produto['variants']):
-                vid = variant['id']
-                variant_data = {
-                    'variant': {
-                        'id': vid,
-                        'price': f"{pricing['preco_sugerido']:.2f}",
-                        'compare_at_price': f"{pricing['preco_de']:.2f}"
-                    }
+                variant_input = {
+                    'id': f"gid://shopify/ProductVariant/{variant['id']}",
+                    'price': f"{pricing['preco_sugerido']:.2f}",
+                    'compareAtPrice': f"{pricing['preco_de']:.2f}"
                 }
 
                 # Traduzir opção se existir mapeamento
@@ -276,21 +662,39 @@ class ShopifyEnhancer:
                     nova_opcao = opcoes_traduzidas[idx]
                     # Limpar opção (remover "color", "in golden", etc)
                     nova_opcao = self._limpar_opcao(nova_opcao)
-                    variant_data['variant']['option1'] = nova_opcao
+                    variant_input['options'] = [nova_opcao]
                     print(f"      ✓ Variante: {nova_opcao}")
 
-                r = requests.put(
-                    f'{self.base_url}/variants/{vid}.json',
-                    headers=self.headers,
-                    json=variant_data
-                )
+                variantes.append(variant_input)
+
+            # Textos e variantes em uma única requisição GraphQL
+            print("   🔄 Atualizando textos e variantes...")
+            data = self._graphql(PRODUCT_UPDATE_MUTATION, {
+                'product': product_input,
+                'productId': product_input['id'],
+                'variants': variantes,
+            })
 
-                if r.status_code == 200:
-                    variantes_atualizadas += 1
+            if data is None:
+                print("   ❌ Erro ao atualizar produto")
+                return {'success': False, 'error': 'Falha no GraphQL'}
 
-                time.sleep(0.3)  # Rate limiting
+            erros_produto = data['productUpdate']['userErrors']
+            erros_variantes = data['productVariantsBulkUpdate']['userErrors']
+
+            if erros_produto:
+                print(f"   ❌ Erro ao atualizar textos: {erros_produto}")
+            else:
+                print("   ✓ Textos atualizados")
+
+            if erros_variantes:
+                print(f"   ❌ Erro nas variantes: {erros_variantes}")
+            else:
+                print(f"   ✓ {len(variantes)} variantes atualizadas")
 
-            print(f"   ✓ {variantes_atualizadas} variantes atualizadas")
+            # Com userErrors o produto não entra em processed.json e é refeito na próxima execução
+            if erros_produto or erros_variantes:
+                return {'success': False, 'error': f"userErrors: {erros_produto + erros_variantes}"}
             print("   ✅ Produto atualizado na loja!")
         else:
             print("⚠️  Etapa 4/4: PULADA (dry-run)")
@@ -299,54 +703,20 @@ class ShopifyEnhancer:
 
     def _format_description(self, descricao: str, pricing: Dict) -> str:
         """Formata descrição HTML com transparência de preços"""
-        html = f"""
-<div style="font-family: 'Inter', sans-serif; line-height: 1.6;">
-    {descricao}
-    
-    <hr style="margin: 30px 0; border: none; border-top: 1px solid #eee;">
-    
-    <h4>🚚 Entrega e Garantia</h4>
-    <ul>
-        <li>✅ Frete Grátis para todo Brasil</li>
-        <li>✅ Prazo de entrega: 15-25 dias úteis</li>
-        <li>✅ Garantia de 30 dias</li>
-        <li>✅ 7 dias para troca/devolução</li>
-    </ul>
-    
-    <p style="font-weight: bold; color: #2e7d32;">
-        💳 Parcele em até 6x de R$ {pricing['parcelamento'][6]['valor']:.2f} sem juros
-    </p>
-</div>
-"""
-        return html
+        return _render_description(descricao, f"{pricing['parcelamento'][6]['valor']:.2f}")
 
-    def _limpar_opcao(self, opcao: str) -> str:
+    @staticmethod
+    def _limpar_opcao(opcao: str) -> str:
         """
         Limpa e traduz nome de opção de variante
         Remove 'color', 'in golden', etc e traduz para português
         """
-        import re
-
         if not opcao:
             return opcao
 
-        # Dicionário de traduções
-        traducoes = {
-            'black': 'Preto', 'white': 'Branco', 'red': 'Vermelho',
-            'blue': 'Azul', 'green': 'Verde', 'pink': 'Rosa',
-            'gold': 'Dourado', 'golden': 'Dourado', 'silver': 'Prata',
-            'brown': 'Marrom', 'beige': 'Bege', 'grey': 'Cinza', 'gray': 'Cinza',
-            'purple': 'Roxo', 'orange': 'Laranja', 'yellow': 'Amarelo',
-            'navy': 'Azul Marinho', 'wine': 'Vinho', 'cream': 'Creme',
-            'khaki': 'Cáqui', 'coffee': 'Café', 'caramel': 'Caramelo',
-            'rose': 'Rosé', 'champagne': 'Champanhe', 'ivory': 'Marfim',
-            'apricot': 'Damasco', 'coral': 'Coral', 'mint': 'Menta',
-            'small': 'Pequeno', 'medium': 'Médio', 'large': 'Grande',
-        }
-
         # Remover sufixos desnecessários
-        opcao_limpa = re.sub(r'\s*[-_]?\s*(color|colour|cor)\s*$', '', opcao, flags=re.IGNORECASE)
-        opcao_limpa = re.sub(r'\s+in\s+(golden|silver|gold)\s*$', '', opcao_limpa, flags=re.IGNORECASE)
+        opcao_limpa = _RE_COLOR_SUFFIX.sub('', opcao)
+        opcao_limpa = _RE_IN_METAL.sub('', opcao_limpa)
         opcao_limpa = opcao_limpa.strip()
 
         # Traduzir palavras conhecidas
@@ -354,9 +724,9 @@ class ShopifyEnhancer:
         resultado = []
 
         for palavra in palavras:
-            palavra_limpa = re.sub(r'[^a-z]', '', palavra)
-            if palavra_limpa in traducoes:
-                resultado.append(traducoes[palavra_limpa])
+            palavra_limpa = _RE_NON_ALPHA.sub('', palavra)
+            if palavra_limpa in _TRADUCOES:
+                resultado.append(_TRADUCOES[palavra_limpa])
             else:
                 # Manter palavra original capitalizada
                 resultado.append(palavra.capitalize())
@@ -377,6 +747,9 @@ class ShopifyEnhancer:
             taxa = (self.stats['sucesso']/self.stats['processados']*100)
             print(f"Taxa de sucesso: {taxa:.1f}%")
         print(f"Duração: {duracao}")
+        if len(self.duracoes) >= 2:
+            q = statistics.quantiles(self.duracoes, n=100, method='inclusive')
+            print(f"Por produto: p50 {q[49]:.1f}s | p95 {q[94]:.1f}s | p99 {q[98]:.1f}s | máx {max(self.duracoes):.1f}s")
         print("="*60)
 
 
@@ -385,11 +758,15 @@ def main():
     parser.add_argument('--collection', '-c', default=None, help='Handle da coleção')
     parser.add_argument('--limit', '-l', type=int, default=None, help='Limite de produtos')
     parser.add_argument('--dry-run', '-d', action='store_true', help='Não fazer alterações')
+    parser.add_argument('--reprocessar', action='store_true', help='Processa também produtos já processados')
 
     args = parser.parse_args()
 
     enhancer = ShopifyEnhancer(dry_run=args.dry_run)
-    enhancer.process_collection(args.collection, args.limit)
+    try:
+        enhancer.process_collection(args.collection, args.limit, args.reprocessar)
+    finally:
+        enhancer.close()
 
 
 if __name__ == '__main__':
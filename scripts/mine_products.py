@@ -14,6 +14,7 @@ import csv
 import json
 import argparse
 import logging
+import multiprocessing
 from datetime import datetime
 from pathlib import Path
 
@@ -35,6 +36,28 @@ logger = logging.getLogger(__name__)
 DATA_DIR = Path(__file__).parent.parent / "data"
 DATA_DIR.mkdir(exist_ok=True)
 
+# A partir deste volume a análise vai pela Message Batches API (50% do custo)
+MIN_PRODUTOS_BATCH = 10
+
+# Categorias mineradas ao mesmo tempo no --todas (um processo/Chrome cada)
+MAX_PROCESSOS = 4
+
+# Bytes acumulados antes de cada escrita no CSV de mineração
+BUFFER_CSV = 1 << 20
+
+
+def _linha_csv(valores) -> bytes:
+    """Uma linha CSV com as regras de aspas do csv.writer padrão"""
+    campos = []
+    for valor in valores:
+        texto = '' if valor is None else str(valor)
+        if '"' in texto:
+            texto = '"' + texto.replace('"', '""') + '"'
+        elif ',' in texto or '\n' in texto or '\r' in texto:
+            texto = '"' + texto + '"'
+        campos.append(texto)
+    return (','.join(campos) + '\r\n').encode('utf-8')
+
 
 def salvar_produtos_csv(produtos: list, arquivo: str = None):
     """Salva produtos em CSV"""
@@ -48,49 +71,92 @@ def salvar_produtos_csv(produtos: list, arquivo: str = None):
 
     fieldnames = list(produtos[0].keys())
 
-    with open(arquivo, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(produtos)
+    # Mesmo formato do csv.DictWriter (aspas só quando preciso, \r\n), mas
+    # montado em um buffer de bytes e gravado em blocos de ~1 MiB
+    with open(arquivo, 'wb') as f:
+        buf = bytearray(_linha_csv(fieldnames))
+        for produto in produtos:
+            buf += _linha_csv(produto.get(campo) for campo in fieldnames)
+            if len(buf) > BUFFER_CSV:
+                f.write(buf)
+                buf.clear()
+        f.write(buf)
 
     logger.info(f"✅ {len(produtos)} produtos salvos em: {arquivo}")
 
 
-def salvar_produtos_aprovados(produtos: list):
-    """Salva produtos aprovados no arquivo principal"""
-    arquivo = DATA_DIR / "products_approved.csv"
+def _carregar_ids_aprovados(arquivo: Path, ids_arquivo: Path) -> set:
+    """IDs já aprovados; na primeira execução o índice é gerado a partir do CSV"""
+    if ids_arquivo.exists():
+        return set(ids_arquivo.read_text(encoding='utf-8').splitlines())
 
-    # Se arquivo existe, carrega existentes
-    existentes = []
+    ids = set()
     if arquivo.exists():
         with open(arquivo, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            existentes = list(reader)
+            ids = {row.get('product_id') for row in csv.DictReader(f)}
+
+    ids_arquivo.write_text(''.join(f"{i}\n" for i in ids), encoding='utf-8')
+    return ids
+
+
+def salvar_produtos_aprovados(produtos: list):
+    """Acrescenta os produtos aprovados novos ao arquivo principal
+
+    O CSV só recebe append; products_approved.ids (um product_id por linha)
+    é o índice de duplicatas, então o custo é proporcional aos novos.
+    """
+    arquivo = DATA_DIR / "products_approved.csv"
+    ids_arquivo = DATA_DIR / "products_approved.ids"
 
-    # Adiciona novos (evita duplicatas por product_id)
-    ids_existentes = {p.get('product_id') for p in existentes}
-    novos = [p for p in produtos if p.get('product_id') not in ids_existentes]
+    vistos = _carregar_ids_aprovados(arquivo, ids_arquivo)
 
-    todos = existentes + novos
+    # Adiciona novos (evita duplicatas por product_id, inclusive no próprio lote)
+    novos = []
+    for p in produtos:
+        pid = str(p.get('product_id'))
+        if pid not in vistos:
+            vistos.add(pid)
+            novos.append(p)
 
-    if todos:
-        fieldnames = list(todos[0].keys())
-        with open(arquivo, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
+    if not novos:
+        return
+
+    # Arquivo existente mantém o cabeçalho original
+    fieldnames = None
+    if arquivo.exists() and arquivo.stat().st_size > 0:
+        with open(arquivo, 'r', newline='', encoding='utf-8') as f:
+            fieldnames = next(csv.reader(f), None)
+
+    with open(arquivo, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames or list(novos[0].keys()), extrasaction='ignore')
+        if not fieldnames:
             writer.writeheader()
-            writer.writerows(todos)
+        writer.writerows(novos)
+
+    with open(ids_arquivo, 'a', encoding='utf-8') as f:
+        f.writelines(f"{p.get('product_id')}\n" for p in novos)
 
-        logger.info(f"✅ {len(novos)} novos produtos adicionados aos aprovados")
+    logger.info(f"✅ {len(novos)} novos produtos adicionados aos aprovados")
 
 
-def minerar_categoria(scraper: AliExpressScraper, categoria: str, quantidade: int, analisar_ia: bool = False):
-    """Minera uma categoria específica"""
+def minerar_categoria(categoria: str, quantidade: int, analisar_ia: bool = False, headless: bool = True):
+    """Minera uma categoria específica
+
+    Cria e fecha o próprio scraper, então pode rodar em outro processo
+    (Selenium não é thread-safe, mas cada processo tem seu Chrome).
+    """
     logger.info(f"\n{'='*60}")
     logger.info(f"🔍 Minerando: {categoria.upper()}")
     logger.info(f"{'='*60}")
 
-    # Busca produtos
-    produtos = scraper.buscar_categoria(categoria, quantidade)
+    # Busca produtos: HTTP primeiro, Chrome só se a listagem exigir JS
+    scraper = AliExpressScraper(headless=headless)
+    try:
+        produtos = scraper.buscar_categoria_http(categoria, quantidade)
+        if not produtos:
+            produtos = scraper.buscar_categoria(categoria, quantidade)
+    finally:
+        scraper._close_driver()
 
     if not produtos:
         logger.warning(f"Nenhum produto encontrado em {categoria}")
@@ -101,9 +167,13 @@ def minerar_categoria(scraper: AliExpressScraper, categoria: str, quantidade: in
         logger.info("🤖 Analisando com IA...")
         ai_client = ClaudeClient()
 
+        if len(produtos) >= MIN_PRODUTOS_BATCH:
+            analises = ai_client.analisar_batch(produtos)
+        else:
+            analises = [ai_client.analisar_produto(produto) for produto in produtos]
+
         produtos_analisados = []
-        for produto in produtos:
-            analise = ai_client.analisar_produto(produto)
+        for produto, analise in zip(produtos, analises):
             if analise and analise.aprovado:
                 produto['ai_score'] = analise.score
                 produto['ai_titulo'] = analise.titulo_otimizado
@@ -136,24 +206,25 @@ def main():
     print("🔍 MINERAÇÃO DE PRODUTOS - TWP Acessórios")
     print("="*60)
 
-    scraper = AliExpressScraper(headless=args.headless)
     criterios = CriteriosMineracao()
 
     todos_produtos = []
 
     try:
         if args.todas:
-            # Minera todas as categorias
-            for categoria in criterios.categorias_permitidas:
-                produtos = minerar_categoria(scraper, categoria, args.quantidade, args.analisar)
-                todos_produtos.extend(produtos)
+            # Minera todas as categorias, uma por processo
+            categorias = list(criterios.categorias_permitidas)
+            args_list = [(c, args.quantidade, args.analisar, args.headless) for c in categorias]
+            with multiprocessing.Pool(processes=min(MAX_PROCESSOS, len(categorias))) as pool:
+                for produtos in pool.starmap(minerar_categoria, args_list):
+                    todos_produtos.extend(produtos)
         elif args.categoria:
             # Minera categoria específica
-            produtos = minerar_categoria(scraper, args.categoria, args.quantidade, args.analisar)
+            produtos = minerar_categoria(args.categoria, args.quantidade, args.analisar, args.headless)
             todos_produtos.extend(produtos)
         else:
             # Padrão: jewelry
-            produtos = minerar_categoria(scraper, "jewelry", args.quantidade, args.analisar)
+            produtos = minerar_categoria("jewelry", args.quantidade, args.analisar, args.headless)
             todos_produtos.extend(produtos)
 
         # Salva resultados
@@ -172,8 +243,6 @@ def main():
     except Exception as e:
         logger.error(f"❌ Erro: {e}")
         raise
-    finally:
-        scraper._close_driver()
 
 
 if __name__ == "__main__":
@@ -6,23 +6,232 @@ Edita produtos já importados: títulos, descrições, preços, imagens, tags
 import sys
 import os
 import time
+import asyncio
 import logging
 import re
+import json
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from dataclasses import dataclass
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from dotenv import load_dotenv
-from anthropic import Anthropic
+from src.cache import LLMCache, FileBackend
+
+try:
+    import orjson
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+except ImportError:
+    json_loads = json.loads
+
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
 
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
 logger = logging.getLogger(__name__)
 
+# Produtos processados em paralelo; todas as threads compartilham o limitador
+CONCORRENCIA = 5
+
+# REST Admin: o bucket vaza 2 req/s; acima de 80% de ocupação as threads pausam
+SHOPIFY_REQ_POR_SEGUNDO = 2
+LIMIAR_BUCKET = 0.8
+
+# Palavras-chave por categoria (a primeira que aparecer no título vence)
+_CATEGORIES: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("brincos", ("earring", "brinco", "ear")),
+    ("colares", ("necklace", "colar", "pendant", "chain")),
+    ("pulseiras", ("bracelet", "pulseira", "bangle")),
+    ("aneis", ("ring", "anel")),
+    ("relogios", ("watch", "relógio", "relogio")),
+    ("oculos", ("sunglasses", "glasses", "óculos", "oculos")),
+    ("bolsas", ("bag", "bolsa", "purse", "handbag")),
+)
+
+# Tags extras quando alguma das palavras aparece no título
+_TAG_RULES: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("dourado", ("gold", "dourad", "ouro")),
+    ("prateado", ("silver", "prata", "prateado")),
+    ("cristal", ("crystal", "cristal")),
+    ("perola", ("pearl", "perola", "pérola")),
+    ("vintage", ("vintage", "retro")),
+    ("elegante", ("elegant", "elegante")),
+)
+
+# Categorias aceitas na resposta da IA (as mesmas de detectar_categoria)
+CATEGORIAS_VALIDAS = tuple(c for c, _ in _CATEGORIES) + ("acessorios",)
+
+# Tradução básica de títulos: uma regex com todas as palavras, uma passada por título
+_TRADUCOES_TITULO = {
+    "earrings": "Brincos",
+    "necklace": "Colar",
+    "bracelet": "Pulseira",
+    "ring": "Anel",
+    "watch": "Relógio",
+    "bag": "Bolsa",
+    "sunglasses": "Óculos de Sol",
+    "jewelry": "Joia",
+    "women": "Feminino",
+    "fashion": "Fashion",
+    "elegant": "Elegante",
+    "vintage": "Vintage",
+    "gold": "Dourado",
+    "silver": "Prateado",
+    "crystal": "Cristal",
+    "pearl": "Pérola",
+}
+_TRADUCAO_RE = re.compile(
+    "|".join(map(re.escape, sorted(_TRADUCOES_TITULO, key=len, reverse=True))),
+    re.IGNORECASE
+)
+
+# Modelo usado por provedor de IA (self.ai_type)
+MODELOS_IA = {
+    "openai": "gpt-4o-mini",
+    "gemini": "gemini-pro",
+}
+
+# Instruções fixas do gerar_tudo: vão como prefixo estável (system no OpenAI,
+# que cacheia prefixos repetidos) e só o título/categoria muda entre as chamadas
+INSTRUCOES_CONTEUDO = f"""Você cria o conteúdo de produtos para e-commerce brasileiro.
+Recebe o título original (em inglês) e a categoria provável.
+
+TÍTULO:
+- Máximo 70 caracteres
+- Em português brasileiro
+- Sem marca registrada
+- Atrativo e descritivo
+- Pode usar emojis no início (1 apenas)
+
+DESCRIÇÃO (HTML):
+1. <h3> com título atrativo e emoji
+2. <p> com descrição persuasiva (2-3 frases)
+3. <h4>🎁 Por que você vai amar:</h4> seguido de <ul> com 4 benefícios
+4. <h4>📦 Especificações:</h4> seguido de <ul> com detalhes
+5. <p> com garantias: frete grátis, compra segura, 7 dias troca
+Use emojis ✨🎁💎✅🚚🔒
+
+CATEGORIA: uma de {", ".join(CATEGORIAS_VALIDAS)}
+
+RESPONDA APENAS com um objeto JSON:
+{{"titulo": "...", "descricao_html": "...", "tags": ["tag1", "tag2"], "categoria": "..."}}"""
+
+# Chave do cache de conteúdo: títulos que só diferem em caixa/pontuação
+# (variações do mesmo produto) reaproveitam a mesma resposta
+_NAO_PALAVRA_RE = re.compile(r'\W+')
+
+
+def _normalizar_titulo(titulo: str) -> str:
+    return _NAO_PALAVRA_RE.sub(' ', titulo.lower()).strip()
+
+
+# Próxima página no header Link da REST Admin
+_LINK_NEXT_RE = re.compile(r'<([^>]+)>; rel="next"')
+
+# Catálogo inteiro em uma bulk operation: variantes vêm como linhas filhas no JSONL
+BULK_PRODUCTS_QUERY = """
+mutation {
+  bulkOperationRunQuery(
+    query: \"\"\"
+    {
+      products {
+        edges {
+          node {
+            id
+            title
+            tags
+            vendor
+            variants {
+              edges {
+                node {
+                  id
+                  price
+                }
+              }
+            }
+          }
+        }
+      }
+    }
+    \"\"\"
+  ) {
+    bulkOperation { id status }
+    userErrors { field message }
+  }
+}
+"""
+
+BULK_STATUS_QUERY = """
+{
+  currentBulkOperation {
+    id
+    status
+    errorCode
+    url
+  }
+}
+"""
+
+VARIANTS_BULK_UPDATE_MUTATION = """
+mutation($productId: ID!, $variants: [ProductVariantsBulkInput!]!) {
+  productVariantsBulkUpdate(productId: $productId, variants: $variants) {
+    userErrors { field message }
+  }
+}
+"""
+
+
+def _gid_tipo_id(gid: str):
+    """'gid://shopify/ProductVariant/123' -> ('ProductVariant', 123)"""
+    _, _, tipo, numero = gid.rsplit('/', 3)
+    return tipo, int(numero)
+
+
+class LimitadorShopify:
+    """Pausa as requisições só quando o leaky bucket da REST está quase cheio
+
+    A ocupação vem do header X-Shopify-Shop-Api-Call-Limit ("usado/total")
+    de cada resposta; com folga, as requisições saem sem espera.
+    """
+
+    def __init__(self, limiar: float = LIMIAR_BUCKET):
+        self.limiar = limiar
+        self._liberado_em = 0.0
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        with self._lock:
+            espera = self._liberado_em - time.monotonic()
+        if espera > 0:
+            time.sleep(espera)
+
+    def atualizar(self, response: requests.Response):
+        limite = response.headers.get("X-Shopify-Shop-Api-Call-Limit")
+        if not limite:
+            return
+        usado, total = map(int, limite.split("/"))
+        if usado <= total * self.limiar:
+            return
+
+        # Tempo para o bucket vazar de volta até o limiar
+        pausa = (usado - total * self.limiar) / SHOPIFY_REQ_POR_SEGUNDO
+        with self._lock:
+            self._liberado_em = max(self._liberado_em, time.monotonic() + pausa)
+
 
 @dataclass
 class ProdutoProcessado:
@@ -85,49 +294,154 @@ class ShopifyProductProcessor:
         if not self.ai_client:
             logger.warning("⚠️ Nenhuma API de IA disponível - usando templates básicos")
 
+        # Sessão com keep-alive + retry automático em 429/5xx (respeita Retry-After)
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+        self.session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry))
+
+        self._limitador = LimitadorShopify()
+        self._cache = LLMCache(FileBackend(".cache/conteudo"))
+        self._automato = self._montar_automato() if AHOCORASICK_AVAILABLE else None
+
         # Configurações de preço
         self.markup = float(os.getenv("DEFAULT_MARKUP", "2.5"))
         self.taxa_cambio = 5.5  # USD para BRL
 
         logger.info(f"✅ Shopify conectada: {self.store_url}")
 
-    def get_all_products(self) -> List[Dict]:
-        """Busca todos os produtos da loja"""
-        produtos = []
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Requisição à REST Admin; 429 é repetido pelo Retry da sessão (Retry-After)"""
+        if "json" in kwargs:
+            # Corpo serializado aqui (orjson se disponível); Content-Type já está na sessão
+            kwargs["data"] = json_dumps(kwargs.pop("json"))
+        self._limitador.aguardar()
+        response = self.session.request(method, url, **kwargs)
+        self._limitador.atualizar(response)
+        return response
+
+    def _graphql(self, query: str, variables: Dict = None) -> Optional[Dict]:
+        """Executa uma query GraphQL e retorna `data` (ou None em erro)"""
+        payload = {"query": query}
+        if variables:
+            payload["variables"] = variables
+        response = self._request("POST", f"{self.base_url}/graphql.json", json=payload)
+        if response.status_code != 200:
+            logger.error(f"Erro GraphQL: {response.status_code}")
+            return None
+        data = json_loads(response.content)
+        if data.get("errors"):
+            logger.error(f"Erro GraphQL: {data['errors']}")
+            return None
+        return data.get("data")
+
+    def _bulk_products_url(self) -> Optional[str]:
+        """Roda a bulk operation do catálogo e retorna a URL do JSONL
+
+        Retorna None se a bulk operation não estiver disponível (o chamador
+        cai para a paginação REST) e "" se não houver produtos.
+        """
+        data = self._graphql(BULK_PRODUCTS_QUERY)
+        if not data:
+            return None
+
+        erros = data["bulkOperationRunQuery"]["userErrors"]
+        if erros:
+            logger.error(f"Bulk operation recusada: {erros}")
+            return None
+
+        while True:
+            time.sleep(2)
+            status = self._graphql(BULK_STATUS_QUERY)
+            if not status:
+                return None
+            op = status["currentBulkOperation"]
+            if op["status"] == "COMPLETED":
+                return op.get("url") or ""
+            if op["status"] in ("FAILED", "CANCELED", "EXPIRED"):
+                logger.error(f"Bulk operation {op['status']}: {op.get('errorCode')}")
+                return None
+
+    def _iter_bulk_jsonl(self, url: str) -> Iterator[Dict]:
+        """Produtos do JSONL no formato da REST, um por vez
+
+        As variantes vêm logo depois do produto pai, então cada produto é
+        entregue quando a próxima linha de produto aparece.
+        """
+        atual = None
+        # O JSONL fica em storage externo: requests sem o token da Shopify
+        with requests.get(url, stream=True) as r:
+            r.raise_for_status()
+            for line in r.iter_lines():
+                if not line:
+                    continue
+                node = json_loads(line)
+                tipo, nid = _gid_tipo_id(node["id"])
+
+                if tipo == "Product":
+                    if atual is not None:
+                        yield atual
+                    atual = {
+                        "id": nid,
+                        "title": node.get("title", ""),
+                        "tags": ", ".join(node.get("tags") or []),
+                        "vendor": node.get("vendor") or "",
+                        "variants": [],
+                    }
+                elif tipo == "ProductVariant" and atual is not None:
+                    if _gid_tipo_id(node["__parentId"])[1] == atual["id"]:
+                        atual["variants"].append({"id": nid, "price": node.get("price", "0")})
+
+        if atual is not None:
+            yield atual
+
+    def iter_all_products(self) -> Iterator[Dict]:
+        """Percorre todos os produtos da loja sem manter o catálogo em memória
+
+        Usa a bulk operation e, se indisponível, a paginação da REST.
+        """
+        url = self._bulk_products_url()
+        if url is not None:
+            if url:
+                yield from self._iter_bulk_jsonl(url)
+            return
+
+        logger.warning("↩️  Bulk operation indisponível, paginando pela REST...")
         url = f"{self.base_url}/products.json?limit=250"
 
         while url:
-            response = requests.get(url, headers=self.headers)
-            if response.status_code == 200:
-                data = response.json()
-                produtos.extend(data.get("products", []))
-
-                # Paginação
-                link_header = response.headers.get("Link", "")
-                if 'rel="next"' in link_header:
-                    match = re.search(r'<([^>]+)>; rel="next"', link_header)
-                    url = match.group(1) if match else None
-                else:
-                    url = None
-            else:
+            response = self._request("GET", url)
+            if response.status_code != 200:
                 logger.error(f"Erro ao buscar produtos: {response.status_code}")
-                break
+                return
 
-        return produtos
+            yield from json_loads(response.content).get("products", [])
+
+            # Paginação
+            match = _LINK_NEXT_RE.search(response.headers.get("Link", ""))
+            url = match.group(1) if match else None
+
+    def count_products(self) -> int:
+        """Total de produtos da loja (sem buscar os produtos)"""
+        response = self._request("GET", f"{self.base_url}/products/count.json")
+        if response.status_code != 200:
+            logger.error(f"Erro ao contar produtos: {response.status_code}")
+            return 0
+        return json_loads(response.content).get("count", 0)
 
     def get_product(self, product_id: str) -> Optional[Dict]:
         """Busca um produto específico"""
         url = f"{self.base_url}/products/{product_id}.json"
-        response = requests.get(url, headers=self.headers)
+        response = self._request("GET", url)
 
         if response.status_code == 200:
-            return response.json().get("product")
+            return json_loads(response.content).get("product")
         return None
 
     def update_product(self, product_id: str, data: Dict) -> bool:
         """Atualiza um produto"""
         url = f"{self.base_url}/products/{product_id}.json"
-        response = requests.put(url, headers=self.headers, json={"product": data})
+        response = self._request("PUT", url, json={"product": data})
 
         if response.status_code == 200:
             return True
@@ -135,95 +449,85 @@ class ShopifyProductProcessor:
             logger.error(f"Erro ao atualizar produto {product_id}: {response.text}")
             return False
 
-    def gerar_titulo_otimizado(self, titulo_original: str, categoria: str = "") -> str:
-        """Gera título otimizado em português"""
-        if self.claude:
-            prompt = f"""Crie um título de produto para e-commerce brasileiro.
+    def gerar_tudo(self, produto: Dict) -> Dict:
+        """Gera título, descrição, tags e categoria em uma única chamada de IA
 
-TÍTULO ORIGINAL (em inglês): {titulo_original}
-CATEGORIA: {categoria or "acessórios femininos"}
-
-REGRAS:
-- Máximo 70 caracteres
-- Em português brasileiro
-- Sem marca registrada
-- Atrativo e descritivo
-- Pode usar emojis no início (1 apenas)
-
-RESPONDA APENAS com o título, nada mais."""
+        Returns:
+            Dict com 'titulo', 'descricao_html', 'tags' e 'categoria'
+        """
+        titulo = produto.get("title", "Produto")
+        categoria = self.detectar_categoria(titulo)
+
+        # Fallback: tradução básica, template e tags por palavra-chave
+        conteudo = {
+            "titulo": self._traduzir_titulo_basico(titulo),
+            "descricao_html": self._template_descricao(titulo),
+            "tags": self.gerar_tags(titulo, categoria),
+            "categoria": categoria,
+        }
 
-            try:
-                message = self.claude.messages.create(
-                    model="claude-sonnet-4-20250514",
-                    max_tokens=100,
-                    messages=[{"role": "user", "content": prompt}]
+        if not self.ai_client:
+            return conteudo
+
+        chave = LLMCache.chave(model=MODELOS_IA[self.ai_type], titulo=_normalizar_titulo(titulo))
+        dados = self._cache.get(chave)
+        if dados is None:
+            dados = self._gerar_conteudo_ia(titulo, categoria)
+            if not dados:
+                return conteudo
+            self._cache.set(chave, dados)
+
+        if dados.get("categoria") in CATEGORIAS_VALIDAS:
+            conteudo["categoria"] = dados["categoria"]
+        if dados.get("titulo"):
+            conteudo["titulo"] = dados["titulo"].strip()[:70]
+        if dados.get("descricao_html"):
+            conteudo["descricao_html"] = dados["descricao_html"].strip()
+        if dados.get("tags"):
+            base = [conteudo["categoria"], "feminino", "acessorios", "moda"]
+            conteudo["tags"] = list(dict.fromkeys(base + [str(t).lower() for t in dados["tags"]]))
+
+        return conteudo
+
+    def _gerar_conteudo_ia(self, titulo: str, categoria: str) -> Optional[Dict]:
+        """Chamada de IA do gerar_tudo; retorna o JSON da resposta ou None"""
+        prompt = f"""TÍTULO ORIGINAL (em inglês): {titulo}
+CATEGORIA PROVÁVEL: {categoria}"""
+
+        try:
+            if self.ai_type == "openai":
+                response = self.ai_client.chat.completions.create(
+                    model=MODELOS_IA["openai"],
+                    max_tokens=1200,
+                    response_format={"type": "json_object"},
+                    messages=[
+                        {"role": "system", "content": INSTRUCOES_CONTEUDO},
+                        {"role": "user", "content": prompt}
+                    ]
                 )
-                return message.content[0].text.strip()[:70]
-            except Exception as e:
-                logger.error(f"Erro Claude: {e}")
+                texto = response.choices[0].message.content
+            elif self.ai_type == "gemini":
+                texto = self.ai_client.generate_content(f"{INSTRUCOES_CONTEUDO}\n\n{prompt}").text
+            else:
+                return None
 
-        # Fallback: tradução básica
-        return self._traduzir_titulo_basico(titulo_original)
+            match = re.search(r'\{[\s\S]*\}', texto or "")
+            return json.loads(match.group()) if match else None
+        except Exception as e:
+            logger.error(f"Erro IA ({self.ai_type}): {e}")
+            return None
+
+    def gerar_titulo_otimizado(self, titulo_original: str, categoria: str = "") -> str:
+        """Gera título otimizado em português (ver gerar_tudo)"""
+        return self.gerar_tudo({"title": titulo_original})["titulo"]
 
     def _traduzir_titulo_basico(self, titulo: str) -> str:
         """Tradução básica de título"""
-        traducoes = {
-            "earrings": "Brincos",
-            "necklace": "Colar",
-            "bracelet": "Pulseira",
-            "ring": "Anel",
-            "watch": "Relógio",
-            "bag": "Bolsa",
-            "sunglasses": "Óculos de Sol",
-            "jewelry": "Joia",
-            "women": "Feminino",
-            "fashion": "Fashion",
-            "elegant": "Elegante",
-            "vintage": "Vintage",
-            "gold": "Dourado",
-            "silver": "Prateado",
-            "crystal": "Cristal",
-            "pearl": "Pérola",
-        }
-
-        resultado = titulo
-        for en, pt in traducoes.items():
-            resultado = re.sub(en, pt, resultado, flags=re.IGNORECASE)
-
-        return resultado[:70]
+        return _TRADUCAO_RE.sub(lambda m: _TRADUCOES_TITULO[m.group(0).lower()], titulo)[:70]
 
     def gerar_descricao_html(self, produto: Dict) -> str:
-        """Gera descrição HTML persuasiva"""
-        titulo = produto.get("title", "Produto")
-
-        if self.claude:
-            prompt = f"""Crie uma descrição de produto para e-commerce brasileiro.
-
-PRODUTO: {titulo}
-
-ESTRUTURA OBRIGATÓRIA (use HTML):
-1. <h3> com título atrativo e emoji
-2. <p> com descrição persuasiva (2-3 frases)
-3. <h4>🎁 Por que você vai amar:</h4> seguido de <ul> com 4 benefícios
-4. <h4>📦 Especificações:</h4> seguido de <ul> com detalhes
-5. <p> com garantias: frete grátis, compra segura, 7 dias troca
-
-Use emojis ✨🎁💎✅🚚🔒
-
-RESPONDA APENAS com o HTML, sem explicações."""
-
-            try:
-                message = self.claude.messages.create(
-                    model="claude-sonnet-4-20250514",
-                    max_tokens=800,
-                    messages=[{"role": "user", "content": prompt}]
-                )
-                return message.content[0].text.strip()
-            except Exception as e:
-                logger.error(f"Erro Claude: {e}")
-
-        # Fallback: template básico
-        return self._template_descricao(titulo)
+        """Gera descrição HTML persuasiva (ver gerar_tudo)"""
+        return self.gerar_tudo(produto)["descricao_html"]
 
     def _template_descricao(self, titulo: str) -> str:
         """Template básico de descrição"""
@@ -254,66 +558,62 @@ RESPONDA APENAS com o HTML, sem explicações."""
 
     def calcular_preco(self, preco_original: float) -> float:
         """Calcula preço de venda com markup"""
-        # Converte para BRL se necessário
-        if preco_original < 50:  # Provavelmente em USD
-            preco_brl = preco_original * self.taxa_cambio
-        else:
-            preco_brl = preco_original
+        taxa_cambio, markup = self.taxa_cambio, self.markup
+
+        # Converte para BRL se necessário (abaixo de 50 provavelmente está em USD)
+        preco_brl = preco_original * taxa_cambio if preco_original < 50 else preco_original
 
         # Aplica markup
-        preco_final = preco_brl * self.markup
+        preco_final = preco_brl * markup
 
-        # Arredondamento psicológico
-        if preco_final < 50:
-            preco_final = round(preco_final / 5) * 5 - 0.10
-        elif preco_final < 100:
-            preco_final = round(preco_final / 10) * 10 - 0.10
-        else:
-            preco_final = round(preco_final / 10) * 10 - 0.10
+        # Arredondamento psicológico: múltiplos de 5 abaixo de R$ 50, de 10 acima
+        step = 5 if preco_final < 50 else 10
+        preco_final = round(preco_final / step) * step - 0.10
 
         return max(preco_final, 29.90)
 
+    def _montar_automato(self):
+        """Autômato Aho-Corasick com todas as palavras de categorias e tags"""
+        automato = ahocorasick.Automaton()
+        for tipo, tabela in (("categoria", _CATEGORIES), ("tag", _TAG_RULES)):
+            for valor, keywords in tabela:
+                for kw in keywords:
+                    hits = automato.get(kw, set())
+                    hits.add((tipo, valor))
+                    automato.add_word(kw, hits)
+        automato.make_automaton()
+        return automato
+
+    def _encontrar(self, titulo: str) -> set:
+        """(tipo, valor) de todas as palavras-chave do título, em uma passada"""
+        encontrados = set()
+        for _, hits in self._automato.iter(titulo.lower()):
+            encontrados |= hits
+        return encontrados
+
     def detectar_categoria(self, titulo: str) -> str:
         """Detecta categoria pelo título"""
-        titulo_lower = titulo.lower()
-
-        categorias = {
-            "brincos": ["earring", "brinco", "ear"],
-            "colares": ["necklace", "colar", "pendant", "chain"],
-            "pulseiras": ["bracelet", "pulseira", "bangle"],
-            "aneis": ["ring", "anel"],
-            "relogios": ["watch", "relógio", "relogio"],
-            "oculos": ["sunglasses", "glasses", "óculos", "oculos"],
-            "bolsas": ["bag", "bolsa", "purse", "handbag"],
-        }
-
-        for categoria, keywords in categorias.items():
-            for kw in keywords:
-                if kw in titulo_lower:
-                    return categoria
+        if self._automato is not None:
+            encontrados = self._encontrar(titulo)
+            return next((c for c, _ in _CATEGORIES if ("categoria", c) in encontrados), "acessorios")
 
-        return "acessorios"
+        titulo_lower = titulo.lower()
+        return next(
+            (c for c, keywords in _CATEGORIES if any(kw in titulo_lower for kw in keywords)),
+            "acessorios"
+        )
 
     def gerar_tags(self, titulo: str, categoria: str) -> List[str]:
         """Gera tags para o produto"""
         tags = [categoria, "feminino", "acessorios", "moda"]
 
         # Tags baseadas no título
-        titulo_lower = titulo.lower()
-
-        if any(x in titulo_lower for x in ["gold", "dourad", "ouro"]):
-            tags.append("dourado")
-        if any(x in titulo_lower for x in ["silver", "prata", "prateado"]):
-            tags.append("prateado")
-        if any(x in titulo_lower for x in ["crystal", "cristal"]):
-            tags.append("cristal")
-        if any(x in titulo_lower for x in ["pearl", "perola", "pérola"]):
-            tags.append("perola")
-        if any(x in titulo_lower for x in ["vintage", "retro"]):
-            tags.append("vintage")
-        if any(x in titulo_lower for x in ["elegant", "elegante"]):
-            tags.append("elegante")
+        if self._automato is not None:
+            tags += [valor for tipo, valor in self._encontrar(titulo) if tipo == "tag"]
+            return list(set(tags))
 
+        titulo_lower = titulo.lower()
+        tags += [tag for tag, keywords in _TAG_RULES if any(x in titulo_lower for x in keywords)]
         return list(set(tags))
 
     def processar_produto(self, produto: Dict) -> Optional[ProdutoProcessado]:
@@ -327,25 +627,19 @@ RESPONDA APENAS com o HTML, sem explicações."""
 
         print(f"\n📦 Processando: {titulo_original[:50]}...")
 
-        # Detecta categoria
-        categoria = self.detectar_categoria(titulo_original)
+        # Título, descrição, tags e categoria em uma única chamada
+        print(f"   ✏️ Gerando conteúdo...")
+        conteudo = self.gerar_tudo(produto)
+        categoria = conteudo["categoria"]
+        titulo_novo = conteudo["titulo"]
+        descricao = conteudo["descricao_html"]
+        tags = conteudo["tags"]
         print(f"   📁 Categoria: {categoria}")
-
-        # Gera novo título
-        print(f"   ✏️ Gerando título...")
-        titulo_novo = self.gerar_titulo_otimizado(titulo_original, categoria)
         print(f"   📝 Novo título: {titulo_novo}")
 
-        # Gera descrição
-        print(f"   📄 Gerando descrição...")
-        descricao = self.gerar_descricao_html(produto)
-
         # Calcula preço
         preco_novo = self.calcular_preco(preco_original)
         print(f"   💰 Preço: R$ {preco_original:.2f} → R$ {preco_novo:.2f}")
-
-        # Gera tags
-        tags = self.gerar_tags(titulo_original, categoria)
         print(f"   🏷️ Tags: {', '.join(tags)}")
 
         return ProdutoProcessado(
@@ -359,8 +653,13 @@ RESPONDA APENAS com o HTML, sem explicações."""
             colecao=categoria
         )
 
-    def aplicar_alteracoes(self, processado: ProdutoProcessado) -> bool:
-        """Aplica alterações ao produto na Shopify"""
+    def aplicar_alteracoes(self, processado: ProdutoProcessado, produto: Dict) -> bool:
+        """Aplica alterações ao produto na Shopify
+
+        Args:
+            processado: Resultado de processar_produto
+            produto: Produto original (as variantes saem dele, sem novo GET)
+        """
         print(f"   🔄 Aplicando alterações...")
 
         # Dados para atualização
@@ -374,12 +673,10 @@ RESPONDA APENAS com o HTML, sem explicações."""
 
         # Atualiza produto
         if self.update_product(processado.id, update_data):
-            # Atualiza preço das variantes
-            produto = self.get_product(processado.id)
-            if produto:
-                for variant in produto.get("variants", []):
-                    variant_id = variant.get("id")
-                    self._update_variant_price(processado.id, variant_id, processado.preco_novo)
+            # Preço de todas as variantes em uma única mutation
+            variant_ids = [v["id"] for v in produto.get("variants", [])]
+            if variant_ids:
+                self._update_variant_prices(processado.id, variant_ids, processado.preco_novo)
 
             print(f"   ✅ Produto atualizado!")
             return True
@@ -387,17 +684,62 @@ RESPONDA APENAS com o HTML, sem explicações."""
             print(f"   ❌ Erro ao atualizar")
             return False
 
-    def _update_variant_price(self, product_id: str, variant_id: str, price: float):
-        """Atualiza preço de uma variante"""
-        url = f"{self.base_url}/variants/{variant_id}.json"
-        data = {
-            "variant": {
-                "id": variant_id,
-                "price": f"{price:.2f}",
-                "compare_at_price": f"{price * 1.3:.2f}"  # Preço "de" 30% maior
-            }
-        }
-        requests.put(url, headers=self.headers, json=data)
+    def _update_variant_prices(self, product_id: str, variant_ids: List, price: float) -> bool:
+        """Atualiza o preço de várias variantes com productVariantsBulkUpdate"""
+        data = self._graphql(VARIANTS_BULK_UPDATE_MUTATION, {
+            "productId": f"gid://shopify/Product/{product_id}",
+            "variants": [
+                {
+                    "id": f"gid://shopify/ProductVariant/{vid}",
+                    "price": f"{price:.2f}",
+                    "compareAtPrice": f"{price * 1.3:.2f}"  # Preço "de" 30% maior
+                }
+                for vid in variant_ids
+            ]
+        })
+        if not data:
+            return False
+
+        erros = data["productVariantsBulkUpdate"]["userErrors"]
+        if erros:
+            logger.error(f"Erro ao atualizar variantes de {product_id}: {erros}")
+            return False
+        return True
+
+    async def _processar_em_paralelo(self, produtos: Iterable[Dict]) -> Tuple[int, int]:
+        """Processa até CONCORRENCIA produtos ao mesmo tempo (I/O em threads)
+
+        Os produtos são consumidos do iterável sob demanda; retorna
+        (processados, erros).
+        """
+        iterador = iter(produtos)
+        proximo_lock = asyncio.Lock()
+        contagem = {"processados": 0, "erros": 0}
+
+        async def _processar(produto: Dict):
+            try:
+                resultado = await asyncio.to_thread(self.processar_produto, produto)
+                if not resultado:
+                    return
+                if await asyncio.to_thread(self.aplicar_alteracoes, resultado, produto):
+                    contagem["processados"] += 1
+                else:
+                    contagem["erros"] += 1
+            except Exception as e:
+                logger.error(f"Erro ao processar produto: {e}")
+                contagem["erros"] += 1
+
+        async def _worker():
+            while True:
+                # Um worker por vez avança o gerador (que pode buscar a próxima página)
+                async with proximo_lock:
+                    produto = await asyncio.to_thread(next, iterador, None)
+                if produto is None:
+                    return
+                await _processar(produto)
+
+        await asyncio.gather(*(_worker() for _ in range(CONCORRENCIA)))
+        return contagem["processados"], contagem["erros"]
 
     def processar_todos_produtos(self, apenas_novos: bool = True):
         """Processa todos os produtos da loja"""
@@ -405,37 +747,24 @@ RESPONDA APENAS com o HTML, sem explicações."""
         print("🛍️ PROCESSANDO PRODUTOS DA SHOPIFY")
         print("="*60)
 
-        produtos = self.get_all_products()
-        print(f"\n📦 Total de produtos: {len(produtos)}")
+        total = self.count_products()
+        print(f"\n📦 Total de produtos: {total}")
 
-        if not produtos:
+        if not total:
             print("⚠️ Nenhum produto encontrado")
             return
 
-        processados = 0
-        erros = 0
-
-        for produto in produtos:
-            # Pula produtos já processados (verificar por tag ou vendor)
-            if apenas_novos:
-                tags = produto.get("tags", "")
-                vendor = produto.get("vendor", "")
-                if "processado" in tags.lower() or vendor == "TWP Acessórios":
-                    continue
+        produtos = self.iter_all_products()
 
-            try:
-                resultado = self.processar_produto(produto)
-                if resultado:
-                    if self.aplicar_alteracoes(resultado):
-                        processados += 1
-                    else:
-                        erros += 1
+        # Pula produtos já processados (verificar por tag ou vendor)
+        if apenas_novos:
+            produtos = (
+                p for p in produtos
+                if "processado" not in p.get("tags", "").lower()
+                and p.get("vendor", "") != "TWP Acessórios"
+            )
 
-                time.sleep(1)  # Rate limiting
-
-            except Exception as e:
-                logger.error(f"Erro ao processar produto: {e}")
-                erros += 1
+        processados, erros = asyncio.run(self._processar_em_paralelo(produtos))
 
         print("\n" + "="*60)
         print(f"✅ PROCESSAMENTO CONCLUÍDO")
@@ -457,9 +786,8 @@ def main():
     processor = ShopifyProductProcessor()
 
     if args.listar:
-        produtos = processor.get_all_products()
-        print(f"\n📦 {len(produtos)} produtos na loja:\n")
-        for p in produtos:
+        print(f"\n📦 {processor.count_products()} produtos na loja:\n")
+        for p in processor.iter_all_products():
             print(f"  [{p['id']}] {p['title'][:50]}...")
 
     elif args.produto:
@@ -467,7 +795,7 @@ def main():
         if produto:
             resultado = processor.processar_produto(produto)
             if resultado:
-                processor.aplicar_alteracoes(resultado)
+                processor.aplicar_alteracoes(resultado, produto)
         else:
             print(f"❌ Produto {args.produto} não encontrado")
 
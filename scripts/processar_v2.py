@@ -6,22 +6,267 @@ Usa Google Gemini para gerar títulos e descrições profissionais
 import sys
 import os
 import time
+import asyncio
+import json
+import queue
+import atexit
 import logging
+import logging.handlers
 import re
+import threading
+from bisect import bisect_right
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from dotenv import load_dotenv
 import google.generativeai as genai
 
+from src.cache import LLMCache, FileBackend
+
+try:
+    import orjson
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+except ImportError:
+    json_loads = json.loads
+
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
 load_dotenv()
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+# Logging via fila: as corrotinas e threads só enfileiram o registro e a
+# thread do QueueListener escreve no stdout
+_log_handler = logging.StreamHandler(sys.stdout)
+_log_handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+_log_queue = queue.Queue(-1)
+logging.basicConfig(level=logging.INFO, handlers=[logging.handlers.QueueHandler(_log_queue)])
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_handler)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
 logger = logging.getLogger(__name__)
 
+# Lotes em andamento ao mesmo tempo e chamadas simultâneas ao Gemini
+MAX_WORKERS = 8
+CONCORRENCIA_GEMINI = 8
+SHOPIFY_REQ_POR_SEGUNDO = 2
+# gemini-pro não aceita system_instruction
+MODELO_GEMINI = "gemini-1.5-flash-002"
+# Produtos por chamada ao Gemini em processar_todos
+TAMANHO_LOTE_GEMINI = 20
+
+# Partes fixas dos prompts: vão como system_instruction, a mensagem leva só produto/categoria
+_REGRAS_TITULO = """REGRAS OBRIGATÓRIAS:
+1. Máximo 65 caracteres
+2. Em português brasileiro fluente
+3. Remova códigos, números de modelo e marcas desconhecidas
+4. Comece com emoji relacionado (💎 joias, 👜 bolsas, ⌚ relógios, 👓 óculos, 💍 anéis, 📿 colares, etc)
+5. Seja descritivo e atraente
+6. Use palavras como: Elegante, Luxo, Fashion, Delicado, Sofisticado
+
+EXEMPLOS:
+- "Yhpup 316L Stainless Steel Pearl Double Layer Cuff..." → "💎 Bracelete Duplo com Pérolas Aço Inox Elegante"
+- "Designer Handbag High end Genuine Leather Large..." → "👜 Bolsa Grande Couro Legítimo Luxo Feminina"
+- "Xuping Jewelry Fashion Crystal Pendant Necklace..." → "📿 Colar Pingente Cristal Fashion Delicado\""""
+
+_ESTRUTURA_DESCRICAO = """ESTRUTURA HTML OBRIGATÓRIA:
+<h3>✨ [Título Atrativo]</h3>
+<p>[2-3 frases persuasivas sobre o produto]</p>
+
+<h4>🎁 Por que você vai amar:</h4>
+<ul>
+<li>✅ [Benefício 1]</li>
+<li>✅ [Benefício 2]</li>
+<li>✅ [Benefício 3]</li>
+<li>✅ [Benefício 4]</li>
+</ul>
+
+<h4>📦 Detalhes:</h4>
+<ul>
+<li>Material: [material apropriado]</li>
+<li>Estilo: Fashion/Elegante</li>
+<li>Ocasião: Casual/Festa/Trabalho</li>
+</ul>
+
+<p>🚚 <strong>Frete Grátis</strong> para todo Brasil!</p>
+<p>🔒 <strong>Compra 100% Segura</strong></p>
+<p>↩️ <strong>7 dias</strong> para troca ou devolução</p>"""
+
+INSTRUCOES_TITULO = f"""Traduza e otimize o título de produto recebido para uma loja brasileira de acessórios femininos.
+
+{_REGRAS_TITULO}
+
+RESPONDA APENAS COM O NOVO TÍTULO, nada mais."""
+
+INSTRUCOES_DESCRICAO = f"""Crie a descrição do produto recebido para e-commerce brasileiro.
+
+{_ESTRUTURA_DESCRICAO}
+
+RESPONDA APENAS COM O HTML."""
+
+INSTRUCOES_LOTE = f"""Você recebe um array JSON de produtos de uma loja brasileira de acessórios femininos,
+cada um com id, titulo (original) e categoria.
+Para cada item, retorne um objeto com o mesmo id, o titulo traduzido e otimizado
+e a descricao_html. Responda com um array JSON, um objeto por item recebido.
+
+TÍTULO — {_REGRAS_TITULO}
+
+DESCRIÇÃO (use o novo título) — {_ESTRUTURA_DESCRICAO}"""
+
+
+# Schema da resposta do lote (dict simples, sem depender de TypedDict no SDK)
+SCHEMA_LOTE = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "id": {"type": "STRING"},
+            "titulo": {"type": "STRING"},
+            "descricao_html": {"type": "STRING"},
+        },
+        "required": ["id", "titulo", "descricao_html"],
+    },
+}
+
+# Arredondamento psicológico: até R$ 50 em múltiplos de 5, até R$ 200 de 10, acima de 50
+_LIMITES_PRECO = (50, 200)
+_PASSOS_PRECO = (5, 10, 50)
+
+# Emoji e nome no singular usados no título de fallback
+_EMOJIS = {
+    "brincos": "✨", "colares": "📿", "pulseiras": "💎",
+    "aneis": "💍", "relogios": "⌚", "oculos": "👓",
+    "bolsas": "👜", "carteiras": "👛", "acessorios": "🎀"
+}
+_CAT_PT = {
+    "aneis": "Anel", "brincos": "Brinco", "colares": "Colar",
+    "pulseiras": "Pulseira", "bolsas": "Bolsa", "relogios": "Relógio",
+}
+
+# tag → palavras do título que a ativam
+_TAG_RULES = (
+    ("dourado", ("gold", "dourad", "ouro", "18k")),
+    ("prata", ("silver", "prata", "prateado")),
+    ("cristal", ("crystal", "cristal", "zirconia")),
+    ("perola", ("pearl", "perola", "pérola")),
+    ("couro", ("leather", "couro")),
+    ("aco-inox", ("steel", "aço", "inox")),
+)
+
+# Marcas (Yhpup, XUPING) e códigos (316L, 18K) em uma só varredura
+_MARCA_OU_CODIGO_RE = re.compile(r'\b(?:[A-Z]{2,}[a-z]*|\d+\w*)\b')
+_ESPACOS_RE = re.compile(r'\s+')
+_NAO_PALAVRA_RE = re.compile(r'\W+')
+
+
+# SKU: letras e dígitos misturados, 5+ caracteres (XP2034A, 2024new); tamanhos
+# e medidas curtos (7, 18K, 316L) ficam na chave porque mudam o produto
+_SKU_RE = re.compile(r'\b(?=\w*\d)(?=\w*[A-Za-z])\w{5,}\b')
+# Chaves com menos palavras que isso usam o título inteiro
+MIN_PALAVRAS_CHAVE = 3
+
+
+def _normalizar_titulo(titulo: str) -> str:
+    """Chave de cache: títulos que só diferem em SKU ou na marca inicial coincidem
+
+    A marca só é removida quando é a primeira palavra, toda em maiúsculas, num
+    título que não é todo em maiúsculas (XUPING Jewelry ...). Se sobrar pouco,
+    a chave é o título original.
+    """
+    palavras = _SKU_RE.sub(' ', titulo).split()
+    if len(palavras) > 1 and palavras[0].isupper() and not titulo.isupper():
+        palavras = palavras[1:]
+
+    chave = _NAO_PALAVRA_RE.sub(' ', ' '.join(palavras).lower()).strip()
+    if len(chave.split()) < MIN_PALAVRAS_CHAVE:
+        return titulo.strip()
+    return chave
+
+
+def _chave_gemini(tipo: str, categoria: str, titulo_original: str) -> str:
+    """Chave de título e descrição: sempre pelo título original, nos dois fluxos
+
+    `versao` invalida as entradas gravadas com a normalização anterior, que
+    juntava títulos diferentes na mesma chave.
+    """
+    return LLMCache.chave(model=MODELO_GEMINI, tipo=tipo, categoria=categoria,
+                          titulo=_normalizar_titulo(titulo_original), versao=2)
+
+
+# Custo da página ≈ 25 + 25×30 pontos, abaixo do máximo de 1000 por query
+PRODUCTS_PAGE_QUERY = """
+query($cursor: String) {
+  products(first: 25, after: $cursor) {
+    edges {
+      node {
+        legacyResourceId
+        title
+        variants(first: 30) {
+          edges { node { legacyResourceId price } }
+          pageInfo { hasNextPage }
+        }
+      }
+    }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+"""
+
+# Produto + preços das variantes em uma única requisição GraphQL
+PRODUCT_UPDATE_MUTATION = """
+mutation($product: ProductInput!, $productId: ID!, $variants: [ProductVariantsBulkInput!]!) {
+  productUpdate(input: $product) {
+    userErrors { field message }
+  }
+  productVariantsBulkUpdate(productId: $productId, variants: $variants) {
+    userErrors { field message }
+  }
+}
+"""
+
+
+def _em_lotes(itens: Iterable[Dict], tamanho: int) -> Iterator[List[Dict]]:
+    """Agrupa um iterável (inclusive gerador) em listas de até `tamanho`"""
+    itens = iter(itens)
+    while lote := list(islice(itens, tamanho)):
+        yield lote
+
+
+class LimitadorTaxa:
+    """Janela deslizante: no máximo `taxa` requisições por segundo entre threads"""
+
+    def __init__(self, taxa: int = SHOPIFY_REQ_POR_SEGUNDO):
+        self.taxa = taxa
+        self._envios = deque()
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                while self._envios and agora - self._envios[0] >= 1:
+                    self._envios.popleft()
+                if len(self._envios) < self.taxa:
+                    self._envios.append(agora)
+                    return
+                espera = 1 - (agora - self._envios[0])
+            time.sleep(espera)
+
 
 class ShopifyProcessor:
     """Processa produtos na Shopify usando Google Gemini"""
@@ -49,46 +294,152 @@ class ShopifyProcessor:
             "Content-Type": "application/json"
         }
 
+        # Sessão com keep-alive (pool >= MAX_WORKERS) + retry automático em 429/5xx
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+        self.session.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=retry))
+
         # Google Gemini
         google_key = os.getenv("GOOGLE_API_KEY")
         genai.configure(api_key=google_key)
-        self.gemini = genai.GenerativeModel('gemini-pro')
+        self.gemini_titulo = genai.GenerativeModel(MODELO_GEMINI, system_instruction=INSTRUCOES_TITULO)
+        self.gemini_descricao = genai.GenerativeModel(MODELO_GEMINI, system_instruction=INSTRUCOES_DESCRICAO)
+        self.gemini_lote = genai.GenerativeModel(MODELO_GEMINI, system_instruction=INSTRUCOES_LOTE)
+        self._cache = LLMCache(FileBackend(".cache/gemini"))
         logger.info("✅ Google Gemini inicializado")
 
+        # Categorias e tags em uma passada pelo título
+        self._automato = self._montar_automato() if AHOCORASICK_AVAILABLE else None
+
+        # Compartilhado pelas threads de processar_todos
+        self._limitador = LimitadorTaxa()
+        # Criado dentro do event loop, em _processar_em_paralelo
+        self._sem_gemini: Optional[asyncio.Semaphore] = None
+
         # Configurações
         self.markup = float(os.getenv("DEFAULT_MARKUP", "2.5"))
         self.taxa_cambio = 5.5
 
         logger.info(f"✅ Shopify: {self.store_url}")
 
-    def get_products(self, limit=250) -> List[Dict]:
-        """Busca produtos"""
-        produtos = []
-        url = f"{self.base_url}/products.json?limit={limit}"
-
-        while url:
-            r = requests.get(url, headers=self.headers)
-            if r.status_code == 200:
-                data = r.json()
-                produtos.extend(data.get("products", []))
-
-                link = r.headers.get("Link", "")
-                if 'rel="next"' in link:
-                    match = re.search(r'<([^>]+)>; rel="next"', link)
-                    url = match.group(1) if match else None
-                else:
-                    url = None
-            else:
-                break
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Requisição à Shopify respeitando o limite de taxa"""
+        if "json" in kwargs:
+            # Corpo serializado aqui (orjson se disponível); Content-Type já está na sessão
+            kwargs["data"] = json_dumps(kwargs.pop("json"))
+        self._limitador.aguardar()
+        return self.session.request(method, url, **kwargs)
+
+    def _buscar_pagina(self, cursor: Optional[str]) -> Optional[Dict]:
+        data = self._gql(PRODUCTS_PAGE_QUERY, {"cursor": cursor})
+        return data["products"] if data else None
+
+    def _produto_rest(self, node: Dict) -> Optional[Dict]:
+        """Converte o nó GraphQL no formato REST usado por processar_produto"""
+        if node["variants"]["pageInfo"]["hasNextPage"]:
+            # Mais variantes que a página traz: busca o produto completo
+            r = self._request("GET", f"{self.base_url}/products/{node['legacyResourceId']}.json")
+            return json_loads(r.content).get("product") if r.status_code == 200 else None
+        return {
+            "id": node["legacyResourceId"],
+            "title": node["title"],
+            "variants": [
+                {"id": v["node"]["legacyResourceId"], "price": v["node"]["price"]}
+                for v in node["variants"]["edges"]
+            ],
+        }
 
-        return produtos
+    def get_products(self) -> Iterator[Dict]:
+        """Itera os produtos da loja, página a página via GraphQL
+
+        A página seguinte é buscada em segundo plano assim que o endCursor
+        da atual chega, enquanto o chamador consome os produtos desta.
+        """
+        with ThreadPoolExecutor(max_workers=1) as prefetch:
+            pagina = prefetch.submit(self._buscar_pagina, None)
+            while pagina:
+                produtos = pagina.result()
+                if produtos is None:
+                    return
+                info = produtos["pageInfo"]
+                pagina = (prefetch.submit(self._buscar_pagina, info["endCursor"])
+                          if info["hasNextPage"] else None)
+                for edge in produtos["edges"]:
+                    produto = self._produto_rest(edge["node"])
+                    if produto:
+                        yield produto
+
+    def count_products(self) -> int:
+        """Total de produtos da loja (sem buscar os produtos)"""
+        r = self._request("GET", f"{self.base_url}/products/count.json")
+        if r.status_code != 200:
+            logger.error(f"Erro ao contar produtos: {r.status_code}")
+            return 0
+        return json_loads(r.content).get("count", 0)
 
     def update_product(self, product_id: str, data: Dict) -> bool:
         """Atualiza produto"""
         url = f"{self.base_url}/products/{product_id}.json"
-        r = requests.put(url, headers=self.headers, json={"product": data})
+        r = self._request("PUT", url, json={"product": data})
         return r.status_code == 200
 
+    def _gql(self, query: str, variables: Dict = None) -> Optional[Dict]:
+        """Executa uma query GraphQL e retorna `data` (ou None em erro)"""
+        payload = {"query": query}
+        if variables:
+            payload["variables"] = variables
+        r = self._request("POST", f"{self.base_url}/graphql.json", json=payload)
+        if r.status_code != 200:
+            logger.error(f"Erro GraphQL: {r.status_code}")
+            return None
+        data = json_loads(r.content)
+        if data.get("errors"):
+            logger.error(f"Erro GraphQL: {data['errors']}")
+            return None
+        return data.get("data")
+
+    def atualizar_produto(self, pid, update_data: Dict, variants: List[Dict],
+                          price: float, compare_price: float) -> bool:
+        """Atualiza produto e preços de todas as variantes em uma chamada GraphQL
+
+        Se o GraphQL falhar ou devolver userErrors, refaz pela REST
+        (um PUT do produto + um por variante).
+        """
+        product_gid = f"gid://shopify/Product/{pid}"
+        data = self._gql(PRODUCT_UPDATE_MUTATION, {
+            "product": {
+                "id": product_gid,
+                "title": update_data["title"],
+                "descriptionHtml": update_data["body_html"],
+                "tags": update_data["tags"],
+                "vendor": update_data["vendor"],
+                "productType": update_data["product_type"],
+            },
+            "productId": product_gid,
+            "variants": [
+                {
+                    "id": f"gid://shopify/ProductVariant/{v['id']}",
+                    "price": f"{price:.2f}",
+                    "compareAtPrice": f"{compare_price:.2f}"
+                }
+                for v in variants
+            ]
+        })
+
+        if data is not None:
+            erros = (data["productUpdate"]["userErrors"]
+                     + data["productVariantsBulkUpdate"]["userErrors"])
+            if not erros:
+                return True
+            logger.warning(f"userErrors no GraphQL, usando REST: {erros}")
+
+        if not self.update_product(pid, update_data):
+            return False
+        for v in variants:
+            self.update_variant(v["id"], price, compare_price)
+        return True
+
     def update_variant(self, variant_id: str, price: float, compare_price: float) -> bool:
         """Atualiza variante"""
         url = f"{self.base_url}/variants/{variant_id}.json"
@@ -99,106 +450,144 @@ class ShopifyProcessor:
                 "compare_at_price": f"{compare_price:.2f}"
             }
         }
-        r = requests.put(url, headers=self.headers, json=data)
+        r = self._request("PUT", url, json=data)
         return r.status_code == 200
 
+    def _montar_automato(self):
+        """Autômato Aho-Corasick com as palavras de categorias e tags
+
+        Cada palavra guarda (tipo, prioridade, valor); a prioridade é a
+        ordem em CATEGORIAS, para "earring" continuar vencendo "ring".
+        """
+        automato = ahocorasick.Automaton()
+        entradas = [("categoria", i, kw, cat) for i, (kw, cat) in enumerate(self.CATEGORIAS.items())]
+        entradas += [("tag", 0, kw, tag) for tag, keywords in _TAG_RULES for kw in keywords]
+        for tipo, prioridade, kw, valor in entradas:
+            hits = automato.get(kw, set())
+            hits.add((tipo, prioridade, valor))
+            automato.add_word(kw, hits)
+        automato.make_automaton()
+        return automato
+
+    def _encontrar(self, titulo: str) -> set:
+        """(tipo, prioridade, valor) de todas as palavras do título, em uma passada"""
+        encontrados = set()
+        for _, hits in self._automato.iter(titulo.lower()):
+            encontrados |= hits
+        return encontrados
+
     def detectar_categoria(self, titulo: str) -> str:
         """Detecta categoria pelo título"""
+        if self._automato is not None:
+            categorias = [(p, cat) for tipo, p, cat in self._encontrar(titulo) if tipo == "categoria"]
+            return min(categorias)[1] if categorias else "acessorios"
+
         titulo_lower = titulo.lower()
         for keyword, cat in self.CATEGORIAS.items():
             if keyword in titulo_lower:
                 return cat
         return "acessorios"
 
-    def gerar_titulo_gemini(self, titulo_original: str, categoria: str) -> str:
+    async def gerar_titulo_gemini(self, titulo_original: str, categoria: str) -> str:
         """Gera título otimizado com Gemini"""
-        prompt = f"""Traduza e otimize este título de produto para uma loja brasileira de acessórios femininos.
+        entrada = f"TÍTULO ORIGINAL: {titulo_original}\nCATEGORIA: {categoria}"
 
-TÍTULO ORIGINAL: {titulo_original}
-CATEGORIA: {categoria}
-
-REGRAS OBRIGATÓRIAS:
-1. Máximo 65 caracteres
-2. Em português brasileiro fluente
-3. Remova códigos, números de modelo e marcas desconhecidas
-4. Comece com emoji relacionado (💎 joias, 👜 bolsas, ⌚ relógios, 👓 óculos, 💍 anéis, 📿 colares, etc)
-5. Seja descritivo e atraente
-6. Use palavras como: Elegante, Luxo, Fashion, Delicado, Sofisticado
-
-EXEMPLOS:
-- "Yhpup 316L Stainless Steel Pearl Double Layer Cuff..." → "💎 Bracelete Duplo com Pérolas Aço Inox Elegante"
-- "Designer Handbag High end Genuine Leather Large..." → "👜 Bolsa Grande Couro Legítimo Luxo Feminina"
-- "Xuping Jewelry Fashion Crystal Pendant Necklace..." → "📿 Colar Pingente Cristal Fashion Delicado"
-
-RESPONDA APENAS COM O NOVO TÍTULO, nada mais."""
+        chave = _chave_gemini("titulo", categoria, titulo_original)
+        titulo = self._cache.get(chave)
+        if titulo:
+            return titulo
 
         try:
-            response = self.gemini.generate_content(prompt)
+            async with self._sem_gemini:
+                response = await self.gemini_titulo.generate_content_async(entrada)
             titulo = response.text.strip()
             # Remove aspas se houver
-            titulo = titulo.strip('"\'')
-            return titulo[:65]
+            titulo = titulo.strip('"\'')[:65]
+            self._cache.set(chave, titulo)
+            return titulo
         except Exception as e:
             logger.error(f"Erro Gemini título: {e}")
             return self._titulo_fallback(titulo_original, categoria)
 
     def _titulo_fallback(self, titulo: str, categoria: str) -> str:
         """Fallback para título sem IA"""
-        emojis = {
-            "brincos": "✨", "colares": "📿", "pulseiras": "💎",
-            "aneis": "💍", "relogios": "⌚", "oculos": "👓",
-            "bolsas": "👜", "carteiras": "👛", "acessorios": "🎀"
-        }
-        emoji = emojis.get(categoria, "✨")
+        emoji = _EMOJIS.get(categoria, "✨")
 
         # Remove marcas e códigos
-        titulo = re.sub(r'\b[A-Z]{2,}[a-z]*\b', '', titulo)  # Remove marcas tipo Yhpup
-        titulo = re.sub(r'\b\d+\w*\b', '', titulo)  # Remove códigos
-        titulo = re.sub(r'\s+', ' ', titulo).strip()
+        titulo = _MARCA_OU_CODIGO_RE.sub('', titulo)  # Remove marcas tipo Yhpup e códigos
+        titulo = _ESPACOS_RE.sub(' ', titulo).strip()
 
-        cat_pt = categoria.replace("aneis", "Anel").replace("brincos", "Brinco").replace("colares", "Colar")
-        cat_pt = cat_pt.replace("pulseiras", "Pulseira").replace("bolsas", "Bolsa").replace("relogios", "Relógio")
+        cat_pt = _CAT_PT.get(categoria, categoria)
 
         return f"{emoji} {cat_pt} {titulo[:45]}".strip()[:65]
 
-    def gerar_descricao_gemini(self, titulo: str, categoria: str) -> str:
-        """Gera descrição HTML com Gemini"""
-        prompt = f"""Crie uma descrição de produto para e-commerce brasileiro.
+    async def gerar_descricao_gemini(self, titulo: str, categoria: str) -> str:
+        """Gera descrição HTML com Gemini a partir do título original"""
+        entrada = f"PRODUTO: {titulo}\nCATEGORIA: {categoria}"
 
-PRODUTO: {titulo}
-CATEGORIA: {categoria}
+        # O título entra no <h3> e no texto, então faz parte da chave
+        chave = _chave_gemini("descricao", categoria, titulo)
+        descricao = self._cache.get(chave)
+        if descricao:
+            return descricao
 
-ESTRUTURA HTML OBRIGATÓRIA:
-<h3>✨ [Título Atrativo]</h3>
-<p>[2-3 frases persuasivas sobre o produto]</p>
-
-<h4>🎁 Por que você vai amar:</h4>
-<ul>
-<li>✅ [Benefício 1]</li>
-<li>✅ [Benefício 2]</li>
-<li>✅ [Benefício 3]</li>
-<li>✅ [Benefício 4]</li>
-</ul>
-
-<h4>📦 Detalhes:</h4>
-<ul>
-<li>Material: [material apropriado]</li>
-<li>Estilo: Fashion/Elegante</li>
-<li>Ocasião: Casual/Festa/Trabalho</li>
-</ul>
+        try:
+            async with self._sem_gemini:
+                response = await self.gemini_descricao.generate_content_async(entrada)
+            descricao = response.text.strip()
+            self._cache.set(chave, descricao)
+            return descricao
+        except Exception as e:
+            logger.error(f"Erro Gemini descrição: {e}")
+            return self._descricao_fallback(titulo)
 
-<p>🚚 <strong>Frete Grátis</strong> para todo Brasil!</p>
-<p>🔒 <strong>Compra 100% Segura</strong></p>
-<p>↩️ <strong>7 dias</strong> para troca ou devolução</p>
+    async def gerar_lote_gemini(self, items: List[Dict]) -> List[Dict]:
+        """Gera título e descrição de vários produtos em uma chamada ao Gemini
+
+        `items` traz id, titulo e categoria; a resposta traz id, titulo e
+        descricao_html só dos itens que o Gemini devolveu completos (os que
+        já estão no cache não são enviados).
+        """
+        resultado = []
+        pendentes = []
+        for item in items:
+            titulo = self._cache.get(_chave_gemini("titulo", item["categoria"], item["titulo"]))
+            descricao = titulo and self._cache.get(_chave_gemini("descricao", item["categoria"], item["titulo"]))
+            if descricao:
+                resultado.append({"id": item["id"], "titulo": titulo, "descricao_html": descricao})
+            else:
+                pendentes.append(item)
 
-RESPONDA APENAS COM O HTML."""
+        if not pendentes:
+            return resultado
 
         try:
-            response = self.gemini.generate_content(prompt)
-            return response.text.strip()
+            async with self._sem_gemini:
+                response = await self.gemini_lote.generate_content_async(
+                    json.dumps(pendentes, ensure_ascii=False),
+                    generation_config={
+                        "response_mime_type": "application/json",
+                        "response_schema": SCHEMA_LOTE,
+                    },
+                )
+            gerados = json_loads(response.text)
         except Exception as e:
-            logger.error(f"Erro Gemini descrição: {e}")
-            return self._descricao_fallback(titulo)
+            logger.error(f"Erro Gemini lote: {e}")
+            return resultado
+
+        por_id = {item["id"]: item for item in pendentes}
+        for gerado in gerados:
+            item = por_id.get(str(gerado.get("id")))
+            titulo = (gerado.get("titulo") or "").strip().strip('"\'')[:65]
+            descricao = (gerado.get("descricao_html") or "").strip()
+            if not item or not titulo or not descricao:
+                continue
+
+            self._cache.set(_chave_gemini("titulo", item["categoria"], item["titulo"]), titulo)
+            self._cache.set(_chave_gemini("descricao", item["categoria"], item["titulo"]), descricao)
+            resultado.append({"id": item["id"], "titulo": titulo, "descricao_html": descricao})
+
+        return resultado
 
     def _descricao_fallback(self, titulo: str) -> str:
         """Descrição padrão"""
@@ -228,22 +617,12 @@ RESPONDA APENAS COM O HTML."""
 
     def calcular_preco(self, preco_original: float) -> tuple:
         """Calcula preço de venda e compare_at_price"""
-        if preco_original < 100:  # Provavelmente em USD
-            preco_brl = preco_original * self.taxa_cambio
-        else:
-            preco_brl = preco_original
-
+        # Abaixo de 100 provavelmente está em USD
+        preco_brl = preco_original * self.taxa_cambio if preco_original < 100 else preco_original
         preco_venda = preco_brl * self.markup
 
-        # Arredondamento psicológico
-        if preco_venda < 50:
-            preco_venda = round(preco_venda / 5) * 5 - 0.10
-        elif preco_venda < 200:
-            preco_venda = round(preco_venda / 10) * 10 - 0.10
-        else:
-            preco_venda = round(preco_venda / 50) * 50 - 0.10
-
-        preco_venda = max(preco_venda, 29.90)
+        passo = _PASSOS_PRECO[bisect_right(_LIMITES_PRECO, preco_venda)]
+        preco_venda = max(round(preco_venda / passo) * passo - 0.10, 29.90)
         preco_comparacao = round(preco_venda * 1.4, -1) - 0.10  # "De" 40% maior
 
         return preco_venda, preco_comparacao
@@ -252,51 +631,43 @@ RESPONDA APENAS COM O HTML."""
         """Gera tags"""
         tags = [categoria, "feminino", "acessorios", "moda", "twp"]
 
-        titulo_lower = titulo.lower()
-        if any(x in titulo_lower for x in ["gold", "dourad", "ouro", "18k"]):
-            tags.append("dourado")
-        if any(x in titulo_lower for x in ["silver", "prata", "prateado"]):
-            tags.append("prata")
-        if any(x in titulo_lower for x in ["crystal", "cristal", "zirconia"]):
-            tags.append("cristal")
-        if any(x in titulo_lower for x in ["pearl", "perola", "pérola"]):
-            tags.append("perola")
-        if any(x in titulo_lower for x in ["leather", "couro"]):
-            tags.append("couro")
-        if any(x in titulo_lower for x in ["steel", "aço", "inox"]):
-            tags.append("aco-inox")
+        if self._automato is not None:
+            tags += [valor for tipo, _, valor in self._encontrar(titulo) if tipo == "tag"]
+        else:
+            titulo_lower = titulo.lower()
+            tags += [tag for tag, keywords in _TAG_RULES if any(x in titulo_lower for x in keywords)]
 
         return ", ".join(list(set(tags)))
 
-    def processar_produto(self, produto: Dict) -> bool:
-        """Processa um produto completo"""
+    async def processar_produto(self, produto: Dict, conteudo: Dict = None) -> bool:
+        """Processa um produto completo
+
+        `conteudo` é o item de gerar_lote_gemini; sem ele, título e descrição
+        são gerados aqui, em duas chamadas simultâneas ao Gemini (a descrição
+        parte do título original).
+        """
         pid = produto["id"]
         titulo_original = produto.get("title", "")
 
-        print(f"\n📦 [{pid}] {titulo_original[:50]}...")
-
         # Categoria
         categoria = self.detectar_categoria(titulo_original)
-        print(f"   📁 {categoria}")
-
-        # Título
-        print(f"   ✏️ Gerando título...")
-        novo_titulo = self.gerar_titulo_gemini(titulo_original, categoria)
-        print(f"   📝 {novo_titulo}")
 
-        # Descrição
-        print(f"   📄 Gerando descrição...")
-        descricao = self.gerar_descricao_gemini(novo_titulo, categoria)
+        if conteudo:
+            novo_titulo = conteudo["titulo"]
+            descricao = conteudo["descricao_html"]
+        else:
+            novo_titulo, descricao = await asyncio.gather(
+                self.gerar_titulo_gemini(titulo_original, categoria),
+                self.gerar_descricao_gemini(titulo_original, categoria),
+            )
 
         # Preço
         variants = produto.get("variants", [])
         preco_original = float(variants[0].get("price", 0)) if variants else 0
         preco_venda, preco_comp = self.calcular_preco(preco_original)
-        print(f"   💰 R$ {preco_original:.2f} → R$ {preco_venda:.2f} (de R$ {preco_comp:.2f})")
 
         # Tags
         tags = self.gerar_tags(titulo_original, categoria)
-        print(f"   🏷️ {tags}")
 
         # Atualiza produto
         update_data = {
@@ -307,48 +678,97 @@ RESPONDA APENAS COM O HTML."""
             "product_type": categoria.capitalize(),
         }
 
-        if self.update_product(pid, update_data):
-            # Atualiza preços das variantes
-            for v in variants:
-                self.update_variant(v["id"], preco_venda, preco_comp)
-
-            print(f"   ✅ Atualizado!")
-            return True
-        else:
-            print(f"   ❌ Erro ao atualizar")
+        atualizado = await asyncio.to_thread(
+            self.atualizar_produto, pid, update_data, variants, preco_venda, preco_comp
+        )
+
+        # Um registro por produto: as linhas não se misturam entre produtos em paralelo
+        logger.info("\n".join([
+            f"📦 [{pid}] {titulo_original[:50]}...",
+            f"   📁 {categoria}",
+            f"   📝 {novo_titulo}",
+            f"   💰 R$ {preco_original:.2f} → R$ {preco_venda:.2f} (de R$ {preco_comp:.2f})",
+            f"   🏷️ {tags}",
+            "   ✅ Atualizado!" if atualizado else "   ❌ Erro ao atualizar",
+        ]))
+        return atualizado
+
+    async def _safe_processar(self, produto: Dict, conteudo: Dict = None) -> bool:
+        """processar_produto sem deixar exceção escapar do lote"""
+        try:
+            return await self.processar_produto(produto, conteudo)
+        except Exception as e:
+            logger.error(f"Erro [{produto.get('id')}]: {e}")
             return False
 
+    async def _processar_lote(self, lote: List[Dict]) -> Tuple[int, int]:
+        """Gera o conteúdo do lote em uma chamada e grava cada produto
+
+        Produtos que o Gemini deixou de fora da resposta caem no fluxo
+        individual de processar_produto. Retorna (ok, erros).
+        """
+        items = [
+            {"id": str(p["id"]), "titulo": p.get("title", ""),
+             "categoria": self.detectar_categoria(p.get("title", ""))}
+            for p in lote
+        ]
+        conteudos = {c["id"]: c for c in await self.gerar_lote_gemini(items)}
+
+        resultados = await asyncio.gather(
+            *(self._safe_processar(p, conteudos.get(str(p["id"]))) for p in lote)
+        )
+        ok = sum(resultados)
+        return ok, len(lote) - ok
+
+    async def _processar_em_paralelo(self, produtos: Iterable[Dict]) -> Tuple[int, int]:
+        """Processa até MAX_WORKERS lotes ao mesmo tempo em um event loop
+
+        Gemini é chamado de forma assíncrona; as escritas na Shopify vão para
+        threads (o ritmo fica com o LimitadorTaxa). Retorna (ok, erros).
+        """
+        self._sem_gemini = asyncio.Semaphore(CONCORRENCIA_GEMINI)
+        lotes = _em_lotes(produtos, TAMANHO_LOTE_GEMINI)
+        proximo_lock = asyncio.Lock()
+        contagem = {"ok": 0, "erro": 0, "lotes": 0}
+
+        async def _worker():
+            while True:
+                # Um worker por vez avança o gerador (que pode buscar a próxima página)
+                async with proximo_lock:
+                    lote = await asyncio.to_thread(next, lotes, None)
+                if lote is None:
+                    return
+                lote_ok, lote_erro = await self._processar_lote(lote)
+                contagem["ok"] += lote_ok
+                contagem["erro"] += lote_erro
+                contagem["lotes"] += 1
+                logger.info(f"[lote {contagem['lotes']}] ✅ {contagem['ok']} | ❌ {contagem['erro']}")
+
+        await asyncio.gather(*(_worker() for _ in range(MAX_WORKERS)))
+        return contagem["ok"], contagem["erro"]
+
     def processar_todos(self, limite: int = None):
         """Processa todos os produtos"""
         print("\n" + "="*60)
         print("🛍️ PROCESSANDO PRODUTOS - TWP ACESSÓRIOS")
         print("="*60)
 
-        produtos = self.get_products()
-        total = len(produtos)
+        total = self.count_products()
+        a_processar = min(total, limite) if limite else total
+        print(f"\n📦 Total: {total} | Processando: {a_processar}")
 
+        produtos = self.get_products()
         if limite:
-            produtos = produtos[:limite]
-
-        print(f"\n📦 Total: {total} | Processando: {len(produtos)}")
-
-        ok = 0
-        erro = 0
+            produtos = islice(produtos, limite)
 
-        for i, p in enumerate(produtos, 1):
-            print(f"\n[{i}/{len(produtos)}]", end="")
-            try:
-                if self.processar_produto(p):
-                    ok += 1
-                else:
-                    erro += 1
-                time.sleep(1)  # Rate limit
-            except Exception as e:
-                logger.error(f"Erro: {e}")
-                erro += 1
+        ok, erro = asyncio.run(self._processar_em_paralelo(produtos))
 
+        consultas = self._cache.hits + self._cache.misses
         print("\n" + "="*60)
         print(f"✅ CONCLUÍDO: {ok} atualizados | {erro} erros")
+        if consultas:
+            print(f"💾 Cache Gemini: {self._cache.hits}/{consultas} acertos "
+                  f"({self._cache.hits / consultas:.0%})")
         print("="*60)
 
 
@@ -362,12 +782,12 @@ def main():
     proc = ShopifyProcessor()
 
     if args.listar:
-        produtos = proc.get_products()
-        print(f"\n📦 {len(produtos)} produtos:\n")
-        for p in produtos[:20]:
+        total = proc.count_products()
+        print(f"\n📦 {total} produtos:\n")
+        for p in islice(proc.get_products(), 20):
             print(f"  [{p['id']}] {p['title'][:60]}...")
-        if len(produtos) > 20:
-            print(f"  ... e mais {len(produtos)-20}")
+        if total > 20:
+            print(f"  ... e mais {total-20}")
     else:
         proc.processar_todos(args.limite)
 
@@ -2,6 +2,7 @@
 Pacote src - Modulos de automacao Shopify
 """
 from .produtos import (
+    iter_produtos,
     listar_produtos,
     obter_produto,
     criar_produto,
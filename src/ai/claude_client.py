@@ -6,6 +6,7 @@ import os
 import json
 import logging
 import re
+import time
 from typing import Dict, Optional, List
 from dataclasses import dataclass, field
 from datetime import datetime
@@ -59,6 +60,50 @@ class AnaliseIA:
     timestamp: str = ""
 
 
+# Formato de resposta compartilhado pela análise individual e em lote
+ESQUEMA_JSON = """{
+    "aprovado": true/false,
+    "score": 0-100,
+    "motivo": "explicação",
+    "titulo_ptbr": "título português max 70 chars",
+    "descricao_html": "<h3>✨ Título</h3><p>Descrição</p>",
+    "tags": ["tag1", "tag2"],
+    "preco_sugerido_brl": 99.90,
+    "margem_percentual": 55,
+    "pontos_venda": ["ponto1", "ponto2"],
+    "publico_alvo": "descrição público",
+    "viralidade": {
+        "score": 0-100,
+        "potencial_tiktok": 0-100,
+        "potencial_instagram": 0-100,
+        "hashtags": ["#tag1"],
+        "hooks": ["hook1"],
+        "tendencias": ["tendencia1"]
+    },
+    "concorrencia": {
+        "nivel_saturacao": "baixo/medio/alto",
+        "estimativa_lojas": 50,
+        "diferencial_sugerido": "como diferenciar",
+        "risco_marca": false,
+        "alertas": []
+    },
+    "riscos": ["risco1"]
+}"""
+
+# Tokens de resposta reservados por produto
+TOKENS_POR_PRODUTO = 2000
+
+# Teto de max_tokens que o SDK aceita sem streaming nos modelos Opus 4
+MAX_TOKENS_NAO_STREAMING = 8192
+
+# Produtos por mensagem no modo lote: o prompt fixo é pago uma vez por lote,
+# e a resposta do lote inteiro precisa caber em MAX_TOKENS_NAO_STREAMING
+TAMANHO_LOTE_IA = MAX_TOKENS_NAO_STREAMING // TOKENS_POR_PRODUTO
+
+# Intervalo (s) entre consultas ao status de um Message Batch
+INTERVALO_BATCH = 30
+
+
 class ClaudeClient:
     """Cliente Claude Opus 4.5"""
 
@@ -77,108 +122,201 @@ class ClaudeClient:
             self.client = anthropic.Anthropic(api_key=self.api_key)
             logger.info(f"✅ Claude {modelo} inicializado")
 
-    def analisar_produto(self, produto: Dict) -> AnaliseIA:
-        if not self.client:
-            return self._fallback(produto)
-
-        prompt = f"""Analise este produto para dropshipping de acessórios no Brasil.
+    def _prompt(self, produto: Dict) -> str:
+        return f"""Analise este produto para dropshipping de acessórios no Brasil.
 
 PRODUTO:
 - Título: {produto.get('title', 'N/A')}
-- Preço: ${produto.get('price', 0):.2f}
+- Preço: ${float(produto.get('price') or 0):.2f}
 - Pedidos: {produto.get('orders', 0)}
 - Rating: {produto.get('rating', 0)}⭐
 - Categoria: {produto.get('category', 'N/A')}
 
 RESPONDA EM JSON:
-{{
-    "aprovado": true/false,
-    "score": 0-100,
-    "motivo": "explicação",
-    "titulo_ptbr": "título português max 70 chars",
-    "descricao_html": "<h3>✨ Título</h3><p>Descrição</p>",
-    "tags": ["tag1", "tag2"],
-    "preco_sugerido_brl": 99.90,
-    "margem_percentual": 55,
-    "pontos_venda": ["ponto1", "ponto2"],
-    "publico_alvo": "descrição público",
-    "viralidade": {{
-        "score": 0-100,
-        "potencial_tiktok": 0-100,
-        "potencial_instagram": 0-100,
-        "hashtags": ["#tag1"],
-        "hooks": ["hook1"],
-        "tendencias": ["tendencia1"]
-    }},
-    "concorrencia": {{
-        "nivel_saturacao": "baixo/medio/alto",
-        "estimativa_lojas": 50,
-        "diferencial_sugerido": "como diferenciar",
-        "risco_marca": false,
-        "alertas": []
-    }},
-    "riscos": ["risco1"]
-}}
+{ESQUEMA_JSON}
 
 Score >= 70 para aprovar."""
 
+    def analisar_produto(self, produto: Dict) -> AnaliseIA:
+        if not self.client:
+            return self._fallback(produto)
+
         try:
             response = self.client.messages.create(
                 model=self.model,
-                max_tokens=2000,
-                messages=[{"role": "user", "content": prompt}]
+                max_tokens=TOKENS_POR_PRODUTO,
+                messages=[{"role": "user", "content": self._prompt(produto)}]
             )
             return self._parse(response.content[0].text, produto)
         except Exception as e:
             logger.error(f"Erro Claude: {e}")
             return self._fallback(produto)
 
+    def build_request(self, produto: Dict, custom_id: str = None) -> Dict:
+        """Requisição de um produto no formato da Message Batches API"""
+        return {
+            "custom_id": custom_id or str(produto.get('product_id')),
+            "params": {
+                "model": self.model,
+                "max_tokens": TOKENS_POR_PRODUTO,
+                "messages": [{"role": "user", "content": self._prompt(produto)}]
+            }
+        }
+
+    def analisar_batch(self, produtos: List[Dict]) -> List[AnaliseIA]:
+        """Analisa pela Message Batches API (metade do custo, resposta assíncrona).
+
+        Bloqueia até o batch terminar. Retorna uma análise por produto, na
+        mesma ordem; itens com erro no batch são refeitos individualmente.
+        """
+        if not self.client:
+            return [self._fallback(p) for p in produtos]
+
+        try:
+            batch = self.client.messages.batches.create(requests=[
+                self.build_request(p, custom_id=str(i)) for i, p in enumerate(produtos)
+            ])
+            logger.info(f"📨 Batch {batch.id} enviado ({len(produtos)} produtos)")
+
+            while batch.processing_status != "ended":
+                time.sleep(INTERVALO_BATCH)
+                batch = self.client.messages.batches.retrieve(batch.id)
+
+            analises = [None] * len(produtos)
+            for item in self.client.messages.batches.results(batch.id):
+                i = int(item.custom_id)
+                if item.result.type == "succeeded":
+                    analises[i] = self._parse(item.result.message.content[0].text, produtos[i])
+        except Exception as e:
+            logger.error(f"Erro Claude (batch): {e}")
+            return self.analisar_lote(produtos)
+
+        faltando = [i for i, a in enumerate(analises) if a is None]
+        if faltando:
+            logger.warning(f"⚠️ {len(faltando)}/{len(produtos)} itens com erro no batch")
+        for i in faltando:
+            analises[i] = self.analisar_produto(produtos[i])
+        return analises
+
+    def analisar_lote(self, produtos: List[Dict]) -> List[AnaliseIA]:
+        """Analisa vários produtos com uma mensagem por lote de TAMANHO_LOTE_IA.
+
+        Retorna uma análise por produto, na mesma ordem da entrada.
+        """
+        if not self.client:
+            return [self._fallback(p) for p in produtos]
+
+        analises = []
+        for i in range(0, len(produtos), TAMANHO_LOTE_IA):
+            analises.extend(self._analisar_lote(produtos[i:i + TAMANHO_LOTE_IA]))
+        return analises
+
+    def _analisar_lote(self, lote: List[Dict]) -> List[AnaliseIA]:
+        try:
+            # Preço raspado pode vir como string: converte dentro do try
+            itens = [
+                {
+                    "indice": i,
+                    "titulo": p.get('title', 'N/A'),
+                    "preco_usd": round(float(p.get('price') or 0), 2),
+                    "pedidos": p.get('orders', 0),
+                    "rating": p.get('rating', 0),
+                    "categoria": p.get('category', 'N/A'),
+                }
+                for i, p in enumerate(lote)
+            ]
+
+            prompt = f"""Analise estes {len(lote)} produtos para dropshipping de acessórios no Brasil.
+
+PRODUTOS (JSON):
+{json.dumps(itens, ensure_ascii=False)}
+
+RESPONDA APENAS COM UM ARRAY JSON, um objeto por produto, na mesma ordem,
+cada um com o campo "indice" do produto e este formato:
+{ESQUEMA_JSON}
+
+Score >= 70 para aprovar."""
+
+            response = self.client.messages.create(
+                model=self.model,
+                max_tokens=min(TOKENS_POR_PRODUTO * len(lote), MAX_TOKENS_NAO_STREAMING),
+                messages=[{"role": "user", "content": prompt}]
+            )
+            return self._parse_lote(response.content[0].text, lote)
+        except Exception as e:
+            # Lote recusado ou sem resposta: refaz produto a produto com o Claude
+            logger.error(f"Erro Claude (lote): {e}")
+            return [self.analisar_produto(p) for p in lote]
+
+    def _parse_lote(self, text: str, lote: List[Dict]) -> List[AnaliseIA]:
+        analises = [None] * len(lote)
+        try:
+            match = re.search(r'\[[\s\S]*\]', text)
+            if match:
+                for pos, d in enumerate(json.loads(match.group())):
+                    if not isinstance(d, dict):
+                        continue
+                    i = d.get('indice', pos)
+                    if isinstance(i, int) and 0 <= i < len(lote) and analises[i] is None:
+                        analises[i] = self._montar(d)
+        except Exception as e:
+            logger.error(f"Parse error (lote): {e}")
+
+        # Itens ausentes ou inválidos na resposta são refeitos individualmente
+        faltando = [i for i, a in enumerate(analises) if a is None]
+        if faltando:
+            logger.warning(f"⚠️ {len(faltando)}/{len(lote)} itens sem resposta no lote")
+        for i in faltando:
+            analises[i] = self.analisar_produto(lote[i])
+        return analises
+
     def _parse(self, text: str, produto: Dict) -> AnaliseIA:
         try:
             match = re.search(r'\{[\s\S]*\}', text)
             if match:
-                d = json.loads(match.group())
-                v = d.get('viralidade', {})
-                c = d.get('concorrencia', {})
-
-                return AnaliseIA(
-                    aprovado=d.get('aprovado', False),
-                    score=d.get('score', 0),
-                    motivo=d.get('motivo', ''),
-                    titulo_otimizado=d.get('titulo_ptbr', '')[:70],
-                    descricao_seo=d.get('descricao_html', ''),
-                    tags_sugeridas=d.get('tags', []),
-                    preco_sugerido=d.get('preco_sugerido_brl', 0),
-                    margem_estimada=d.get('margem_percentual', 0),
-                    pontos_venda=d.get('pontos_venda', []),
-                    publico_alvo=d.get('publico_alvo', ''),
-                    viralidade=AnaliseViralidade(
-                        score=v.get('score', 0),
-                        potencial_tiktok=v.get('potencial_tiktok', 0),
-                        potencial_instagram=v.get('potencial_instagram', 0),
-                        hashtags_sugeridas=v.get('hashtags', []),
-                        hooks_video=v.get('hooks', []),
-                        tendencias_relacionadas=v.get('tendencias', [])
-                    ),
-                    concorrencia=AnaliseConcorrencia(
-                        nivel_saturacao=c.get('nivel_saturacao', 'medio'),
-                        estimativa_lojas=c.get('estimativa_lojas', 0),
-                        diferencial_sugerido=c.get('diferencial_sugerido', ''),
-                        risco_marca_registrada=c.get('risco_marca', False),
-                        alertas=c.get('alertas', [])
-                    ),
-                    riscos=d.get('riscos', []),
-                    modelo_usado=self.model,
-                    timestamp=datetime.now().isoformat()
-                )
+                return self._montar(json.loads(match.group()))
         except Exception as e:
             logger.error(f"Parse error: {e}")
         return self._fallback(produto)
 
+    def _montar(self, d: Dict) -> AnaliseIA:
+        v = d.get('viralidade') or {}
+        c = d.get('concorrencia') or {}
+        return AnaliseIA(
+            aprovado=d.get('aprovado', False),
+            score=d.get('score', 0),
+            motivo=d.get('motivo', ''),
+            titulo_otimizado=d.get('titulo_ptbr', '')[:70],
+            descricao_seo=d.get('descricao_html', ''),
+            tags_sugeridas=d.get('tags', []),
+            preco_sugerido=d.get('preco_sugerido_brl', 0),
+            margem_estimada=d.get('margem_percentual', 0),
+            pontos_venda=d.get('pontos_venda', []),
+            publico_alvo=d.get('publico_alvo', ''),
+            viralidade=AnaliseViralidade(
+                score=v.get('score', 0),
+                potencial_tiktok=v.get('potencial_tiktok', 0),
+                potencial_instagram=v.get('potencial_instagram', 0),
+                hashtags_sugeridas=v.get('hashtags', []),
+                hooks_video=v.get('hooks', []),
+                tendencias_relacionadas=v.get('tendencias', [])
+            ),
+            concorrencia=AnaliseConcorrencia(
+                nivel_saturacao=c.get('nivel_saturacao', 'medio'),
+                estimativa_lojas=c.get('estimativa_lojas', 0),
+                diferencial_sugerido=c.get('diferencial_sugerido', ''),
+                risco_marca_registrada=c.get('risco_marca', False),
+                alertas=c.get('alertas', [])
+            ),
+            riscos=d.get('riscos', []),
+            modelo_usado=self.model,
+            timestamp=datetime.now().isoformat()
+        )
+
     def _fallback(self, produto: Dict) -> AnaliseIA:
         orders = produto.get('orders', 0)
         rating = produto.get('rating', 0)
-        price = produto.get('price', 0)
+        price = float(produto.get('price') or 0)
 
         score = 0
         if orders >= 1000: score += 30
@@ -0,0 +1,4 @@
+# Cache Module
+from .llm_cache import LLMCache, FileBackend
+
+__all__ = ["LLMCache", "FileBackend"]
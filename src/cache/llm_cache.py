@@ -0,0 +1,78 @@
+"""
+💾 Cache persistente de respostas de LLM
+Evita pagar tokens e latência de novo por entradas já avaliadas
+"""
+import os
+import json
+import time
+import threading
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class FileBackend:
+    """Um arquivo JSON por chave em `diretorio/<2 primeiros chars>/<chave>.json`"""
+
+    def __init__(self, diretorio: str = ".cache/claude"):
+        self.diretorio = Path(diretorio)
+
+    def _caminho(self, chave: str) -> Path:
+        return self.diretorio / chave[:2] / f"{chave}.json"
+
+    def ler(self, chave: str) -> Optional[dict]:
+        try:
+            return json.loads(self._caminho(chave).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def gravar(self, chave: str, entrada: dict):
+        caminho = self._caminho(chave)
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        # Escreve em arquivo temporário e renomeia para não deixar JSON pela metade;
+        # o nome leva pid e thread para dois escritores da mesma chave não se truncarem
+        temporario = caminho.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        temporario.write_text(json.dumps(entrada, ensure_ascii=False), encoding="utf-8")
+        temporario.replace(caminho)
+
+    def remover(self, chave: str):
+        self._caminho(chave).unlink(missing_ok=True)
+
+
+class LLMCache:
+    """Cache chave → valor com TTL, sobre um backend persistente"""
+
+    def __init__(self, backend: FileBackend = None):
+        self.backend = backend or FileBackend()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def chave(**campos) -> str:
+        """SHA-256 do JSON canônico dos campos que determinam a resposta"""
+        bruto = json.dumps(campos, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+    def get(self, chave: str) -> Any:
+        entrada = self.backend.ler(chave)
+        if entrada is None:
+            self.misses += 1
+            return None
+
+        if entrada.get("expira") and entrada["expira"] < time.time():
+            self.backend.remover(chave)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entrada.get("valor")
+
+    def set(self, chave: str, valor: Any, ttl: Optional[float] = None):
+        entrada = {"valor": valor, "expira": time.time() + ttl if ttl else None}
+        try:
+            self.backend.gravar(chave, entrada)
+        except OSError as e:
+            logger.warning(f"⚠️ Não foi possível gravar no cache: {e}")
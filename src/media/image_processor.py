@@ -66,33 +66,65 @@ class AestheticImageProcessor:
                 if img is None:
                     continue
 
-                # Converter para RGB se necessário
-                img = self._ensure_rgb(img)
+                processed.append(self._process_image(img))
+                print(f"      ✓ Imagem processada com sucesso")
 
-                # Aplicar remoção de fundo baseado no método disponível
-                if self.bg_removal_method == 'removebg':
-                    img = self._remove_background_api(img)
-                elif self.bg_removal_method == 'rembg':
-                    img = self._remove_background_local(img)
-                else:
-                    img = self._remove_watermarks(img)
+            except Exception as e:
+                logger.error(f"Erro ao processar imagem {idx}: {e}")
+                continue
 
-                # Padronizar tamanho com centralização
-                img = self._smart_resize(img)
+        return processed
 
-                # Melhorar qualidade
-                img = self._enhance_quality(img)
+    def process_bytes_batch(self, images: List[bytes]) -> List[bytes]:
+        """
+        Mesmo pipeline de process_product_images, para imagens já baixadas
+        (o download pode ser feito em paralelo pelo chamador)
+        """
+        abertas = []
+        for data in images:
+            try:
+                img = Image.open(BytesIO(data))
+                img.load()
+                abertas.append(img)
+            except Exception as e:
+                logger.error(f"Imagem inválida: {e}")
 
-                # Converter para WebP
-                processed.append(self._to_webp(img))
-                print(f"      ✓ Imagem processada com sucesso")
+        if len(abertas) > self.max_images:
+            abertas = self._select_best(abertas)
 
+        processed = []
+        for idx, img in enumerate(abertas, 1):
+            try:
+                print(f"   [{idx}/{len(abertas)}] Processando imagem...")
+                processed.append(self._process_image(img))
+                print(f"      ✓ Imagem processada com sucesso")
             except Exception as e:
                 logger.error(f"Erro ao processar imagem {idx}: {e}")
-                continue
 
         return processed
 
+    def _process_image(self, img: Image.Image) -> bytes:
+        """Fundo, tamanho, qualidade e conversão de uma imagem"""
+        # Converter para RGB se necessário
+        img = self._ensure_rgb(img)
+
+        # Aplicar remoção de fundo baseado no método disponível
+        if self.bg_removal_method == 'removebg':
+            img = self._remove_background_api(img)
+        elif self.bg_removal_method == 'rembg':
+            img = self._remove_background_local(img)
+        else:
+            img = self._remove_watermarks(img)
+
+        # Padronizar tamanho com centralização
+        img = self._smart_resize(img)
+
+        # Melhorar qualidade
+        img = self._enhance_quality(img)
+
+        # Converter para WebP
+        return self._to_webp(img)
+
     def _remove_background_api(self, img: Image.Image) -> Image.Image:
         """
         Remove fundo usando a API do remove.bg
@@ -166,6 +198,19 @@ class AestheticImageProcessor:
             logger.error(f"Erro no rembg: {e}")
             return self._remove_watermarks(img)
 
+    def _score_image(self, img: Image.Image) -> Optional[float]:
+        """Pontua pelo tamanho e proporção; None se for pequena demais"""
+        w, h = img.size
+
+        if w < 400 or h < 400:
+            return None
+
+        target_ratio = self.target_size[0] / self.target_size[1]
+        current_ratio = w / h
+        ratio_diff = abs(current_ratio - target_ratio)
+
+        return (w * h) / 1000000 - ratio_diff * 5
+
     def _select_best_images(self, image_urls: List[str]) -> List[str]:
         """Seleciona as melhores imagens baseado em tamanho e proporção"""
         candidates = []
@@ -173,18 +218,9 @@ class AestheticImageProcessor:
         for url in image_urls[:20]:
             try:
                 response = requests.get(url, timeout=10)
-                img = Image.open(BytesIO(response.content))
-                w, h = img.size
-
-                if w < 400 or h < 400:
-                    continue
-
-                target_ratio = self.target_size[0] / self.target_size[1]
-                current_ratio = w / h
-                ratio_diff = abs(current_ratio - target_ratio)
-
-                score = (w * h) / 1000000 - ratio_diff * 5
-                candidates.append({'url': url, 'score': score})
+                score = self._score_image(Image.open(BytesIO(response.content)))
+                if score is not None:
+                    candidates.append({'url': url, 'score': score})
 
             except:
                 continue
@@ -192,6 +228,17 @@ class AestheticImageProcessor:
         candidates.sort(key=lambda x: x['score'], reverse=True)
         return [c['url'] for c in candidates[:self.max_images]]
 
+    def _select_best(self, images: List[Image.Image]) -> List[Image.Image]:
+        """Como _select_best_images, para imagens já abertas"""
+        candidates = []
+        for img in images[:20]:
+            score = self._score_image(img)
+            if score is not None:
+                candidates.append((score, img))
+
+        candidates.sort(key=lambda x: x[0], reverse=True)
+        return [img for _, img in candidates[:self.max_images]]
+
     def _download_image(self, url: str) -> Optional[Image.Image]:
         """Download de imagem"""
         try:
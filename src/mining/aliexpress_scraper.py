@@ -5,6 +5,7 @@ Com scraping de reviews, análise de concorrência, download de vídeos
 import os
 import time
 import random
+import asyncio
 import logging
 import re
 from typing import List, Dict, Optional
@@ -16,12 +17,23 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from bs4 import BeautifulSoup
+import aiohttp
 import requests
 
 from .criteria import CriteriosMineracao, validar_produto
 
 logger = logging.getLogger(__name__)
 
+# Busca sem navegador: páginas da categoria baixadas em paralelo
+PAGINAS_HTTP = 3
+CONEXOES_HTTP = 3
+USER_AGENTS = [
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15",
+]
+
 
 @dataclass
 class ReviewProduto:
@@ -97,29 +109,90 @@ class AliExpressScraper:
                 self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
                 self._delay(1, 2)
 
-            soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-            cards = soup.find_all(class_=re.compile(r"search-item-card|product-card"))
+            cards = self._extrair_cards(self.driver.page_source)
 
             logger.info(f"📦 {len(cards)} produtos encontrados")
+            produtos = self._filtrar_cards(cards, categoria, max_produtos)
 
-            for card in cards[:max_produtos * 2]:
-                try:
-                    produto = self._parse_card(card, categoria)
-                    if produto:
-                        aprovado, _ = validar_produto(produto, self.criterios)
-                        if aprovado:
-                            produtos.append(produto)
-                            if len(produtos) >= max_produtos:
-                                break
-                except:
-                    continue
+        except Exception as e:
+            logger.error(f"Erro: {e}")
 
+        logger.info(f"✅ {len(produtos)} produtos aprovados")
+        return produtos
+
+    def buscar_categoria_http(self, categoria: str, max_produtos=20) -> List[Dict]:
+        """Busca produtos de uma categoria sem abrir o Chrome
+
+        Baixa PAGINAS_HTTP páginas da listagem em paralelo (User-Agent
+        rotativo). Retorna lista vazia se o HTML vier sem cards (página
+        renderizada por JS/captcha); nesse caso use buscar_categoria.
+        """
+        if categoria not in self.CATEGORIAS:
+            logger.error(f"Categoria não encontrada: {categoria}")
+            return []
+
+        url = f"https://www.aliexpress.com{self.CATEGORIAS[categoria]}?sortType=total_tranpro_desc"
+        logger.info(f"🔍 Buscando (HTTP): {categoria}")
+
+        try:
+            paginas = asyncio.run(self._baixar_paginas(
+                [f"{url}&page={pagina}" for pagina in range(1, PAGINAS_HTTP + 1)]
+            ))
         except Exception as e:
             logger.error(f"Erro: {e}")
+            return []
 
+        cards = [card for html in paginas for card in self._extrair_cards(html)]
+        if not cards:
+            logger.info("↩️  Listagem sem cards no HTML")
+            return []
+
+        logger.info(f"📦 {len(cards)} produtos encontrados")
+        produtos = self._filtrar_cards(cards, categoria, max_produtos)
         logger.info(f"✅ {len(produtos)} produtos aprovados")
         return produtos
 
+    async def _baixar_paginas(self, urls: List[str]) -> List[str]:
+        sem = asyncio.Semaphore(CONEXOES_HTTP)
+
+        async def _baixar(http, url):
+            async with sem:
+                try:
+                    headers = {
+                        "User-Agent": random.choice(USER_AGENTS),
+                        "Accept-Language": "en-US,en;q=0.9",
+                    }
+                    async with http.get(url, headers=headers) as r:
+                        r.raise_for_status()
+                        return await r.text()
+                except Exception as e:
+                    logger.debug(f"Erro ao baixar {url}: {e}")
+                    return ""
+
+        timeout = aiohttp.ClientTimeout(total=20)
+        async with aiohttp.ClientSession(timeout=timeout) as http:
+            return await asyncio.gather(*(_baixar(http, url) for url in urls))
+
+    def _extrair_cards(self, html: str) -> list:
+        soup = BeautifulSoup(html, 'html.parser')
+        return soup.find_all(class_=re.compile(r"search-item-card|product-card"))
+
+    def _filtrar_cards(self, cards: list, categoria: str, max_produtos: int) -> List[Dict]:
+        """Converte os cards e mantém só os aprovados pelos critérios"""
+        produtos = []
+        for card in cards[:max_produtos * 2]:
+            try:
+                produto = self._parse_card(card, categoria)
+                if produto:
+                    aprovado, _ = validar_produto(produto, self.criterios)
+                    if aprovado:
+                        produtos.append(produto)
+                        if len(produtos) >= max_produtos:
+                            break
+            except:
+                continue
+        return produtos
+
     def _parse_card(self, card, categoria) -> Optional[Dict]:
         """Extrai dados de um card"""
         try:
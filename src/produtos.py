@@ -2,8 +2,10 @@
 Módulo para gerenciamento de produtos na Shopify.
 """
 import os
+import re
 import json
 import requests
+from itertools import islice
 from dotenv import load_dotenv
 
 load_dotenv(override=True)
@@ -28,20 +30,42 @@ def get_api_url(endpoint):
 # PRODUTOS - CRUD
 # =============================================================================
 
-def listar_produtos(limit=50):
-    """Lista todos os produtos da loja."""
-    url = get_api_url(f"products.json?limit={limit}")
-    response = requests.get(url, headers=get_headers())
+NEXT_LINK_PATTERN = re.compile(r'<([^>]+)>; rel="next"')
 
-    if response.status_code == 200:
-        produtos = response.json().get("products", [])
-        print(f"\n📦 {len(produtos)} produtos encontrados:\n")
-        for p in produtos:
-            print(f"  [{p['id']}] {p['title']} - {p['status']}")
-        return produtos
-    else:
-        print(f"❌ Erro ao listar produtos: {response.text}")
-        return []
+
+def iter_produtos(page_size=250):
+    """
+    Itera sobre todos os produtos da loja sob demanda.
+
+    Segue a paginação por cursor do header Link, então só uma página
+    fica em memória por vez.
+    """
+    url = get_api_url(f"products.json?limit={page_size}")
+
+    while url:
+        response = requests.get(url, headers=get_headers())
+        if response.status_code != 200:
+            print(f"❌ Erro ao listar produtos: {response.text}")
+            return
+
+        yield from response.json().get("products", [])
+
+        match = NEXT_LINK_PATTERN.search(response.headers.get("Link", ""))
+        url = match.group(1) if match else None
+
+
+def listar_produtos(limit=None):
+    """Lista os produtos da loja (todos, ou apenas os `limit` primeiros)."""
+    page_size = min(limit, 250) if limit else 250
+    produtos = []
+
+    print("\n📦 Produtos:\n")
+    for p in islice(iter_produtos(page_size), limit):
+        print(f"  [{p['id']}] {p['title']} - {p['status']}")
+        produtos.append(p)
+
+    print(f"\n📦 {len(produtos)} produtos encontrados")
+    return produtos
 
 
 def obter_produto(product_id):
@@ -5,6 +5,8 @@ Cliente para interagir com a Admin API da Shopify (REST + GraphQL)
 import os
 import json
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Optional, Dict, Any, List
 from dotenv import load_dotenv
 
@@ -25,11 +27,17 @@ class ShopifyClient:
             "Content-Type": "application/json"
         }
 
+        # Sessão com keep-alive + retry automático em 429/5xx
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        retry = Retry(total=5, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False)
+        self.session.mount("https://", HTTPAdapter(pool_connections=20, pool_maxsize=20, max_retries=retry))
+
     def _request(self, method: str, endpoint: str, data: Optional[dict] = None) -> Optional[Dict[str, Any]]:
         """Faz requisição REST para a API"""
         url = f"{self.base_url}/{endpoint}"
         try:
-            response = requests.request(method, url, headers=self.headers, json=data)
+            response = self.session.request(method, url, json=data)
             response.raise_for_status()
             return response.json() if response.text else None
         except requests.exceptions.HTTPError as e:
@@ -48,11 +56,7 @@ class ShopifyClient:
             if variables:
                 payload["variables"] = variables
 
-            response = requests.post(
-                self.graphql_url,
-                headers=self.headers,
-                json=payload
-            )
+            response = self.session.post(self.graphql_url, json=payload)
             response.raise_for_status()
             return response.json()
         except Exception as e: